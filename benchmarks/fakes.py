@@ -0,0 +1,199 @@
+# benchmarks/fakes.py
+
+import asyncio
+import json
+import random
+import threading
+import time
+from email.utils import formatdate
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+from services.web import Request, Response, WebServer
+
+class FakeNitter:
+    """Serves /<user>/rss feeds with a configurable size, latency and failure rate.
+
+    Each feed holds `feed_size` posts; `new_per_fetch` fresh posts appear on every
+    fetch after the first, so warm cycles exercise dedup plus a trickle of work.
+    """
+
+    def __init__(self, feed_size: int = 20, latency: float = 0.02, failure_rate: float = 0.0,
+                 new_per_fetch: int = 0, seed: int = 1):
+        self.feed_size = feed_size
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.new_per_fetch = new_per_fetch
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self._heads: Dict[str, int] = {}
+
+    def _feed(self, user: str) -> str:
+        head = self._heads.get(user)
+        head = self.feed_size if head is None else head + self.new_per_fetch
+        self._heads[user] = head
+        now = time.time()
+        entries = []
+        for n in range(head, max(0, head - self.feed_size), -1):
+            entries.append(
+                f"<item><title>{user} post {n}</title>"
+                f"<description>&lt;p&gt;Update #{n} from {user}: markets moved again.&lt;/p&gt;</description>"
+                f"<link>https://x.com/{user}/status/{n}</link><guid>https://x.com/{user}/status/{n}</guid>"
+                f"<pubDate>{formatdate(now - (head - n) * 60, usegmt=True)}</pubDate></item>"
+            )
+        return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f"<title>{user}</title>{''.join(entries)}</channel></rss>")
+
+    async def handle(self, request: Request) -> Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self.random.random() < self.failure_rate:
+            self.failures += 1
+            return Response(503, b"mirror overloaded")
+        user = request.path.strip("/").split("/")[0]
+        return Response(200, self._feed(user).encode(), "application/rss+xml; charset=utf-8")
+
+class FakeTelegram:
+    """Answers Bot API calls (sendMessage, copyMessage, getMe, ...) with minimal valid results.
+
+    It also remembers the setWebhook registration and can push updates to it the
+    way Telegram does, secret token header included.
+    """
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self.webhook: Dict[str, str] = {}
+        self._message_id = 0
+        self._update_id = 0
+
+    def channel_post(self, chat_id: int, text: str) -> Dict:
+        """A channel_post update as Telegram would send it."""
+        self._update_id += 1
+        self._message_id += 1
+        return {"update_id": self._update_id, "channel_post": {
+            "message_id": self._message_id, "date": int(time.time()), "text": text,
+            "chat": {"id": chat_id, "type": "channel", "title": "Fake channel"}}}
+
+    async def push_updates(self, updates: List[Dict], secret: Optional[str] = None) -> List[int]:
+        """POSTs updates to the registered webhook concurrently; returns the status codes."""
+        import httpx
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook.get("secret_token", "") if secret is None else secret}
+        async with httpx.AsyncClient(timeout=10) as client:
+            responses = await asyncio.gather(*[client.post(self.webhook["url"], json=u, headers=headers)
+                                               for u in updates])
+        return [r.status_code for r in responses]
+
+    @staticmethod
+    def _params(request: Request) -> Dict[str, str]:
+        content_type = request.headers.get("content-type", "")
+        if "json" in content_type:
+            return request.json() or {}
+        if "x-www-form-urlencoded" in content_type:
+            return {k: v[0] for k, v in parse_qs(request.body.decode()).items()}
+        return {}
+
+    async def handle(self, request: Request) -> Response:
+        method = request.path.rsplit("/", 1)[-1]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        await asyncio.sleep(self.latency)
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method in ("setWebhook", "deleteWebhook"):
+            self.webhook = self._params(request) if method == "setWebhook" else {}
+            result = True
+        else:
+            params = self._params(request)
+            self._message_id += 1
+            chat_id = params.get("chat_id", 0)
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0, "type": "channel"},
+                "text": params.get("text", ""),
+            }
+            if method == "copyMessage":
+                result = {"message_id": self._message_id}
+        body = json.dumps({"ok": True, "result": result}).encode()
+        return Response(200, body, "application/json")
+
+class FakeGroq:
+    """An OpenAI-style /openai/v1/chat/completions endpoint that echoes a rewritten post."""
+
+    def __init__(self, latency: float = 0.2, tokens_per_char: float = 0.25):
+        self.latency = latency
+        self.tokens_per_char = tokens_per_char
+        self.requests = 0
+
+    async def handle(self, request: Request) -> Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        messages = request.json().get("messages", [])
+        prompt = "".join(m.get("content", "") for m in messages)
+        content = "✨ " + (messages[-1]["content"].rsplit("Content:\n", 1)[-1] if messages else "")
+        prompt_tokens = int(len(prompt) * self.tokens_per_char)
+        completion_tokens = int(len(content) * self.tokens_per_char)
+        body = {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.json().get("model", "bench"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+        return Response(200, json.dumps(body).encode(), "application/json")
+
+class FakeServers:
+    """Runs the three stand-ins on their own event loop in a background thread.
+
+    A separate loop keeps them answering even while the engine under test blocks
+    its own loop (the RSS source is synchronous), just like real remote servers.
+    """
+
+    def __init__(self, nitter: FakeNitter, telegram: FakeTelegram, groq: FakeGroq):
+        self.nitter = nitter
+        self.telegram = telegram
+        self.groq = groq
+        self._servers = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self.urls: Dict[str, str] = {}
+
+    def start(self):
+        ready = threading.Event()
+
+        async def serve():
+            for name, fake, path in (("nitter", self.nitter, "/*"), ("telegram", self.telegram, "/bot*"),
+                                     ("groq", self.groq, "/openai/v1/chat/completions")):
+                server = WebServer("127.0.0.1", 0)
+                server.route("GET", path, fake.handle)
+                server.route("POST", path, fake.handle)
+                await server.start()
+                self._servers.append(server)
+                self.urls[name] = f"http://127.0.0.1:{server.port}"
+            ready.set()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="bench-fakes", daemon=True)
+        self._thread.start()
+        if not ready.wait(10):
+            raise RuntimeError("fake servers did not start")
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            for server in self._servers:
+                await server.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
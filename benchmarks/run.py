@@ -0,0 +1,195 @@
+# benchmarks/run.py
+"""Offline end-to-end benchmark of the processing engine.
+
+Starts local stand-ins for Nitter, the Telegram Bot API and Groq, points a real
+ProcessingEngine at them and reports throughput, stage latencies, DB statements
+and peak memory for each synthetic task count. Peak memory comes from a second
+pass with tracemalloc on, since tracing slows every allocation and would skew
+the timings:
+
+    python -m benchmarks.run --tasks 10 100 1000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from benchmarks.fakes import FakeGroq, FakeNitter, FakeServers, FakeTelegram
+
+BENCH_TOKEN = "123456:BENCHMARK"
+
+def _configure_env(workdir: str, urls: Dict[str, str], ai: bool):
+    # Must run before the engine modules are imported: they read these at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["NITTER_MIRRORS"] = urls["nitter"]
+    os.environ["TELEGRAM_API_URL"] = f"{urls['telegram']}/bot"
+    os.environ["GROQ_BASE_URL"] = urls["groq"]
+    os.environ["MEDIA_CACHE_DIR"] = os.path.join(workdir, "media")
+    os.environ["METRICS_PORT"] = "0"
+    if ai:
+        os.environ["GROQ_API_KEY"] = "bench-key"
+    else:
+        os.environ.pop("GROQ_API_KEY", None)
+
+def _lift_telegram_limits():
+    """The real limits would make the benchmark measure Telegram's quotas, not the engine."""
+    from services.rate_limiter import TelegramRateLimiter
+    TelegramRateLimiter.GLOBAL_RATE = 1_000_000
+    TelegramRateLimiter.GROUP_RATE = 1_000_000
+    TelegramRateLimiter.PRIVATE_RATE = 1_000_000
+
+def _hist_mean(hist) -> Dict[str, float]:
+    return {"sum": sum(c.sum for c in hist._children.values()),
+            "count": sum(c.count for c in hist._children.values())}
+
+def _mean_delta(before: Dict[str, float], after: Dict[str, float]):
+    count = after["count"] - before["count"]
+    return (after["sum"] - before["sum"]) / count if count else None
+
+def _stage_percentiles(spans) -> Dict[str, Dict[str, Any]]:
+    from services.tracing import percentile
+    stages = {
+        "transform": [s.transformed - s.detected for s in spans],
+        "queue": [s.sending - s.queued for s in spans],
+        "deliver": [s.published - s.sending for s in spans],
+        "pipeline": [s.published - s.detected for s in spans],
+    }
+    return {name: {f"p{q}": percentile(values, q) for q in (50, 95, 99)} for name, values in stages.items()}
+
+async def run_scenario(engine, fakes: FakeServers, tasks: int, cycles: int, run_id: int) -> List[Dict[str, Any]]:
+    from database.manager import db
+    from core.engine import FETCH_SECONDS
+    from providers.publishers.telegram import PUBLISH_SECONDS
+    from services.ai_service import AI_SECONDS
+    from services.tracing import tracer
+
+    for table in ("outbox", "processed_items", "sources", "destinations", "tasks"):
+        db.execute(f"DELETE FROM {table}")
+    tracer.clear()
+    db.bulk_create_tasks(1, [{
+        "name": f"bench {run_id}-{i}",
+        "options": {"ai_options": {}},
+        "sources": [("twitter_rss", f"r{run_id}user{i}")],
+        "destinations": [("telegram", f"-100{run_id}{i:05d}")],
+    } for i in range(tasks)])
+
+    results = []
+    for cycle in range(1, cycles + 1):
+        statements = db.statement_count
+        rss_requests = fakes.nitter.requests
+        means = {name: _hist_mean(h) for name, h in
+                 (("fetch", FETCH_SECONDS), ("ai", AI_SECONDS), ("publish", PUBLISH_SECONDS))}
+        spans_before = len(tracer.spans())
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+
+        await engine.process_all_tasks()
+        await engine.delivery.join()
+
+        elapsed = time.perf_counter() - started
+        spans = tracer.spans()[spans_before:]
+        results.append({
+            "tasks": tasks,
+            "cycle": cycle,
+            "seconds": round(elapsed, 3),
+            "published": len(spans),
+            "items_per_sec": round(len(spans) / elapsed, 1) if elapsed else None,
+            "db_statements": db.statement_count - statements,
+            "rss_requests": fakes.nitter.requests - rss_requests,
+            "peak_mem_mb": round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1) if tracemalloc.is_tracing() else None,
+            "stages": _stage_percentiles(spans),
+            "mean_seconds": {name: _mean_delta(means[name], _hist_mean(h)) for name, h in
+                             (("fetch", FETCH_SECONDS), ("ai", AI_SECONDS), ("publish", PUBLISH_SECONDS))},
+        })
+    return results
+
+def _fmt(value, scale: float = 1000, unit: str = "ms") -> str:
+    return "-" if value is None else f"{value * scale:.0f}{unit}"
+
+def print_report(results: List[Dict[str, Any]], out=sys.stdout):
+    header = f"{'tasks':>6} {'cycle':>5} {'secs':>8} {'items':>6} {'items/s':>8} {'db stmts':>8} {'peak MB':>8}  " \
+             f"{'pipeline p50/p95/p99':>24}  {'fetch':>7} {'ai':>7} {'publish':>8}"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for r in results:
+        pipe = r["stages"]["pipeline"]
+        mean = r["mean_seconds"]
+        peak = "-" if r["peak_mem_mb"] is None else f"{r['peak_mem_mb']:.1f}"
+        print(f"{r['tasks']:>6} {r['cycle']:>5} {r['seconds']:>8.2f} {r['published']:>6} "
+              f"{r['items_per_sec'] or 0:>8.1f} {r['db_statements']:>8} {peak:>8}  "
+              f"{'/'.join(_fmt(pipe[p]) for p in ('p50', 'p95', 'p99')):>24}  "
+              f"{_fmt(mean['fetch']):>7} {_fmt(mean['ai']):>7} {_fmt(mean['publish']):>8}", file=out)
+
+async def _run(args, fakes: FakeServers) -> List[Dict[str, Any]]:
+    from core.engine import ProcessingEngine
+    engine = ProcessingEngine(BENCH_TOKEN)
+    results = []
+    try:
+        for run_id, tasks in enumerate(args.tasks):
+            results.extend(await run_scenario(engine, fakes, tasks, args.cycles, run_id))
+        if not args.no_memory:
+            # Same scenarios on fresh feeds, traced; only the peaks are kept
+            tracemalloc.start()
+            try:
+                traced = []
+                for run_id, tasks in enumerate(args.tasks, len(args.tasks)):
+                    traced.extend(await run_scenario(engine, fakes, tasks, args.cycles, run_id))
+            finally:
+                tracemalloc.stop()
+            for result, traced_result in zip(results, traced):
+                result["peak_mem_mb"] = traced_result["peak_mem_mb"]
+    finally:
+        await engine.stop()
+    return results
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10, 100, 1000], help="synthetic task counts")
+    parser.add_argument("--cycles", type=int, default=2, help="engine cycles per task count (1st is cold)")
+    parser.add_argument("--feed-size", type=int, default=20, help="posts per RSS feed")
+    parser.add_argument("--new-per-fetch", type=int, default=1, help="fresh posts per feed on later fetches")
+    parser.add_argument("--rss-latency", type=float, default=0.02)
+    parser.add_argument("--rss-failure-rate", type=float, default=0.0)
+    parser.add_argument("--telegram-latency", type=float, default=0.01)
+    parser.add_argument("--ai-latency", type=float, default=0.2)
+    parser.add_argument("--no-ai", action="store_true", help="skip the Groq stand-in (copy/send only)")
+    parser.add_argument("--telegram-limits", action="store_true", help="keep Telegram's real rate limits")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced pass that measures peak memory")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep engine INFO logs")
+    args = parser.parse_args(argv)
+
+    fakes = FakeServers(
+        FakeNitter(args.feed_size, args.rss_latency, args.rss_failure_rate, args.new_per_fetch),
+        FakeTelegram(args.telegram_latency),
+        FakeGroq(args.ai_latency),
+    ).start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            _configure_env(workdir, fakes.urls, ai=not args.no_ai)
+            from services.logger import logger
+            if not args.verbose:
+                logger.logger.setLevel(logging.WARNING)
+            if not args.telegram_limits:
+                _lift_telegram_limits()
+
+            results = asyncio.run(_run(args, fakes))
+    finally:
+        fakes.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,50 @@
+# bot/cache.py
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class ViewCache:
+    """Caches rendered menu views (text + keyboard) per user.
+
+    Entries are grouped by user so any change to a user's tasks drops all of
+    their cached pages and detail views at once. Users are evicted LRU.
+    Views also expire after `ttl` seconds, since tasks can change outside this
+    process (CLI import, another bot process, the engine) without invalidating.
+    """
+
+    def __init__(self, max_users: int = 500, max_views_per_user: int = 50, ttl: float = 30.0):
+        self.max_users = max_users
+        self.max_views_per_user = max_views_per_user
+        self.ttl = ttl
+        self._users: "OrderedDict[int, OrderedDict]" = OrderedDict()
+
+    def get(self, user_id: int, key: Hashable) -> Optional[Any]:
+        views = self._users.get(user_id)
+        if views is None or key not in views:
+            return None
+        view, stored_at = views[key]
+        if time.monotonic() - stored_at >= self.ttl:
+            del views[key]
+            return None
+        self._users.move_to_end(user_id)
+        views.move_to_end(key)
+        return view
+
+    def put(self, user_id: int, key: Hashable, view: Any):
+        views = self._users.setdefault(user_id, OrderedDict())
+        self._users.move_to_end(user_id)
+        views[key] = (view, time.monotonic())
+        views.move_to_end(key)
+        while len(views) > self.max_views_per_user:
+            views.popitem(last=False)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Drops every cached view for a user after their tasks changed."""
+        self._users.pop(user_id, None)
+
+# Global Instance
+view_cache = ViewCache(ttl=float(os.getenv("VIEW_CACHE_TTL", "30")))
@@ -9,3 +9,6 @@ from .tasks import (
 from .settings import (
     show_settings, ask_setting, set_groq_key, set_tw_user, set_tw_pass
 )
+from .transfer import import_document, export_command
+from .admin import latency_command, profile_command
+from .capture import capture_message
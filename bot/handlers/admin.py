@@ -0,0 +1,94 @@
+# bot/handlers/admin.py
+
+import os
+import time
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+from database.manager import db
+from services.config_service import config
+from services.logger import logger
+from services.profiler import ProfilerBusyError, profiler
+from services.tracing import tracer
+
+DEFAULT_PROFILE_SECONDS = 30
+MAX_PROFILE_SECONDS = 300
+
+def is_admin(update: Update) -> bool:
+    return str(update.effective_user.id) == str(config.admin_id)
+
+def _fmt_seconds(value) -> str:
+    if value is None:
+        return "n/a"
+    if value < 1:
+        return f"{value * 1000:.0f}ms"
+    if value < 120:
+        return f"{value:.1f}s"
+    return f"{value / 60:.1f}m"
+
+async def latency_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/latency - end-to-end delivery latency per task (source post -> published)."""
+    if not is_admin(update):
+        return
+
+    summary = tracer.summary()
+    if not summary:
+        await update.message.reply_text("⏱ **Delivery Latency**\n\nNo deliveries recorded yet.", parse_mode="Markdown")
+        return
+
+    lines = ["⏱ **Delivery Latency** (source post → published)\n"]
+    for task_id, stats in sorted(summary.items(), key=lambda kv: -(kv[1]['p95'] or 0)):
+        task = db.get_task_summary(task_id)
+        name = escape_markdown(task['name']) if task else f"Task {task_id} (deleted)"
+        stages = stats['stages']
+        lines.append(
+            f"📌 **{name}** — {stats['count']} deliveries\n"
+            f"p50 `{_fmt_seconds(stats['p50'])}` · p95 `{_fmt_seconds(stats['p95'])}` · p99 `{_fmt_seconds(stats['p99'])}`\n"
+            f"median: detect `{_fmt_seconds(stages['detect'])}` → transform `{_fmt_seconds(stages['transform'])}` "
+            f"→ persist `{_fmt_seconds(stages['persist'])}` → queue `{_fmt_seconds(stages['queue'])}` "
+            f"→ deliver `{_fmt_seconds(stages['deliver'])}`\n"
+        )
+    text = "\n".join(lines)
+    await update.message.reply_text(text[:4000], parse_mode="Markdown")
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/profile [seconds] - samples the live process and sends a flamegraph profile and allocation report."""
+    if not is_admin(update):
+        return
+    try:
+        seconds = int(context.args[0]) if context.args else DEFAULT_PROFILE_SECONDS
+    except ValueError:
+        await update.message.reply_text("Usage: `/profile [seconds]`", parse_mode="Markdown")
+        return
+    seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+
+    # Only this process is sampled; with --role bot the engines run elsewhere
+    role = context.bot_data.get("role", "all")
+    target = f"the {'bot front-end' if role == 'bot' else 'bot and engine'} process (pid {os.getpid()})"
+    note = ("\nEngines run in separate processes: start one with `--profile SECONDS` to profile it."
+            if role == "bot" else "")
+    status_msg = await update.message.reply_text(f"🔬 **Profiling {target} for {seconds}s...**{note}",
+                                                 parse_mode="Markdown")
+    try:
+        result = await profiler.capture(seconds)
+    except ProfilerBusyError:
+        await status_msg.edit_text("⏳ A capture is already running, try again when it finishes.")
+        return
+    except Exception as e:
+        logger.error(f"[Admin] Profile capture failed: {e}", exc_info=True)
+        await status_msg.edit_text("❌ **Profile capture failed.** Check the logs.", parse_mode="Markdown")
+        return
+
+    stamp = int(time.time())
+    await update.message.reply_document(
+        document=result.collapsed.encode("utf-8"),
+        filename=f"profile-{stamp}.collapsed",
+        caption=f"🔥 {result.samples} samples of {target} over {result.seconds:.1f}s. "
+                "Open in speedscope.app or render with flamegraph.pl."
+    )
+    await update.message.reply_document(
+        document=result.allocations.encode("utf-8"),
+        filename=f"profile-{stamp}.alloc.txt",
+        caption="🧠 Top allocation sites during the capture."
+    )
+    await status_msg.delete()
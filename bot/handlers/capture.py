@@ -0,0 +1,12 @@
+# bot/handlers/capture.py
+
+from telegram import Update
+from telegram.ext import ContextTypes
+from services.capture import capture_buffer
+
+async def capture_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Stores new posts from channels that active tasks use as sources."""
+    # Edits arrive as edited_channel_post and are not re-forwarded
+    if update.channel_post is None:
+        return
+    await capture_buffer.add(update.channel_post)
@@ -7,7 +7,7 @@ from bot.menu import Menu
 from database.manager import db
 
 from services.config_service import config
-from providers.sources.twitter import TwikitSource
+from services.ai_service import ai_service
 
 async def show_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Shows the settings menu with a professional overview."""
@@ -68,6 +68,7 @@ async def set_groq_key(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return BotState.SET_GROQ_KEY
         
     db.set_setting("GROQ_API_KEY", val)
+    ai_service.reset()
     await update.message.reply_text("✅ Groq API Key updated successfully!", reply_markup=Menu.main_menu())
     return ConversationHandler.END
 
@@ -84,6 +85,7 @@ async def set_tw_pass(update: Update, context: ContextTypes.DEFAULT_TYPE):
     status_msg = await update.message.reply_text("🔄 **Verifying Twitter Credentials...**\n\nPlease wait while we authenticate with X.", parse_mode="Markdown")
     
     if username:
+        from providers.sources.twitter import TwikitSource
         verify_src = TwikitSource(username=username, password=password)
         is_valid = await verify_src.verify_credentials()
         
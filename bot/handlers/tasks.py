@@ -5,53 +5,77 @@ from telegram.ext import ContextTypes, ConversationHandler
 from bot.states import BotState
 from bot.menu import Menu
 from database.manager import db
+from services.command_bus import command_bus
 from services.logger import logger
+from bot.verification import source_prober
+from bot.cache import view_cache
+from typing import Optional
+import asyncio
 import re
 
-from providers.sources.rss import RSSSource
-from providers.sources.twitter import TwikitSource
-from providers.sources.telegram import TelegramSource
+TASKS_PER_PAGE = 10
+
+def _task_list_view(user_id: int, direction: str = "", cursor: Optional[int] = None):
+    key = ("list", direction, cursor)
+    view = view_cache.get(user_id, key)
+    if view is None:
+        page = db.get_task_page(
+            user_id,
+            after_id=cursor if direction == "next" else None,
+            before_id=cursor if direction == "prev" else None,
+            limit=TASKS_PER_PAGE
+        )
+        if page['tasks']:
+            text = "📊 **Your Tasks**\n\nManage your automation tasks below."
+        else:
+            text = "📊 **Your Tasks**\n\nNo tasks yet. Create one to get started."
+        view = (text, Menu.task_list(page))
+        view_cache.put(user_id, key, view)
+    return view
 
 async def view_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Shows the list of tasks."""
+    """Shows one page of the task list; `tasks_next_<id>` / `tasks_prev_<id>` page from a cursor."""
     user_id = update.effective_user.id
-    tasks = db.get_tasks(user_id)
-    
     query = update.callback_query
-    if query:
-        await query.answer()
-        await query.edit_message_text(
-            "📊 **Your Tasks**\n\nManage your automation tasks below.",
-            reply_markup=Menu.task_list(tasks),
-            parse_mode="Markdown"
-        )
+    if not query:
+        return BotState.START
+
+    await query.answer()
+    direction, cursor = "", None
+    parts = query.data.split("_")
+    if len(parts) == 3 and parts[1] in ("next", "prev"):
+        direction, cursor = parts[1], int(parts[2])
+
+    text, markup = _task_list_view(user_id, direction, cursor)
+    await query.edit_message_text(text, reply_markup=markup, parse_mode="Markdown")
     return BotState.START
 
 async def manage_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Shows options for a specific task."""
     query = update.callback_query
     await query.answer()
-    
+
+    user_id = update.effective_user.id
     task_id = int(query.data.split("_")[2])
-    task = db.get_task_details(task_id)
-    
-    if not task:
-        await query.edit_message_text("❌ Task not found.", reply_markup=Menu.main_menu())
-        return BotState.START
+    view = view_cache.get(user_id, ("task", task_id))
+    if view is None:
+        task = db.get_task_summary(task_id)
+        if not task or task['user_id'] != user_id:
+            await query.edit_message_text("❌ Task not found.", reply_markup=Menu.main_menu())
+            return BotState.START
 
-    status_str = "✅ Active" if task['is_active'] else "⏸ Paused"
-    detail_text = (
-        f"🛠 **Managing Task:** {task['name']}\n"
-        f"Status: {status_str}\n\n"
-        f"📥 **Sources:** {len(task['sources'])}\n"
-        f"📤 **Destinations:** {len(task['destinations'])}\n"
-    )
-    
-    await query.edit_message_text(
-        detail_text,
-        reply_markup=Menu.task_manage(task),
-        parse_mode="Markdown"
-    )
+        status_str = "✅ Active" if task['is_active'] else "⏸ Paused"
+        detail_text = (
+            f"🛠 **Managing Task:** {task['name']}\n"
+            f"Status: {status_str}\n\n"
+            f"📥 **Sources:** {task['source_count']}\n"
+            f"📤 **Destinations:** {task['dest_count']}\n"
+        )
+        view = (detail_text, Menu.task_manage(task))
+        view_cache.put(user_id, ("task", task_id), view)
+
+    text, markup = view
+    await query.edit_message_text(text, reply_markup=markup, parse_mode="Markdown")
     return BotState.START
 
 async def toggle_task_status(update: Update, context: ContextTypes.DEFAULT_TYPE, status: bool):
@@ -60,7 +84,9 @@ async def toggle_task_status(update: Update, context: ContextTypes.DEFAULT_TYPE,
     await query.answer()
     
     task_id = int(query.data.split("_")[2])
-    db.execute("UPDATE tasks SET is_active = %s WHERE id = %s", (status, task_id))
+    db.set_task_status(task_id, "active" if status else "paused")
+    command_bus.publish("task_resumed" if status else "task_paused", task_id)
+    view_cache.invalidate(update.effective_user.id)
     
     action = "RESUMED ▶️" if status else "PAUSED ⏸"
     await query.edit_message_text(f"✨ **Task Status Updated!**\n\nThe task has been {action} and the engine has been notified.", reply_markup=Menu.main_menu(), parse_mode="Markdown")
@@ -73,6 +99,8 @@ async def delete_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     task_id = int(query.data.split("_")[2])
     db.delete_task(task_id)
+    command_bus.publish("task_deleted", task_id)
+    view_cache.invalidate(update.effective_user.id)
     
     await query.edit_message_text("🗑️ **Task Deleted.**\n\nTask and all associated history have been removed from the database.", reply_markup=Menu.main_menu(), parse_mode="Markdown")
     return BotState.START
@@ -130,10 +158,10 @@ async def receive_source_platform(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
     
-    platform = query.data.split("_")[1]
+    platform = query.data.split("_", 1)[1]
     context.user_data['new_source_platform'] = platform
     
-    if platform == "twitter_rss":
+    if platform in ("twitter_rss", "twitter"):
         prompt = (
             "🐦 **Twitter Source Details**\n\n"
             "Please provide the **Twitter Username** you want to mirror.\n"
@@ -149,60 +177,79 @@ async def receive_source_platform(update: Update, context: ContextTypes.DEFAULT_
     return BotState.ENTER_SOURCE_ID
 
 async def receive_source_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Receives and validates source ID with real-time verification."""
+    """Receives the source ID and verifies it in the background so the bot stays responsive."""
     source_id = update.message.text.strip().replace("@", "")
     platform = context.user_data.get('new_source_platform')
     
-    status_msg = await update.message.reply_text(f"🔍 **Verifying {platform.replace('_', ' ').title()} Source...**", parse_mode="Markdown")
-    
-    try:
-        if platform == "twitter_rss":
-            if not re.match(r"^[\w]{1,15}$", source_id):
-                await status_msg.edit_text("❌ **Invalid Twitter username.**\nPlease try again (e.g. `binance`):")
-                return BotState.ENTER_SOURCE_ID
-            
-            # Simple reachability check via RSS
-            rss = RSSSource()
-            items = rss.fetch_latest(source_id)
-            if not items:
-                await status_msg.edit_text("⚠️ **Source unreachable via RSS.**\nThis user might be private or Nitter mirrors are down. Do you want to proceed anyway or try another ID?")
-                # We let them proceed but warn
-        
-        elif platform == "twitter":
-            tw_user = db.get_setting("TWITTER_USERNAME")
-            tw_pass = db.get_setting("TWITTER_PASSWORD")
-            if not (tw_user and tw_pass):
-                await status_msg.edit_text("❌ **Twitter Credentials Missing.**\nPlease set your username and password in **Settings** first.", reply_markup=Menu.main_menu())
-                return BotState.START
-            
-            tw_src = TwikitSource(tw_user, tw_pass)
-            await tw_src.fetch_latest(source_id) # This will verify login and user existence
-            
-        elif platform == "telegram":
-            try:
-                chat = await context.bot.get_chat(update.message.text.strip())
-                source_id = chat.id
-                await status_msg.edit_text(f"✅ **Verified Channel:** {chat.title}")
-            except Exception as e:
-                await status_msg.edit_text(f"❌ **Telegram Error:** {e}\n\nMake sure the bot is in the channel or the ID is correct.")
-                return BotState.ENTER_SOURCE_ID
+    if platform in ("twitter_rss", "twitter"):
+        if not re.match(r"^[\w]{1,15}$", source_id):
+            await update.message.reply_text("❌ **Invalid Twitter username.**\nPlease try again (e.g. `binance`):", parse_mode="Markdown")
+            return BotState.ENTER_SOURCE_ID
+
+        if platform == "twitter" and not (db.get_setting("TWITTER_USERNAME") and db.get_setting("TWITTER_PASSWORD")):
+            await update.message.reply_text("❌ **Twitter Credentials Missing.**\nPlease set your username and password in **Settings** first.", reply_markup=Menu.main_menu(), parse_mode="Markdown")
+            return BotState.START
 
         context.user_data['new_source_id'] = source_id
-        await status_msg.edit_text(f"🎯 **Source Verified:** `@{source_id if isinstance(source_id, str) else source_id}`\n\n**Step 3: Destination Platform**\nWhere should the AI content be published?", 
-                                 reply_markup=Menu.platform_selection("dest"), parse_mode="Markdown")
+        cached = source_prober.cached(platform, source_id)
+        if cached:
+            await update.message.reply_text(_source_probe_text(source_id, cached), reply_markup=Menu.platform_selection("dest"), parse_mode="Markdown")
+            return BotState.SELECT_DEST_PLATFORM
+
+        # Reply right away; the probe edits this message when it resolves
+        status_msg = await update.message.reply_text(
+            f"🔍 **Verifying `@{source_id}` in the background...**\n\n"
+            "**Step 3: Destination Platform**\nYou can already choose where the AI content should be published:",
+            reply_markup=Menu.platform_selection("dest"), parse_mode="Markdown"
+        )
+        probe_token = object()
+        context.user_data['source_probe'] = probe_token
+        context.application.create_task(
+            _finish_source_probe(status_msg, platform, source_id, context.user_data, probe_token)
+        )
         return BotState.SELECT_DEST_PLATFORM
 
+    # Telegram: resolving the chat is a single API call, bounded by the probe budget
+    status_msg = await update.message.reply_text("🔍 **Verifying Telegram Source...**", parse_mode="Markdown")
+    try:
+        chat = await asyncio.wait_for(context.bot.get_chat(update.message.text.strip()), timeout=source_prober.budget)
     except Exception as e:
-        await status_msg.edit_text(f"❌ **Verification Failed:** {e}\n\nPlease check the identifier and try again.")
+        await status_msg.edit_text(f"❌ **Telegram Error:** {e}\n\nMake sure the bot is in the channel or the ID is correct.")
         return BotState.ENTER_SOURCE_ID
 
+    context.user_data['new_source_id'] = chat.id
+    await status_msg.edit_text(f"✅ **Verified Channel:** {chat.title} (`{chat.id}`)\n\n**Step 3: Destination Platform**\nWhere should the AI content be published?", 
+                             reply_markup=Menu.platform_selection("dest"), parse_mode="Markdown")
+    return BotState.SELECT_DEST_PLATFORM
+
+def _source_probe_text(source_id: str, result) -> str:
+    if result.ok:
+        head = f"🎯 **Source Verified:** `@{source_id}` ({result.detail})"
+    else:
+        head = (f"⚠️ **Source unreachable right now:** `@{source_id}`\n_{result.detail}_\n"
+                "You can still continue; the engine will keep retrying.")
+    return f"{head}\n\n**Step 3: Destination Platform**\nWhere should the AI content be published?"
+
+async def _finish_source_probe(status_msg, platform: str, source_id: str, user_data: dict, probe_token: object):
+    """Edits the progress message with the probe result, unless the user has moved on."""
+    result = await source_prober.probe(platform, source_id)
+    if user_data.get('source_probe') is not probe_token:
+        return
+    user_data.pop('source_probe', None)
+    try:
+        await status_msg.edit_text(_source_probe_text(source_id, result), reply_markup=Menu.platform_selection("dest"), parse_mode="Markdown")
+    except Exception as e:
+        logger.warning(f"[Verify] Could not update probe message: {e}")
+
 async def receive_dest_platform(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Stores destination platform and asks for identifier."""
     query = update.callback_query
     await query.answer()
     
-    platform = query.data.split("_")[1]
+    platform = query.data.split("_", 1)[1]
     context.user_data['new_dest_platform'] = platform
+    # The user moved on; a late source probe must not overwrite this message
+    context.user_data.pop('source_probe', None)
     
     if platform == "twitter":
         prompt = "🐦 Enter the **Twitter Account** (handle) to publish to:"
@@ -287,9 +334,15 @@ async def commit_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query.data == "task_create_confirm":
         # Final Save
         task_name = context.user_data['new_task_name']
-        task_id = db.create_task(task_name, update.effective_user.id)
-        db.add_source(task_id, context.user_data['new_source_platform'], context.user_data['new_source_id'])
-        db.add_destination(task_id, context.user_data['new_dest_platform'], context.user_data['new_dest_id'])
+        # Task, source and destination are written in a single transaction
+        task_ids = db.bulk_create_tasks(update.effective_user.id, [{
+            "name": task_name,
+            "options": {"ai_options": {}},
+            "sources": [(context.user_data['new_source_platform'], context.user_data['new_source_id'])],
+            "destinations": [(context.user_data['new_dest_platform'], context.user_data['new_dest_id'])],
+        }])
+        command_bus.publish("task_created", task_ids[0])
+        view_cache.invalidate(update.effective_user.id)
         
         success_msg = (
             f"🎉 **Success! Task Created.**\n\n"
@@ -0,0 +1,66 @@
+# bot/handlers/transfer.py
+
+import asyncio
+import io
+import tempfile
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+from bot.cache import view_cache
+from bot.handlers.admin import is_admin
+from bot.menu import Menu
+from services.logger import logger
+from services.task_io import TaskImportError, export_tasks_async, parse_tasks, save_tasks
+
+# Telegram bots can only download files up to 20 MB
+MAX_IMPORT_BYTES = 20 * 1024 * 1024
+
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Imports tasks from an uploaded .yaml/.yml/.json document."""
+    if not is_admin(update):
+        return
+    document = update.message.document
+    if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+        await update.message.reply_text("❌ **Import Failed:** file is larger than 20 MB.", parse_mode="Markdown")
+        return
+
+    status_msg = await update.message.reply_text("⏳ **Importing tasks...**", parse_mode="Markdown")
+    try:
+        tg_file = await document.get_file()
+        data = bytes(await tg_file.download_as_bytearray()).decode("utf-8")
+        # Parsing is CPU-bound, so it runs in a thread; the insert stays on the loop,
+        # which owns the shared database connection
+        tasks = await asyncio.to_thread(parse_tasks, data)
+        count = save_tasks(tasks, update.effective_user.id)
+    except (TaskImportError, UnicodeDecodeError) as e:
+        await status_msg.edit_text(f"❌ **Import Failed:** {escape_markdown(str(e))}\n\nNothing was saved.", parse_mode="Markdown")
+        return
+    except Exception as e:
+        logger.error(f"[Transfer] Import failed: {e}", exc_info=True)
+        await status_msg.edit_text("❌ **Import Failed.** The database rejected the batch; nothing was saved.", parse_mode="Markdown")
+        return
+
+    view_cache.invalidate(update.effective_user.id)
+    await status_msg.edit_text(
+        f"✅ **Import Complete!**\n\n{count} tasks were created; the engines pick up the active ones right away.",
+        reply_markup=Menu.main_menu(),
+        parse_mode="Markdown"
+    )
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/export [json] - sends all tasks as a YAML (default) or JSON document."""
+    if not is_admin(update):
+        return
+    fmt = "json" if context.args and context.args[0].lower() == "json" else "yaml"
+
+    # Stream into a spooled temp file so large exports don't sit in memory
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+b") as fh:
+        out = io.TextIOWrapper(fh, encoding="utf-8", write_through=True)
+        count = await export_tasks_async(update.effective_user.id, out, fmt)
+        out.detach()
+        fh.seek(0)
+        await update.message.reply_document(
+            document=fh,
+            filename=f"tasks.{fmt}",
+            caption=f"📦 {count} tasks exported. Send this file back to import it on any deployment."
+        )
@@ -30,12 +30,21 @@ class Menu:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
-    def task_list(tasks: List[Dict[str, Any]]):
+    def task_list(page: Dict[str, Any]):
         keyboard = []
+        tasks = page['tasks']
         for task in tasks:
             status = "🟢" if task['is_active'] else "🟡"
             keyboard.append([InlineKeyboardButton(f"{status} {task['name']}", callback_data=f"tasks_manage_{task['id']}")])
-        
+
+        nav = []
+        if tasks and page['has_prev']:
+            nav.append(InlineKeyboardButton("◀️ Previous", callback_data=f"tasks_prev_{tasks[0]['id']}"))
+        if tasks and page['has_next']:
+            nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"tasks_next_{tasks[-1]['id']}"))
+        if nav:
+            keyboard.append(nav)
+
         keyboard.append([InlineKeyboardButton("➕ Add Another Task", callback_data="tasks_add")])
         keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu_main")])
         return InlineKeyboardMarkup(keyboard)
@@ -0,0 +1,81 @@
+# bot/verification.py
+
+import asyncio
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+from database.manager import db
+from providers import source_class
+from services.logger import logger
+
+class ProbeResult(NamedTuple):
+    ok: bool
+    detail: str
+
+class SourceProber:
+    """Runs source reachability probes in the background with a strict time budget.
+
+    Results are cached briefly so repeated attempts for the same handle don't hit
+    the mirrors again, and concurrent probes for the same source share one run.
+    """
+
+    def __init__(self, budget: float = 12.0, ttl: float = 300.0):
+        self.budget = budget
+        self.ttl = ttl
+        self._cache: Dict[Tuple[str, str], Tuple[ProbeResult, float]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._rss = None
+
+    def _rss_source(self):
+        # One shared instance, so mirrors are registered once rather than per probe
+        if self._rss is None:
+            self._rss = source_class("twitter_rss")()
+        return self._rss
+
+    def cached(self, platform: str, identifier: str) -> Optional[ProbeResult]:
+        entry = self._cache.get((platform, identifier.lower()))
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    async def probe(self, platform: str, identifier: str) -> ProbeResult:
+        key = (platform, identifier.lower())
+        result = self.cached(platform, identifier)
+        if result:
+            return result
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(platform, identifier))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=self.budget)
+        except asyncio.TimeoutError:
+            # The probe keeps running and fills the cache for the next attempt
+            return ProbeResult(False, f"no answer within {self.budget:.0f}s")
+
+    def _finish(self, key: Tuple[str, str], task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._cache[key] = (task.result(), time.monotonic())
+
+    async def _run(self, platform: str, identifier: str) -> ProbeResult:
+        try:
+            if platform == "twitter_rss":
+                items = await self._rss_source().fetch_latest(identifier)
+                if items:
+                    return ProbeResult(True, f"{len(items)} recent posts found")
+                return ProbeResult(False, "user might be private or Nitter mirrors are down")
+
+            if platform == "twitter":
+                tw_src = source_class("twitter")(db.get_setting("TWITTER_USERNAME"), db.get_setting("TWITTER_PASSWORD"))
+                items = await tw_src.fetch_latest(identifier)
+                return ProbeResult(True, f"{len(items)} recent posts found")
+
+            return ProbeResult(True, "no probe required")
+        except Exception as e:
+            logger.warning(f"[Verify] Probe for {platform}:{identifier} failed: {e}")
+            return ProbeResult(False, str(e)[:200])
+
+# Global Instance
+source_prober = SourceProber()
@@ -0,0 +1,70 @@
+# bot/webhook.py
+
+import hashlib
+import hmac
+from telegram import Update
+from telegram.ext import Application
+from services.logger import logger
+from services.metrics import metrics
+from services.web import Request, Response, WebServer
+
+WEBHOOK_UPDATES = metrics.counter("webhook_updates_total", "Webhook requests by result", ["result"])
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+def default_secret(token: str) -> str:
+    """Stable per-bot secret, so restarts don't need a shared WEBHOOK_SECRET."""
+    return hashlib.sha256(f"webhook:{token}".encode()).hexdigest()[:48]
+
+class WebhookReceiver:
+    """Feeds Telegram webhook POSTs into the Application's update queue.
+
+    Requests without the secret token Telegram was given in setWebhook are
+    rejected. Accepted updates are acknowledged at once; the Application
+    processes them exactly as it would polled ones.
+    """
+
+    def __init__(self, application: Application, secret_token: str):
+        self.application = application
+        self.secret_token = secret_token
+
+    async def handle(self, request: Request) -> Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret_token):
+            WEBHOOK_UPDATES.labels(result="forbidden").inc()
+            return Response(403, b"forbidden")
+        try:
+            update = Update.de_json(request.json(), self.application.bot)
+        except Exception as e:
+            WEBHOOK_UPDATES.labels(result="invalid").inc()
+            logger.warning(f"[Webhook] Rejected malformed update: {e}")
+            return Response(400, b"bad update")
+        if update is None:
+            WEBHOOK_UPDATES.labels(result="invalid").inc()
+            return Response(400, b"bad update")
+
+        await self.application.update_queue.put(update)
+        WEBHOOK_UPDATES.labels(result="accepted").inc()
+        return Response(200, b"ok")
+
+async def start_webhook(application: Application, server: WebServer, url: str, path: str,
+                        secret_token: str, max_connections: int = 40) -> WebhookReceiver:
+    """Starts the Application without an Updater, routes `path` on `server` to it
+    and registers the public `url` with Telegram."""
+    receiver = WebhookReceiver(application, secret_token)
+    server.route("POST", path, receiver.handle)
+    await application.initialize()
+    await application.start()
+    await server.start()
+    await application.bot.set_webhook(
+        url=url,
+        secret_token=secret_token,
+        max_connections=max_connections,
+        allowed_updates=Update.ALL_TYPES,
+    )
+    logger.info(f"[Webhook] Receiving updates at {url} (max {max_connections} connections)")
+    return receiver
+
+async def stop_webhook(application: Application):
+    """Stops processing; the webhook stays registered so Telegram queues updates meanwhile."""
+    if application.running:
+        await application.stop()
+    await application.shutdown()
@@ -0,0 +1,89 @@
+# core/delivery.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from services.logger import logger
+
+DeliveryHandler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Any]]
+
+
+class DestinationQueue:
+    """Ordered delivery queue for a single destination, drained by its own worker."""
+
+    def __init__(self, key: Tuple[str, str], handler: DeliveryHandler, limit: int = 100):
+        self.key = key
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=limit)
+        self._handler = handler
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.key[0]}:{self.key[1]}"
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run(), name=f"delivery-{self.name}")
+
+    async def put(self, dest: Dict[str, Any], payload: Dict[str, Any]):
+        """Enqueues a payload. Blocks (backpressure) while the queue is at its limit."""
+        if self.queue.full():
+            logger.warning(f"[Delivery] Queue for {self.name} is full ({self.queue.maxsize}). Applying backpressure...")
+        await self.queue.put((dest, payload))
+
+    async def _run(self):
+        while True:
+            dest, payload = await self.queue.get()
+            try:
+                await self._handler(dest, payload)
+            except Exception as e:
+                logger.error(f"[Delivery] Publish to {self.name} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def join(self):
+        await self.queue.join()
+
+    async def stop(self):
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+
+class DeliveryDispatcher:
+    """Fans items out to per-destination queues so a slow target never stalls the others."""
+
+    def __init__(self, handler: DeliveryHandler, limit: int = 100):
+        self._handler = handler
+        self._limit = limit
+        self._queues: Dict[Tuple[str, str], DestinationQueue] = {}
+
+    @staticmethod
+    def destination_key(dest: Dict[str, Any]) -> Tuple[str, str]:
+        return (dest['platform'], str(dest['identifier']))
+
+    def _queue_for(self, dest: Dict[str, Any]) -> DestinationQueue:
+        key = self.destination_key(dest)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = DestinationQueue(key, self._handler, self._limit)
+            self._queues[key] = queue
+        queue.start()
+        return queue
+
+    async def dispatch(self, deliveries: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Hands every (destination, payload) pair to its queue at once."""
+        await asyncio.gather(*[self._queue_for(d).put(d, payload) for d, payload in deliveries])
+
+    def pending(self) -> Dict[str, int]:
+        return {q.name: q.queue.qsize() for q in self._queues.values()}
+
+    async def join(self):
+        await asyncio.gather(*[q.join() for q in self._queues.values()])
+
+    async def stop(self):
+        await asyncio.gather(*[q.stop() for q in self._queues.values()])
+        self._queues.clear()
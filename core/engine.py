@@ -1,64 +1,223 @@
 # core/engine.py
 
 import asyncio
-from typing import List, Dict, Any
+import json
+import mimetypes
+import time
+from typing import List, Dict, Any, Optional, Set, Tuple
 from telegram import Bot
-from database.manager import db
+from telegram.request import HTTPXRequest
+from database.manager import LeaseLostError, db
 from services.logger import logger
 from services.ai_service import ai_service
-from providers.sources.rss import RSSSource
-from providers.sources.twitter import TwikitSource
-from providers.sources.telegram import TelegramSource
-from providers.publishers.telegram import TelegramPublisher
-from providers.publishers.twitter import TwitterPublisher
+from services.config_service import config
+from services.media_cache import media_cache
+from services.media_urls import parse_telegram_file_ref
+from core.delivery import DeliveryDispatcher
+from core.leases import LeaseManager
+from services.command_bus import Command, command_bus
+from services.metrics import metrics, timed
+from services.tracing import tracer
+from providers import publisher_class, source_class
+
+FETCH_SECONDS = metrics.histogram("source_fetch_seconds", "Source fetch latency per platform", ["platform"])
+CYCLE_SECONDS = metrics.histogram("engine_cycle_seconds", "Duration of one process_all_tasks cycle",
+                                  buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+ITEMS_SEEN = metrics.counter("items_seen_total", "Items returned by sources", ["platform"])
+ITEMS_DEDUPED = metrics.counter("items_deduped_total", "Items skipped as already processed", ["platform"])
+ITEMS_PUBLISHED = metrics.counter("items_published_total", "Deliveries published", ["platform"])
+DELIVERIES_FAILED = metrics.counter("deliveries_failed_total", "Failed delivery attempts", ["platform"])
+QUEUE_DEPTH = metrics.gauge("delivery_queue_depth", "Deliveries waiting in the in-memory destination queues")
+
+# Commands after which the engine rebalances its leases
+TASK_COMMANDS = ("task_created", "task_paused", "task_resumed", "task_deleted", "tasks_imported")
 
 class ProcessingEngine:
-    def __init__(self, telegram_token: str):
-        self.bot = Bot(telegram_token)
-        self.rss = RSSSource()
-        self.tg_src = TelegramSource(self.bot)
-        self.tw_src = None # Lazy-init per task if needed
+    def __init__(self, telegram_token: str, worker_id: Optional[str] = None):
+        # TELEGRAM_API_URL points the bot at a local Bot API server (or a benchmark stand-in).
+        # The engine's bot is never initialize()d, so it keeps its HTTP pools to close them on stop
+        self._requests = (HTTPXRequest(connection_pool_size=1), HTTPXRequest())
+        self.bot = Bot(telegram_token, base_url=config.get("TELEGRAM_API_URL", "https://api.telegram.org/bot"),
+                       get_updates_request=self._requests[0], request=self._requests[1])
+        # Shared source instances, created (and their modules imported) on first use
+        self._sources: Dict[str, Any] = {}
+        # twikit source/publisher for the stored credentials, kept logged in between runs
+        self._twitter: Dict[str, Any] = {}
+        self.delivery = DeliveryDispatcher(
+            self._deliver,
+            limit=int(config.get("DELIVERY_QUEUE_LIMIT", "100"))
+        )
+        self.max_attempts = int(config.get("OUTBOX_MAX_ATTEMPTS", "6"))
+        self.retry_base = float(config.get("OUTBOX_RETRY_BASE", "30"))
+        # Task ownership: a lone engine leases every task, several split them
+        self.leases = LeaseManager(worker_id, ttl=float(config.get("LEASE_TTL", "180")))
         self._loop_active = False
+        self._stopping = False
+        self._stop_requested = asyncio.Event()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # One run per task at a time; wake-ups that arrive meanwhile coalesce into one rerun
+        self._task_locks: Dict[int, asyncio.Lock] = {}
+        self._wakeups: Set[int] = set()
+        # Task runs in progress, drained on stop
+        self._runs: Set[asyncio.Task] = set()
+        QUEUE_DEPTH.labels().set_function(lambda: sum(self.delivery.pending().values()))
 
     async def start(self, interval: int = 60):
         """Starts the background monitoring loop."""
         self._loop_active = True
         logger.info(f"[Engine] Starting processing loop with interval: {interval}s")
-        
+        # Registering returns anything this worker queued before a restart to the outbox
+        self.leases.heartbeat()
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._keep_leases())
+        # Admin changes and captured posts (from this or a bot process) apply right away
+        command_bus.subscribe(self.handle_command)
+
         while self._loop_active:
             try:
+                await self.resume_deliveries()
                 await self.process_all_tasks()
+                tracer.flush()
             except Exception as e:
                 logger.error(f"[Engine] Loop error: {e}")
-            
-            await asyncio.sleep(interval)
 
-    async def stop(self):
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping
+
+    async def wait_stopped(self, timeout: float) -> bool:
+        """Sleeps up to `timeout` seconds; returns early (True) once stop() was called."""
+        try:
+            await asyncio.wait_for(self._stop_requested.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._stopping
+
+    async def stop(self, timeout: float = 25.0):
+        """Graceful shutdown within `timeout` seconds.
+
+        No new task runs or items are started. Items already being transformed finish
+        and go to the outbox, and queued deliveries are sent while time remains. On
+        the deadline, runs still busy are cancelled (their items stay unprocessed
+        and are fetched again) and unsent deliveries stay in the outbox, handed back
+        with the leases so the next owner neither re-runs the AI nor loses a post.
+        """
+        if self._stopping:
+            return
+        self._stopping = True
         self._loop_active = False
+        self._stop_requested.set()
+        command_bus.unsubscribe(self.handle_command)
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+        deadline = time.monotonic() + timeout
+
+        runs = [r for r in self._runs if not r.done()]
+        if runs:
+            logger.info(f"[Engine] Stopping: finishing items in flight for {len(runs)} tasks...")
+            _, busy = await asyncio.wait(runs, timeout=max(0.0, deadline - time.monotonic()))
+            for run in busy:
+                run.cancel()
+            if busy:
+                await asyncio.gather(*busy, return_exceptions=True)
+                logger.warning(f"[Engine] Cancelled {len(busy)} task runs at the shutdown deadline")
+
+        try:
+            await asyncio.wait_for(self.delivery.join(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            left = sum(self.delivery.pending().values())
+            logger.warning(f"[Engine] {left} queued deliveries left in the outbox for the next worker")
+        await self.delivery.stop()
+
+        tracer.flush()
+        await self._close_clients()
+        self.leases.release_all()
+        logger.info("[Engine] Stopped.")
+
+    async def _close_clients(self):
+        closers = [c.close() for c in self._twitter.values()]
+        closers += [r.shutdown() for r in self._requests]
+        for result in await asyncio.gather(*closers, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"[Engine] Error closing a client: {result}")
+        self._twitter.clear()
+
+    async def _keep_leases(self):
+        """Renews leases between cycles so a long cycle doesn't let them expire."""
+        while True:
+            await asyncio.sleep(self.leases.ttl / 3)
+            try:
+                self.leases.heartbeat()
+            except Exception as e:
+                logger.warning(f"[Engine] Lease heartbeat failed: {e}")
+
+    async def resume_deliveries(self):
+        """Re-queues outbox entries due for (re)delivery without re-running the AI."""
+        rows = db.claim_due_deliveries(worker_id=self.leases.worker_id)
+        if rows:
+            logger.info(f"[Engine] Resuming {len(rows)} pending deliveries from the outbox.")
+            await self.delivery.dispatch([self._outbox_delivery(r) for r in rows])
 
+    @timed(CYCLE_SECONDS)
     async def process_all_tasks(self):
-        """Fetches and processes all active tasks concurrently."""
-        tasks = db.get_tasks()
-        active_tasks = [t for t in tasks if t['is_active']]
+        """Fetches and processes this worker's leased tasks concurrently."""
+        leased = self.leases.refresh()
         
-        if not active_tasks:
+        if not leased or self._stopping:
             return
 
         # Process all tasks in parallel with error isolation
-        logger.debug(f"[Engine] Processing {len(active_tasks)} active tasks...")
+        logger.debug(f"[Engine] Processing {len(leased)} leased tasks...")
         await asyncio.gather(
-            *[self._safe_process_task(t['id']) for t in active_tasks],
+            *[self._run_task(task_id) for task_id in sorted(leased)],
             return_exceptions=True
         )
 
-    async def _safe_process_task(self, task_id: int):
+    def handle_command(self, command: Command):
+        """Applies a command from the bot front-end without waiting for the next cycle."""
+        if command.name == "source_items":
+            self.notify_source(command.payload["platform"], command.payload["identifier"])
+        elif command.name in TASK_COMMANDS:
+            # Pausing or deleting drops the lease, so running items stop at the fence;
+            # new and resumed tasks are claimed and fetched at once
+            before = set(self.leases.owned)
+            for task_id in sorted(set(self.leases.refresh()) - before):
+                self._wake(task_id)
+
+    def notify_source(self, platform: str, identifier: str):
+        """Schedules an immediate run of the leased tasks that watch this source."""
+        for task_id in db.get_task_ids_for_source(platform, identifier):
+            if task_id in self.leases.owned:
+                self._wake(task_id)
+
+    def _wake(self, task_id: int):
+        if task_id not in self._wakeups and not self._stopping:
+            self._wakeups.add(task_id)
+            self._run_task(task_id, wakeup=True)
+
+    def _run_task(self, task_id: int, wakeup: bool = False) -> asyncio.Task:
+        run = asyncio.get_running_loop().create_task(self._safe_process_task(task_id, wakeup))
+        self._runs.add(run)
+        run.add_done_callback(self._runs.discard)
+        return run
+
+    async def _safe_process_task(self, task_id: int, wakeup: bool = False):
         """Wraps process_task with high-level crash protection and data refresh."""
-        try:
-            task = db.get_task_details(task_id)
-            if task:
-                await self.process_task(task)
-        except Exception as e:
-            logger.error(f"[Engine] Task ID {task_id} crashed: {e}", exc_info=True)
+        lock = self._task_locks.setdefault(task_id, asyncio.Lock())
+        async with lock:
+            if wakeup:
+                self._wakeups.discard(task_id)
+            try:
+                task = db.get_task_details(task_id)
+                if task:
+                    await self.process_task(task)
+            except Exception as e:
+                logger.error(f"[Engine] Task ID {task_id} crashed: {e}", exc_info=True)
 
     async def process_task(self, task: Dict[str, Any]):
         """Processes a single task: Fetch -> Transform -> Publish."""
@@ -74,26 +233,74 @@ class ProcessingEngine:
         )
 
         all_new_items = []
+        # Items handled per source, acknowledged to sources that track consumption
+        handled: Dict[int, List[str]] = {}
         for i, result in enumerate(source_results):
             if isinstance(result, Exception):
                 logger.error(f"[Engine] Source fetch failed: {result}")
                 continue
             
-            source_id = sources[i]['id']
+            platform = sources[i]['platform']
+            handled[i] = []
+            ITEMS_SEEN.labels(platform=platform).inc(len(result))
             for item in result:
-                if not db.is_item_processed(task_id, source_id, item.id):
-                    all_new_items.append((source_id, item))
-
-        if not all_new_items:
-            return
+                if not db.is_item_processed(task_id, item.id):
+                    item.trace = tracer.start(task_id, item)
+                    all_new_items.append((i, item))
+                else:
+                    handled[i].append(item.id)
+                    ITEMS_DEDUPED.labels(platform=platform).inc()
 
         # Sort by timestamp to preserve order
         all_new_items.sort(key=lambda x: x[1].timestamp)
 
-        # 2. Process items (Sequentially to respect time order, but parallel destinations)
-        for source_id, item in all_new_items:
-            await self._process_item(task, source_id, item, destinations)
+        # 2. Process items sequentially to respect time order; delivery is handed off
+        # to per-destination queues so a slow target doesn't hold back the rest.
+        try:
+            for i, item in all_new_items:
+                if self._stopping:
+                    # Checkpoint: the rest stays unprocessed and is fetched again after the restart
+                    break
+                if await self._process_item(task, sources[i]['id'], item, destinations):
+                    handled[i].append(item.id)
+        except LeaseLostError as e:
+            # Paused, deleted, or owned by another worker now, which picks the remaining items up
+            logger.warning(f"[Engine] Task {task_id} stopped: {e}")
+        finally:
+            self._ack(sources, handled)
 
+    def _ack(self, sources: List[Dict[str, Any]], handled: Dict[int, List[str]]):
+        """Bulk-acknowledges handled items to sources that track consumption."""
+        for i, item_ids in handled.items():
+            platform = sources[i]['platform']
+            if not item_ids or not hasattr(source_class(platform), "ack"):
+                continue
+            try:
+                self._source(platform).ack(sources[i]['id'], sources[i]['identifier'], item_ids)
+            except Exception as e:
+                logger.warning(f"[Engine] Could not acknowledge {len(item_ids)} {platform} items: {e}")
+
+    def _source(self, platform: str):
+        src = self._sources.get(platform)
+        if src is None:
+            cls = source_class(platform)
+            src = self._sources[platform] = cls(self.bot) if platform == "telegram" else cls()
+        return src
+
+    def _twitter_client(self, kind: str) -> Optional[Any]:
+        """The twikit source or publisher for the stored credentials; None without them."""
+        username, password = db.get_setting("TWITTER_USERNAME"), db.get_setting("TWITTER_PASSWORD")
+        if not (username and password):
+            return None
+        client = self._twitter.get(kind)
+        if client is None or (client.username, client.password) != (username, password):
+            if client is not None:
+                asyncio.get_running_loop().create_task(client.close())
+            cls = source_class("twitter") if kind == "source" else publisher_class("twitter")
+            client = self._twitter[kind] = cls(username, password)
+        return client
+
+    @timed(FETCH_SECONDS, lambda self, source: {"platform": source['platform']})
     async def _fetch_from_source(self, source: Dict[str, Any]) -> List[Any]:
         """Isolated source fetching logic with automatic fallback."""
         platform = source['platform']
@@ -101,74 +308,152 @@ class ProcessingEngine:
         
         try:
             if platform == "twitter_rss":
-                return self.rss.fetch_latest(identifier)
+                return await self._source("twitter_rss").fetch_latest(identifier)
             elif platform == "twitter":
-                tw_user = db.get_setting("TWITTER_USERNAME")
-                tw_pass = db.get_setting("TWITTER_PASSWORD")
-                if tw_user and tw_pass:
+                tw_src = self._twitter_client("source")
+                if tw_src:
                     try:
-                        tw_src = TwikitSource(tw_user, tw_pass)
                         return await tw_src.fetch_latest(identifier)
                     except Exception as e:
                         logger.warning(f"[Engine] Direct Twitter fetch failed for {identifier}: {e}. Falling back to RSS...")
-                        return self.rss.fetch_latest(identifier)
+                        return await self._source("twitter_rss").fetch_latest(identifier)
                 else:
                     logger.warning(f"[Engine] Twitter credentials missing. Using RSS as default for {identifier}.")
-                    return self.rss.fetch_latest(identifier)
+                    return await self._source("twitter_rss").fetch_latest(identifier)
             elif platform == "telegram":
-                return await self.tg_src.fetch_latest(identifier)
+                return await self._source("telegram").fetch_latest(identifier, source_id=source['id'])
         except Exception as e:
             logger.error(f"[Engine] Source {platform}:{identifier} critical failure: {e}")
             
         return []
 
-    async def _process_item(self, task: Dict[str, Any], source_id: int, item: Any, destinations: List[Dict[str, Any]]):
-        """Processes a single item and publishes to all destinations."""
-        task_id = task['id']
-        task_config = task.get('config', {})
+    async def _process_item(self, task: Dict[str, Any], source_id: int, item: Any, destinations: List[Dict[str, Any]]) -> bool:
+        """Transforms a single item and hands it to every destination queue. Returns True once it is in the outbox."""
+        task_config = task.get('options') or {}
         
         try:
-            logger.info(f"[Engine] Task {task['name']}: Processing item {item.id}")
+            # A task paused or deleted mid-run has lost its lease; skip the AI call too
+            if self.leases.lease(task['id']) is None:
+                raise LeaseLostError(f"task {task['id']} is not leased by {self.leases.worker_id}")
+            logger.info(f"[Engine] Task {task['name']}: Processing item {item.id}", stage="engine.item",
+                        task_id=task['id'], source=item.author)
             
-            # AI Transformation
             ai_options = task_config.get('ai_options', {})
-            # Offload CPU-bound/blocking AI to thread if necessary, 
-            # but Groq is mostly network-bound
-            processed_text = ai_service.process_content(item.text, ai_options)
-            
-            # 3. Publish to all destinations concurrently
-            pub_results = await asyncio.gather(
-                *[self._publish_to_destination(dest, processed_text, item.media_urls) for dest in destinations],
-                return_exceptions=True
-            )
+            if ai_service.is_enabled(ai_options):
+                # AI Transformation
+                processed_text = await ai_service.process_content(item.text, ai_options)
+                payload = {"text": processed_text, "media_urls": item.media_urls}
+            else:
+                # Untransformed: Telegram destinations can copy the original post server-side
+                payload = {"text": item.text, "media_urls": item.media_urls}
+                if item.chat_id and item.message_ids:
+                    payload["copy_from"] = {"chat_id": item.chat_id, "message_ids": item.message_ids}
             
-            for res in pub_results:
-                if isinstance(res, Exception):
-                    logger.error(f"[Engine] Destination publish crash: {res}")
+            if item.trace:
+                item.trace.mark("transformed")
+                payload["trace"] = item.trace.to_dict()
 
-            # 4. Success! Mark as processed
-            db.mark_item_processed(task_id, source_id, item.id)
+            # 3. Persist the payload per destination and mark the item processed atomically,
+            # fenced by the lease so only the task's current owner can commit it
+            lease = self.leases.lease(task['id'])
+            if lease is None:
+                raise LeaseLostError(f"task {task['id']} is not leased by {self.leases.worker_id}")
+            rows = db.enqueue_outbox(task['id'], source_id, item.id, destinations, payload, lease=lease)
+            deliveries = [self._outbox_delivery(r) for r in rows]
+            if item.trace:
+                # Stamped once the outbox commit is done, so it stays out of the stored payload
+                queued = time.time()
+                for _, entry in deliveries:
+                    entry['payload']['trace']['queued'] = queued
+
+            # 4. Hand off to all destination queues at once; each drains at its own pace
+            await self.delivery.dispatch(deliveries)
+            return True
             
+        except LeaseLostError:
+            raise
         except Exception as e:
-            logger.error(f"[Engine] Item processing failed: {e}", exc_info=True)
+            logger.error(f"[Engine] Item processing failed: {e}", exc_info=True, task_id=task['id'])
+            return False
+
+    @staticmethod
+    def _outbox_delivery(row: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        dest = {'id': row['destination_id'], 'platform': row['platform'], 'identifier': row['identifier']}
+        entry = {'id': row['id'], 'attempts': row['attempts'] or 0, 'payload': json.loads(row['payload'])}
+        return dest, entry
+
+    async def _deliver(self, dest: Dict[str, Any], entry: Dict[str, Any]):
+        """Publishes one outbox entry and records its delivery state."""
+        worker_id = self.leases.worker_id
+        target = f"{dest['platform']}:{dest['identifier']}"
+        # Re-checked in the database: a stalled worker may have been retired and its rows handed over
+        if not db.begin_delivery(entry['id'], worker_id):
+            logger.warning(f"[Engine] Delivery {entry['id']} to {target} is no longer ours; skipping.")
+            return
+        if entry['payload'].get('trace'):
+            entry['payload']['trace']['sending'] = time.time()
+        try:
+            await self._publish_to_destination(dest, entry['payload'])
+        except Exception as e:
+            DELIVERIES_FAILED.labels(platform=dest['platform']).inc()
+            attempts = entry['attempts'] + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"[Engine] Delivery {entry['id']} to {target} gave up after {attempts} attempts: {e}")
+                db.mark_delivery_failed(entry['id'], worker_id, str(e), None)
+            else:
+                delay = min(self.retry_base * (2 ** (attempts - 1)), 3600)
+                logger.warning(f"[Engine] Delivery {entry['id']} to {target} failed: {e}. Retrying in {delay:.0f}s...")
+                db.mark_delivery_failed(entry['id'], worker_id, str(e), time.time() + delay)
+            return
+
+        ITEMS_PUBLISHED.labels(platform=dest['platform']).inc()
+        if not db.mark_delivery_sent(entry['id'], worker_id):
+            logger.warning(f"[Engine] Delivery {entry['id']} to {target} was taken over while sending.")
+        if entry['payload'].get('trace'):
+            tracer.record(entry['payload']['trace'], target)
 
-    async def _publish_to_destination(self, dest: Dict[str, Any], text: str, media_urls: List[str]):
+    async def _cache_telegram_media(self, media_urls: List[str], max_bytes: int):
+        """Downloads captured Telegram files into the media cache under their tg-file refs,
+        so publishers for other platforms can fetch them like any URL."""
+        for ref in media_urls:
+            captured = parse_telegram_file_ref(ref)
+            if not captured or await media_cache.lookup(ref):
+                continue
+            kind, file_id = captured
+            try:
+                tg_file = await self.bot.get_file(file_id)
+                if tg_file.file_size and tg_file.file_size > max_bytes:
+                    logger.warning(f"[Engine] Telegram {kind} is too large to cross-post ({tg_file.file_size} bytes)")
+                    continue
+                data = bytes(await tg_file.download_as_bytearray())
+                # Downloads go through the bot's URL, which holds the token: only the ref is logged or cached
+                await media_cache.store(ref, data, mimetypes.guess_type(tg_file.file_path or "")[0])
+            except Exception as e:
+                logger.warning(f"[Engine] Could not download Telegram {kind} for cross-posting: {e}")
+
+    async def _publish_to_destination(self, dest: Dict[str, Any], payload: Dict[str, Any]):
         """Isolated publication logic."""
+        text = payload['text']
+        media_urls = payload.get('media_urls', [])
         dest_platform = dest['platform']
         dest_id = dest['identifier']
         
         if dest_platform == "telegram":
-            tg_pub = TelegramPublisher(self.bot)
-            success = await tg_pub.publish(dest_id, text, media_urls)
+            tg_pub = publisher_class("telegram")(self.bot)
+            copy_from = payload.get('copy_from')
+            if copy_from:
+                # Zero-copy fast path: nothing is downloaded or re-uploaded
+                success = await tg_pub.copy(dest_id, copy_from['chat_id'], copy_from['message_ids'])
+            else:
+                success = await tg_pub.publish(dest_id, text, media_urls)
             if not success:
                 raise Exception(f"Telegram publication failed for {dest_id}")
         elif dest_platform == "twitter":
-            tw_user = db.get_setting("TWITTER_USERNAME")
-            tw_pass = db.get_setting("TWITTER_PASSWORD")
-            if tw_user and tw_pass:
-                tw_pub = TwitterPublisher(tw_user, tw_pass)
+            tw_pub = self._twitter_client("publisher")
+            if tw_pub:
+                await self._cache_telegram_media(media_urls[:tw_pub.MAX_MEDIA], tw_pub.MAX_MEDIA_BYTES)
                 success = await tw_pub.publish(text, media_urls)
                 if not success:
                     raise Exception(f"Twitter publication failed for {dest_id}")
             else:
-                logger.error("[Engine] Twitter credentials missing for destination")
+                raise Exception("Twitter credentials missing for destination")
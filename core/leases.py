@@ -0,0 +1,82 @@
+# core/leases.py
+
+import math
+import os
+import socket
+import time
+from typing import Dict, Optional
+from database.manager import db
+from services.logger import logger
+from services.metrics import metrics
+
+LEASED_TASKS = metrics.gauge("engine_leased_tasks", "Tasks this worker currently holds leases for")
+LIVE_WORKERS = metrics.gauge("engine_live_workers", "Engine workers with a recent heartbeat")
+
+def default_worker_id() -> str:
+    # DYNO (e.g. "engine.2") is stable across Heroku restarts, so a restarted
+    # worker reclaims its own queued deliveries instead of waiting for expiry
+    return os.getenv("WORKER_ID") or os.getenv("DYNO") or f"{socket.gethostname()}-{os.getpid()}"
+
+class LeaseManager:
+    """Decides which tasks this engine processes when several workers share a database.
+
+    Every worker heartbeats into `workers` and holds time-limited leases in
+    `task_leases`. On each refresh it renews its leases, then moves toward its fair
+    share (active tasks / live workers): releasing the excess when workers join and
+    claiming free or expired leases when they leave. Each claim bumps the lease
+    epoch, which fences writes from a worker that lost the task.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, ttl: float = 180.0):
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl = ttl
+        self.owned: Dict[int, int] = {}
+        self.live_workers = 1
+        self._registered = False
+        LEASED_TASKS.labels().set_function(lambda: len(self.owned))
+        LIVE_WORKERS.labels().set_function(lambda: self.live_workers)
+
+    def lease(self, task_id: int) -> Optional[tuple]:
+        """(worker_id, epoch) for a held task, passed to db.enqueue_outbox as the fence."""
+        epoch = self.owned.get(task_id)
+        return (self.worker_id, epoch) if epoch is not None else None
+
+    def heartbeat(self) -> Dict[int, int]:
+        """Keeps the worker alive and its leases renewed without rebalancing."""
+        now = time.time()
+        if not self._registered:
+            db.register_worker(self.worker_id, now)
+            self._registered = True
+            logger.info(f"[Leases] Worker {self.worker_id} registered (lease TTL {self.ttl:.0f}s)")
+        self.live_workers = max(1, db.heartbeat_worker(self.worker_id, now, now - self.ttl))
+        self.owned = db.renew_leases(self.worker_id, now, now + self.ttl)
+        return self.owned
+
+    def refresh(self) -> Dict[int, int]:
+        """Heartbeats, then releases or claims leases to reach the fair share."""
+        previous = set(self.owned)
+        owned = dict(self.heartbeat())
+        share = math.ceil(db.count_active_tasks() / self.live_workers)
+
+        if len(owned) > share:
+            excess = sorted(owned, reverse=True)[:len(owned) - share]
+            db.release_leases(self.worker_id, excess)
+            for task_id in excess:
+                owned.pop(task_id)
+        elif len(owned) < share:
+            now = time.time()
+            owned.update(db.claim_leases(self.worker_id, share - len(owned), now, now + self.ttl))
+
+        gained, lost = set(owned) - previous, previous - set(owned)
+        if gained or lost:
+            logger.info(f"[Leases] {self.worker_id} holds {len(owned)} tasks "
+                        f"(+{len(gained)}/-{len(lost)}, {self.live_workers} live workers, share {share})")
+        self.owned = owned
+        return owned
+
+    def release_all(self):
+        """Clean shutdown: other workers can take over without waiting for expiry."""
+        if self._registered:
+            db.unregister_worker(self.worker_id)
+            self._registered = False
+        self.owned = {}
@@ -2,19 +2,59 @@
 
 import os
 import sqlite3
+import threading
 import json
-import psycopg2
-from psycopg2 import pool
+from contextlib import contextmanager
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from services.logger import logger
 
+# Items are deduplicated per task: two tasks watching the same source each get every post
+PROCESSED_ITEMS_TABLE = '''CREATE TABLE IF NOT EXISTS processed_items (
+                    task_id INTEGER,
+                    item_id TEXT,
+                    source_id INTEGER,
+                    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (task_id, item_id),
+                    FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
+                )'''
+
+# Postgres NOTIFY channel that wakes engine processes when a command is published
+COMMAND_CHANNEL = "engine_commands"
+
+class LeaseLostError(RuntimeError):
+    """Raised when a write is fenced off because the task lease moved to another worker."""
+
+class _CountingCursor:
+    """Cursor proxy that counts executed statements for benchmarks and metrics."""
+
+    def __init__(self, cursor, owner: "DatabaseManager"):
+        self._cursor = cursor
+        self._owner = owner
+
+    def execute(self, *args):
+        self._owner.statement_count += 1
+        return self._cursor.execute(*args)
+
+    def executemany(self, query, rows):
+        rows = rows if isinstance(rows, (list, tuple)) else list(rows)
+        self._owner.statement_count += len(rows)
+        return self._cursor.executemany(query, rows)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
 class DatabaseManager:
     def __init__(self, db_url: Optional[str] = None):
         self.db_url = db_url or os.getenv("DATABASE_URL")
         self.is_postgres = self.db_url and self.db_url.startswith("postgres")
         self._pool = None
         self._sqlite_conn = None
+        # Statements executed (each executemany row counts), for benchmarks and metrics
+        self.statement_count = 0
         
         if self.is_postgres:
             self._init_pool()
@@ -34,6 +74,8 @@ class DatabaseManager:
         return query
 
     def _init_pool(self):
+        # Only Postgres deployments pay for the driver import
+        import psycopg2.pool
         try:
             # Handle heroku postgres:// vs postgresql://
             url = self.db_url.replace("postgres://", "postgresql://") if self.db_url else None
@@ -45,11 +87,16 @@ class DatabaseManager:
             logger.error(f"[DB] PostgreSQL pool initialization failed: {e}")
 
     def _init_sqlite(self):
+        # DATABASE_URL=sqlite:///path/to.db selects the file; the default stays local
         db_path = "bot_database.db"
+        if self.db_url and self.db_url.startswith("sqlite:///"):
+            db_path = self.db_url[len("sqlite:///"):]
         try:
             self._sqlite_conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._sqlite_conn.row_factory = sqlite3.Row
             self._sqlite_conn.execute("PRAGMA journal_mode=WAL")
             self._sqlite_conn.execute("PRAGMA synchronous=NORMAL")
+            self._sqlite_conn.execute("PRAGMA foreign_keys=ON")
             logger.info("[DB] SQLite persistent connection initialized (WAL mode).")
         except Exception as e:
             logger.error(f"[DB] SQLite initialization failed: {e}")
@@ -59,9 +106,9 @@ class DatabaseManager:
             if not self._pool: self._init_pool()
             conn = self._pool.getconn()
             from psycopg2.extras import RealDictCursor
-            return conn, conn.cursor(cursor_factory=RealDictCursor)
+            return conn, _CountingCursor(conn.cursor(cursor_factory=RealDictCursor), self)
         else:
-            return self._sqlite_conn, self._sqlite_conn.cursor()
+            return self._sqlite_conn, _CountingCursor(self._sqlite_conn.cursor(), self)
 
     def _release_connection(self, conn):
         if self.is_postgres and self._pool:
@@ -102,10 +149,89 @@ class DatabaseManager:
                     identifier TEXT,
                     FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
                 )''',
-                '''CREATE TABLE IF NOT EXISTS processed_items (
-                    item_id TEXT PRIMARY KEY,
+                PROCESSED_ITEMS_TABLE,
+                '''CREATE TABLE IF NOT EXISTS outbox (
+                    id SERIAL PRIMARY KEY,
+                    task_id INTEGER,
+                    source_id INTEGER,
+                    item_id TEXT,
+                    destination_id INTEGER,
+                    platform TEXT,
+                    identifier TEXT,
+                    payload TEXT,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at DOUBLE PRECISION DEFAULT 0,
+                    last_error TEXT,
+                    claimed_by TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(item_id, destination_id)
+                )''',
+                '''CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)''',
+                '''CREATE INDEX IF NOT EXISTS idx_tasks_user ON tasks (user_id, id)''',
+                '''CREATE INDEX IF NOT EXISTS idx_sources_task ON sources (task_id)''',
+                '''CREATE INDEX IF NOT EXISTS idx_destinations_task ON destinations (task_id)''',
+                '''CREATE TABLE IF NOT EXISTS item_traces (
+                    id SERIAL PRIMARY KEY,
+                    task_id INTEGER,
+                    item_id TEXT,
+                    destination TEXT,
+                    source_ts DOUBLE PRECISION,
+                    detected_at DOUBLE PRECISION,
+                    transformed_at DOUBLE PRECISION,
+                    queued_at DOUBLE PRECISION,
+                    sending_at DOUBLE PRECISION,
+                    published_at DOUBLE PRECISION
+                )''',
+                '''CREATE INDEX IF NOT EXISTS idx_item_traces_published ON item_traces (published_at)''',
+                '''CREATE TABLE IF NOT EXISTS telegram_file_ids (
+                    media_key TEXT PRIMARY KEY,
+                    file_id TEXT,
+                    stored_at DOUBLE PRECISION DEFAULT 0
+                )''',
+                '''CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    started_at DOUBLE PRECISION,
+                    heartbeat_at DOUBLE PRECISION
+                )''',
+                '''CREATE TABLE IF NOT EXISTS task_leases (
+                    task_id INTEGER PRIMARY KEY,
+                    worker_id TEXT,
+                    epoch INTEGER DEFAULT 0,
+                    expires_at DOUBLE PRECISION DEFAULT 0,
+                    FOREIGN KEY(task_id) REFERENCES tasks(id) ON DELETE CASCADE
+                )''',
+                '''CREATE INDEX IF NOT EXISTS idx_task_leases_worker ON task_leases (worker_id, expires_at)''',
+                '''CREATE TABLE IF NOT EXISTS source_items (
+                    id SERIAL PRIMARY KEY,
+                    platform TEXT,
+                    identifier TEXT,
+                    item_id TEXT,
+                    content TEXT,
+                    media_json TEXT,
+                    message_ids TEXT,
+                    posted_at DOUBLE PRECISION,
+                    consumed INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(platform, identifier, item_id)
+                )''',
+                '''CREATE INDEX IF NOT EXISTS idx_source_items_unread ON source_items (platform, identifier, consumed)''',
+                # Which task source has handled which captured item; several tasks can watch one channel
+                '''CREATE TABLE IF NOT EXISTS source_item_acks (
                     source_id INTEGER,
-                    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    item_id TEXT,
+                    acked_at DOUBLE PRECISION,
+                    PRIMARY KEY (source_id, item_id),
+                    FOREIGN KEY(source_id) REFERENCES sources(id) ON DELETE CASCADE
+                )''',
+                '''CREATE INDEX IF NOT EXISTS idx_sources_platform ON sources (platform, identifier)''',
+                '''CREATE TABLE IF NOT EXISTS engine_commands (
+                    id SERIAL PRIMARY KEY,
+                    command TEXT,
+                    task_id INTEGER,
+                    payload TEXT,
+                    origin TEXT,
+                    created_at DOUBLE PRECISION
                 )'''
             ]
             
@@ -116,6 +242,10 @@ class DatabaseManager:
             
             for q in queries:
                 cursor.execute(q)
+            # Columns added after the table first shipped
+            self._add_column(cursor, "outbox", "claimed_by", "TEXT")
+            self._add_column(cursor, "item_traces", "sending_at", "DOUBLE PRECISION" if self.is_postgres else "REAL")
+            self._migrate_processed_items(cursor)
             conn.commit()
             logger.info("[DB] Core tables verified.")
         except Exception as e:
@@ -124,6 +254,41 @@ class DatabaseManager:
         finally:
             self._release_connection(conn)
 
+    def _has_column(self, cursor, table: str, column: str) -> bool:
+        if self.is_postgres:
+            cursor.execute("SELECT 1 FROM information_schema.columns WHERE table_name=%s AND column_name=%s",
+                           (table, column))
+            return cursor.fetchone() is not None
+        cursor.execute(f"PRAGMA table_info({table})")
+        return column in [row[1] for row in cursor.fetchall()]
+
+    def _add_column(self, cursor, table: str, column: str, ddl: str):
+        if self.is_postgres:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl}")
+            return
+        if not self._has_column(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+    def _migrate_processed_items(self, cursor):
+        """Rebuilds the old globally keyed processed_items with a (task_id, item_id) key.
+
+        An item already handled counts as processed for every task watching the same
+        source, so the upgrade doesn't replay history into the other tasks.
+        """
+        if self._has_column(cursor, "processed_items", "task_id"):
+            return
+        ignore = "" if self.is_postgres else "OR IGNORE "
+        conflict = " ON CONFLICT DO NOTHING" if self.is_postgres else ""
+        cursor.execute("ALTER TABLE processed_items RENAME TO processed_items_old")
+        cursor.execute(PROCESSED_ITEMS_TABLE)
+        cursor.execute(
+            f"""INSERT {ignore}INTO processed_items (task_id, item_id, source_id, processed_at)
+               SELECT s2.task_id, p.item_id, s2.id, p.processed_at FROM processed_items_old p
+               JOIN sources s ON s.id = p.source_id
+               JOIN sources s2 ON s2.platform = s.platform AND s2.identifier = s.identifier{conflict}""")
+        cursor.execute("DROP TABLE processed_items_old")
+        logger.info("[DB] Migrated processed_items to per-task deduplication.")
+
     def execute(self, query: str, params: tuple = ()):
         query = self._prepare_query(query)
         conn, cursor = self._get_connection()
@@ -136,6 +301,19 @@ class DatabaseManager:
         finally:
             self._release_connection(conn)
 
+    @contextmanager
+    def transaction(self):
+        """Yields a cursor whose statements are committed (or rolled back) together."""
+        conn, cursor = self._get_connection()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release_connection(conn)
+
     def fetch_one(self, query: str, params: tuple = ()) -> Optional[Dict]:
         query = self._prepare_query(query)
         conn, cursor = self._get_connection()
@@ -180,6 +358,14 @@ class DatabaseManager:
         else:
             self.execute("INSERT OR IGNORE INTO mirror_health (url) VALUES (?)", (url,))
 
+    def register_mirrors(self, urls: List[str]):
+        """Registers several mirrors in one round trip."""
+        ignore = "" if self.is_postgres else "OR IGNORE "
+        conflict = " ON CONFLICT DO NOTHING" if self.is_postgres else ""
+        with self.transaction() as cursor:
+            cursor.executemany(self._prepare_query(f"INSERT {ignore}INTO mirror_health (url) VALUES (?){conflict}"),
+                               [(u,) for u in urls])
+
     # --- Task Management ---
     def create_task(self, name: str, user_id: int, options: dict) -> int:
         query = f"INSERT INTO tasks (name, user_id, options) VALUES ({self.placeholder}, {self.placeholder}, {self.placeholder})"
@@ -205,6 +391,109 @@ class DatabaseManager:
     def get_tasks(self, user_id: int) -> List[Dict]:
         return self.fetch_all("SELECT * FROM tasks WHERE user_id=?", (user_id,))
 
+    def get_active_tasks(self) -> List[Dict]:
+        return self.fetch_all("SELECT * FROM tasks WHERE status='active'")
+
+    # Task summaries with source/destination counts, computed in the same query
+    TASK_SUMMARY_SQL = (
+        "SELECT t.id, t.name, t.user_id, t.status, "
+        "(SELECT COUNT(*) FROM sources s WHERE s.task_id = t.id) AS source_count, "
+        "(SELECT COUNT(*) FROM destinations d WHERE d.task_id = t.id) AS dest_count "
+        "FROM tasks t"
+    )
+
+    def get_task_page(self, user_id: int, after_id: Optional[int] = None,
+                      before_id: Optional[int] = None, limit: int = 10) -> Dict[str, Any]:
+        """Keyset-paginated task summaries for a user.
+
+        Returns {'tasks', 'has_prev', 'has_next'}; one extra row is fetched to tell
+        whether another page exists in the direction of travel.
+        """
+        if before_id is not None:
+            rows = self.fetch_all(
+                f"{self.TASK_SUMMARY_SQL} WHERE t.user_id=? AND t.id < ? ORDER BY t.id DESC LIMIT ?",
+                (user_id, before_id, limit + 1))
+            has_prev, has_next = len(rows) > limit, True
+            rows = list(reversed(rows[:limit]))
+        else:
+            rows = self.fetch_all(
+                f"{self.TASK_SUMMARY_SQL} WHERE t.user_id=? AND t.id > ? ORDER BY t.id ASC LIMIT ?",
+                (user_id, after_id or 0, limit + 1))
+            has_prev, has_next = after_id is not None, len(rows) > limit
+            rows = rows[:limit]
+        for row in rows:
+            row['is_active'] = row['status'] == 'active'
+        return {'tasks': rows, 'has_prev': has_prev, 'has_next': has_next}
+
+    def get_task_summary(self, task_id: int) -> Optional[Dict]:
+        task = self.fetch_one(f"{self.TASK_SUMMARY_SQL} WHERE t.id=?", (task_id,))
+        if task:
+            task['is_active'] = task['status'] == 'active'
+        return task
+
+    def set_task_status(self, task_id: int, status: str):
+        self.execute("UPDATE tasks SET status=? WHERE id=?", (status, task_id))
+
+    def bulk_create_tasks(self, user_id: int, tasks: List[Dict[str, Any]], page_size: int = 1000) -> List[int]:
+        """Creates tasks with their sources and destinations in one transaction.
+
+        Each task is {'name', 'status', 'options', 'sources', 'destinations'}, where
+        sources/destinations are lists of (platform, identifier). Returns the new task ids.
+        """
+        if not tasks:
+            return []
+        task_rows = [(t['name'], user_id, t.get('status', 'active'), json.dumps(t.get('options') or {})) for t in tasks]
+        with self.transaction() as cursor:
+            if self.is_postgres:
+                from psycopg2.extras import execute_values
+                res = execute_values(cursor, "INSERT INTO tasks (name, user_id, status, options) VALUES %s RETURNING id",
+                                     task_rows, page_size=page_size, fetch=True)
+                task_ids = [r['id'] for r in res]
+            else:
+                # Ids are taken per row rather than assumed contiguous
+                task_ids = []
+                for row in task_rows:
+                    cursor.execute("INSERT INTO tasks (name, user_id, status, options) VALUES (?, ?, ?, ?)", row)
+                    task_ids.append(cursor.lastrowid)
+
+            for table, field in (("sources", "sources"), ("destinations", "destinations")):
+                rows = [(task_id, platform, str(identifier))
+                        for task_id, t in zip(task_ids, tasks) for platform, identifier in t.get(field, [])]
+                if not rows:
+                    continue
+                if self.is_postgres:
+                    execute_values(cursor, f"INSERT INTO {table} (task_id, platform, identifier) VALUES %s",
+                                   rows, page_size=page_size)
+                else:
+                    cursor.executemany(f"INSERT INTO {table} (task_id, platform, identifier) VALUES (?, ?, ?)", rows)
+        return task_ids
+
+    def iter_task_export(self, user_id: int, batch_size: int = 500):
+        """Yields a user's tasks with sources and destinations, batch by batch.
+
+        Uses keyset pagination so memory stays flat regardless of task count.
+        """
+        last_id = 0
+        while True:
+            tasks = self.fetch_all(
+                "SELECT id, name, status, options FROM tasks WHERE user_id=? AND id > ? ORDER BY id LIMIT ?",
+                (user_id, last_id, batch_size))
+            if not tasks:
+                return
+            ids = [t['id'] for t in tasks]
+            marks = ", ".join("?" * len(ids))
+            children = {t['id']: {"sources": [], "destinations": []} for t in tasks}
+            for table in ("sources", "destinations"):
+                for row in self.fetch_all(
+                        f"SELECT task_id, platform, identifier FROM {table} WHERE task_id IN ({marks}) ORDER BY id",
+                        tuple(ids)):
+                    children[row['task_id']][table].append(row)
+            for t in tasks:
+                t.update(children[t['id']])
+                t['options'] = json.loads(t['options']) if t['options'] else {}
+                yield t
+            last_id = ids[-1]
+
     def get_task_details(self, task_id: int) -> Optional[Dict]:
         task = self.fetch_one("SELECT * FROM tasks WHERE id=?", (task_id,))
         if task:
@@ -216,15 +505,358 @@ class DatabaseManager:
     def update_source_last_id(self, source_id: int, last_id: str):
         self.execute("UPDATE sources SET last_check_id=? WHERE id=?", (last_id, source_id))
 
-    def is_item_processed(self, item_id: str) -> bool:
-        res = self.fetch_one("SELECT 1 FROM processed_items WHERE item_id=?", (item_id,))
+    def is_item_processed(self, task_id: int, item_id: str) -> bool:
+        res = self.fetch_one("SELECT 1 FROM processed_items WHERE task_id=? AND item_id=?", (task_id, item_id))
         return res is not None
 
-    def mark_item_processed(self, item_id: str, source_id: int):
+    def mark_item_processed(self, task_id: int, item_id: str, source_id: int):
         if self.is_postgres:
-            self.execute("INSERT INTO processed_items (item_id, source_id) VALUES (%s, %s) ON CONFLICT DO NOTHING", (item_id, source_id))
+            self.execute("INSERT INTO processed_items (task_id, item_id, source_id) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING",
+                         (task_id, item_id, source_id))
         else:
-            self.execute("INSERT OR IGNORE INTO processed_items (item_id, source_id) VALUES (?, ?)", (item_id, source_id))
+            self.execute("INSERT OR IGNORE INTO processed_items (task_id, item_id, source_id) VALUES (?, ?, ?)",
+                         (task_id, item_id, source_id))
+
+    # --- Outbox ---
+    def enqueue_outbox(self, task_id: int, source_id: int, item_id: str,
+                       destinations: List[Dict], payload: dict, lease: Optional[tuple] = None) -> List[Dict]:
+        """Stores the transformed payload for every destination and marks the item
+        processed in one transaction. Returns the outbox rows claimed for delivery.
+
+        With `lease=(worker_id, epoch)` the rows are claimed by that worker and the
+        transaction only commits while the worker still holds that lease epoch;
+        otherwise LeaseLostError is raised and nothing is written.
+        """
+        ts = datetime.now().timestamp()
+        body = json.dumps(payload)
+        worker_id = lease[0] if lease else None
+        ignore = "" if self.is_postgres else "OR IGNORE "
+        conflict = " ON CONFLICT DO NOTHING" if self.is_postgres else ""
+        with self.transaction() as cursor:
+            for dest in destinations:
+                cursor.execute(self._prepare_query(
+                    f"""INSERT {ignore}INTO outbox (task_id, source_id, item_id, destination_id, platform, identifier, payload, status, next_attempt_at, claimed_by)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', ?, ?){conflict}"""),
+                    (task_id, source_id, item_id, dest.get('id'), dest['platform'], str(dest['identifier']), body, ts, worker_id))
+            cursor.execute(self._prepare_query(
+                f"INSERT {ignore}INTO processed_items (task_id, item_id, source_id) VALUES (?, ?, ?){conflict}"),
+                (task_id, item_id, source_id))
+            if lease:
+                # Checked last, after the writes took their locks, so a takeover can't slip in between
+                lock = " FOR SHARE" if self.is_postgres else ""
+                cursor.execute(self._prepare_query(
+                    f"SELECT 1 FROM task_leases WHERE task_id=? AND worker_id=? AND epoch=? AND expires_at>?{lock}"),
+                    (task_id, lease[0], lease[1], ts))
+                if cursor.fetchone() is None:
+                    raise LeaseLostError(f"lease on task {task_id} (epoch {lease[1]}) is no longer held by {lease[0]}")
+        return self.fetch_all("SELECT * FROM outbox WHERE item_id=? AND task_id=? AND status='queued'", (item_id, task_id))
+
+    def claim_due_deliveries(self, limit: int = 500, worker_id: Optional[str] = None) -> List[Dict]:
+        """Returns pending deliveries whose retry time has come and flags them as queued.
+
+        With a worker_id, only deliveries of tasks leased by that worker are claimed.
+        """
+        ts = datetime.now().timestamp()
+        if worker_id is None:
+            rows = self.fetch_all(
+                "SELECT * FROM outbox WHERE status='pending' AND next_attempt_at<=? ORDER BY id LIMIT ?", (ts, limit))
+            if rows:
+                ids = [r['id'] for r in rows]
+                marks = ", ".join("?" for _ in ids)
+                self.execute(f"UPDATE outbox SET status='queued' WHERE status='pending' AND id IN ({marks})", tuple(ids))
+            return rows
+
+        lock = " FOR UPDATE SKIP LOCKED" if self.is_postgres else ""
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "SELECT id FROM outbox WHERE status='pending' AND next_attempt_at<=? AND task_id IN "
+                f"(SELECT task_id FROM task_leases WHERE worker_id=? AND expires_at>?) ORDER BY id LIMIT ?{lock}"),
+                (ts, worker_id, ts, limit))
+            ids = [r['id'] for r in cursor.fetchall()]
+            if not ids:
+                return []
+            marks = ", ".join("?" for _ in ids)
+            cursor.execute(self._prepare_query(
+                f"UPDATE outbox SET status='queued', claimed_by=? WHERE status='pending' AND id IN ({marks})"),
+                (worker_id, *ids))
+            cursor.execute(self._prepare_query(
+                f"SELECT * FROM outbox WHERE status='queued' AND claimed_by=? AND id IN ({marks}) ORDER BY id"),
+                (worker_id, *ids))
+            return [dict(r) for r in cursor.fetchall()]
+
+    def begin_delivery(self, outbox_id: int, worker_id: str) -> bool:
+        """Flags a queued delivery as being sent, if `worker_id` still owns it.
+
+        A worker retired for missing heartbeats has its queued rows handed to
+        others; checking ownership right before publishing keeps it from sending
+        them a second time.
+        """
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "UPDATE outbox SET status='sending' WHERE id=? AND status='queued' AND claimed_by=?"),
+                (outbox_id, worker_id))
+            return cursor.rowcount == 1
+
+    def mark_delivery_sent(self, outbox_id: int, worker_id: str) -> bool:
+        """Records a successful send; False if the row was taken over meanwhile."""
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "UPDATE outbox SET status='sent', attempts=attempts+1, last_error=NULL "
+                "WHERE id=? AND status='sending' AND claimed_by=?"), (outbox_id, worker_id))
+            return cursor.rowcount == 1
+
+    def mark_delivery_failed(self, outbox_id: int, worker_id: str, error: str, next_attempt_at: Optional[float]) -> bool:
+        """Schedules a retry at next_attempt_at, or gives up when it is None.
+        False if the row was taken over meanwhile."""
+        status = "failed" if next_attempt_at is None else "pending"
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "UPDATE outbox SET status=?, attempts=attempts+1, last_error=?, next_attempt_at=COALESCE(?, next_attempt_at) "
+                "WHERE id=? AND status='sending' AND claimed_by=?"),
+                (status, error[:500], next_attempt_at, outbox_id, worker_id))
+            return cursor.rowcount == 1
+
+    # --- Workers & Task Leases ---
+    def register_worker(self, worker_id: str, now: float):
+        """Announces a (re)started worker and cleans up after its previous incarnation.
+
+        Deliveries it had queued go back to pending and its old leases expire, so it
+        reclaims them under a new epoch.
+        """
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "UPDATE outbox SET status='pending', claimed_by=NULL WHERE status IN ('queued', 'sending') "
+                "AND (claimed_by=? OR claimed_by IS NULL)"), (worker_id,))
+            cursor.execute(self._prepare_query("UPDATE task_leases SET expires_at=0 WHERE worker_id=?"), (worker_id,))
+            cursor.execute(self._prepare_query(
+                "INSERT INTO workers (worker_id, started_at, heartbeat_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET started_at=excluded.started_at, heartbeat_at=excluded.heartbeat_at"),
+                (worker_id, now, now))
+
+    def heartbeat_worker(self, worker_id: str, now: float, stale_before: float) -> int:
+        """Refreshes this worker's heartbeat, retires workers silent since `stale_before`
+        (returning their queued deliveries and leases to the pool) and returns the
+        number of live workers."""
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "INSERT INTO workers (worker_id, started_at, heartbeat_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at=excluded.heartbeat_at"),
+                (worker_id, now, now))
+            cursor.execute(self._prepare_query("SELECT worker_id FROM workers WHERE heartbeat_at<?"), (stale_before,))
+            dead = [r['worker_id'] for r in cursor.fetchall()]
+            if dead:
+                marks = ", ".join("?" for _ in dead)
+                # Sends in flight go back too: a worker that died mid-publish must not lose the post
+                cursor.execute(self._prepare_query(
+                    "UPDATE outbox SET status='pending', claimed_by=NULL WHERE status IN ('queued', 'sending') "
+                    f"AND claimed_by IN ({marks})"),
+                    tuple(dead))
+                cursor.execute(self._prepare_query(
+                    f"UPDATE task_leases SET expires_at=0 WHERE worker_id IN ({marks})"), tuple(dead))
+                cursor.execute(self._prepare_query(f"DELETE FROM workers WHERE worker_id IN ({marks})"), tuple(dead))
+                logger.warning(f"[DB] Retired unresponsive workers: {', '.join(dead)}")
+            cursor.execute("SELECT COUNT(*) AS n FROM workers")
+            return cursor.fetchone()['n']
+
+    def unregister_worker(self, worker_id: str):
+        """Clean exit: hands leases and undelivered work back immediately."""
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "UPDATE outbox SET status='pending', claimed_by=NULL WHERE status IN ('queued', 'sending') "
+                "AND claimed_by=?"), (worker_id,))
+            cursor.execute(self._prepare_query("UPDATE task_leases SET expires_at=0 WHERE worker_id=?"), (worker_id,))
+            cursor.execute(self._prepare_query("DELETE FROM workers WHERE worker_id=?"), (worker_id,))
+
+    def count_active_tasks(self) -> int:
+        return self.fetch_one("SELECT COUNT(*) AS n FROM tasks WHERE status='active'")['n']
+
+    def renew_leases(self, worker_id: str, now: float, expires_at: float) -> Dict[int, int]:
+        """Extends this worker's unexpired leases on active tasks, drops those on
+        paused tasks, and returns {task_id: epoch} still held."""
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "UPDATE task_leases SET expires_at=0 WHERE worker_id=? AND expires_at>? "
+                "AND task_id NOT IN (SELECT id FROM tasks WHERE status='active')"), (worker_id, now))
+            cursor.execute(self._prepare_query(
+                "UPDATE task_leases SET expires_at=? WHERE worker_id=? AND expires_at>?"), (expires_at, worker_id, now))
+            cursor.execute(self._prepare_query(
+                "SELECT task_id, epoch FROM task_leases WHERE worker_id=? AND expires_at>?"), (worker_id, now))
+            return {r['task_id']: r['epoch'] for r in cursor.fetchall()}
+
+    def claim_leases(self, worker_id: str, limit: int, now: float, expires_at: float) -> Dict[int, int]:
+        """Leases up to `limit` active tasks that nobody holds, bumping each epoch.
+
+        Postgres skips task rows another worker is claiming (FOR UPDATE SKIP LOCKED);
+        on both engines the conditional upsert only takes over expired leases, so two
+        workers can never hold the same task.
+        """
+        if limit <= 0:
+            return {}
+        lock = " FOR UPDATE OF t SKIP LOCKED" if self.is_postgres else ""
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query(
+                "SELECT t.id FROM tasks t LEFT JOIN task_leases l ON l.task_id = t.id "
+                f"WHERE t.status='active' AND (l.task_id IS NULL OR l.expires_at<?) ORDER BY t.id LIMIT ?{lock}"),
+                (now, limit))
+            ids = [r['id'] for r in cursor.fetchall()]
+            if not ids:
+                return {}
+            cursor.executemany(self._prepare_query(
+                "INSERT INTO task_leases (task_id, worker_id, epoch, expires_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (task_id) DO UPDATE SET worker_id=excluded.worker_id, epoch=task_leases.epoch+1, "
+                "expires_at=excluded.expires_at WHERE task_leases.expires_at<?"),
+                [(task_id, worker_id, expires_at, now) for task_id in ids])
+            marks = ", ".join("?" for _ in ids)
+            cursor.execute(self._prepare_query(
+                f"SELECT task_id, epoch FROM task_leases WHERE worker_id=? AND expires_at=? AND task_id IN ({marks})"),
+                (worker_id, expires_at, *ids))
+            return {r['task_id']: r['epoch'] for r in cursor.fetchall()}
+
+    def release_leases(self, worker_id: str, task_ids: List[int]):
+        """Gives leases up (keeping the epoch) so other workers can claim them at once."""
+        if not task_ids:
+            return
+        marks = ", ".join("?" for _ in task_ids)
+        self.execute(f"UPDATE task_leases SET expires_at=0 WHERE worker_id=? AND task_id IN ({marks})",
+                     (worker_id, *task_ids))
+
+    # --- Captured Source Items ---
+    def save_source_items(self, rows: List[tuple]):
+        """Batch-inserts captured posts as (platform, identifier, item_id, content,
+        media_json, message_ids, posted_at); duplicates are ignored."""
+        if not rows:
+            return
+        ignore = "" if self.is_postgres else "OR IGNORE "
+        conflict = " ON CONFLICT DO NOTHING" if self.is_postgres else ""
+        with self.transaction() as cursor:
+            cursor.executemany(self._prepare_query(
+                f"""INSERT {ignore}INTO source_items (platform, identifier, item_id, content, media_json, message_ids, posted_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?){conflict}"""), rows)
+
+    def get_unread_source_items(self, identifier: str, platform: str, limit: int = 200,
+                                source_id: Optional[int] = None) -> List[Dict]:
+        """Captured items not yet handled by `source_id` (by any source when None)."""
+        if source_id is None:
+            return self.fetch_all(
+                "SELECT * FROM source_items WHERE platform=? AND identifier=? AND consumed=0 ORDER BY id LIMIT ?",
+                (platform, identifier, limit))
+        return self.fetch_all(
+            "SELECT * FROM source_items si WHERE platform=? AND identifier=? AND consumed=0 AND NOT EXISTS "
+            "(SELECT 1 FROM source_item_acks a WHERE a.source_id=? AND a.item_id=si.item_id) ORDER BY id LIMIT ?",
+            (platform, identifier, source_id, limit))
+
+    def mark_source_items_consumed(self, source_id: int, platform: str, identifier: str, item_ids: List[str]):
+        """Records that one task source handled these items.
+
+        An item is flagged consumed, and eventually pruned, only once every source of
+        an active task watching the same channel has handled it.
+        """
+        if not item_ids:
+            return
+        ignore = "" if self.is_postgres else "OR IGNORE "
+        conflict = " ON CONFLICT DO NOTHING" if self.is_postgres else ""
+        marks = ", ".join("?" for _ in item_ids)
+        with self.transaction() as cursor:
+            cursor.executemany(self._prepare_query(
+                f"INSERT {ignore}INTO source_item_acks (source_id, item_id, acked_at) VALUES (?, ?, ?){conflict}"),
+                [(source_id, item_id, datetime.now().timestamp()) for item_id in item_ids])
+            cursor.execute(self._prepare_query(
+                f"""UPDATE source_items SET consumed=1 WHERE platform=? AND identifier=? AND item_id IN ({marks})
+                   AND NOT EXISTS (SELECT 1 FROM sources s JOIN tasks t ON t.id = s.task_id
+                       WHERE s.platform=? AND s.identifier=? AND t.status='active' AND NOT EXISTS
+                       (SELECT 1 FROM source_item_acks a WHERE a.source_id = s.id AND a.item_id = source_items.item_id))"""),
+                (platform, identifier, *item_ids, platform, identifier))
+
+    def prune_source_items(self, before: float):
+        with self.transaction() as cursor:
+            cursor.execute(self._prepare_query("DELETE FROM source_items WHERE consumed=1 AND posted_at<?"), (before,))
+            # A source that sees an item again after its ack is pruned skips it as already processed
+            cursor.execute(self._prepare_query("DELETE FROM source_item_acks WHERE acked_at<?"), (before,))
+
+    def get_source_identifiers(self, platform: str) -> List[str]:
+        """Identifiers of a platform's sources that belong to active tasks."""
+        rows = self.fetch_all(
+            "SELECT DISTINCT s.identifier FROM sources s JOIN tasks t ON t.id = s.task_id "
+            "WHERE s.platform=? AND t.status='active'", (platform,))
+        return [r['identifier'] for r in rows]
+
+    def get_task_ids_for_source(self, platform: str, identifier: str) -> List[int]:
+        rows = self.fetch_all(
+            "SELECT DISTINCT s.task_id FROM sources s JOIN tasks t ON t.id = s.task_id "
+            "WHERE s.platform=? AND s.identifier=? AND t.status='active'", (platform, identifier))
+        return [r['task_id'] for r in rows]
+
+    # --- Engine Commands ---
+    def publish_command(self, command: str, task_id: Optional[int], payload: str, origin: str, now: float) -> int:
+        """Appends a command for engine processes; on Postgres, listeners are woken by NOTIFY at commit."""
+        with self.transaction() as cursor:
+            if self.is_postgres:
+                cursor.execute("INSERT INTO engine_commands (command, task_id, payload, origin, created_at) "
+                               "VALUES (%s, %s, %s, %s, %s) RETURNING id", (command, task_id, payload, origin, now))
+                command_id = cursor.fetchone()['id']
+                cursor.execute("SELECT pg_notify(%s, %s)", (COMMAND_CHANNEL, str(command_id)))
+                return command_id
+            cursor.execute("INSERT INTO engine_commands (command, task_id, payload, origin, created_at) "
+                           "VALUES (?, ?, ?, ?, ?)", (command, task_id, payload, origin, now))
+            return cursor.lastrowid
+
+    def get_commands_after(self, last_id: int, limit: int = 500) -> List[Dict]:
+        return self.fetch_all("SELECT * FROM engine_commands WHERE id>? ORDER BY id LIMIT ?", (last_id, limit))
+
+    def get_last_command_id(self) -> int:
+        return self.fetch_one("SELECT COALESCE(MAX(id), 0) AS id FROM engine_commands")['id']
+
+    def prune_commands(self, before: float):
+        self.execute("DELETE FROM engine_commands WHERE created_at<?", (before,))
+
+    def listen(self, channel: str):
+        """A dedicated autocommit connection LISTENing on `channel`, or None on SQLite.
+
+        The caller owns it: watch its fileno() for readability, then poll() it and
+        drain `notifies`.
+        """
+        if not self.is_postgres:
+            return None
+        import psycopg2
+        conn = psycopg2.connect(self.db_url.replace("postgres://", "postgresql://"), sslmode='require')
+        conn.autocommit = True
+        conn.cursor().execute(f"LISTEN {channel}")
+        return conn
+
+    # --- Telegram file_id Cache ---
+    def get_file_ids(self, limit: int) -> List[Dict]:
+        return self.fetch_all("SELECT media_key, file_id, stored_at FROM telegram_file_ids ORDER BY stored_at DESC LIMIT ?", (limit,))
+
+    def save_file_id(self, media_key: str, file_id: str, stored_at: float):
+        if self.is_postgres:
+            self.execute("""INSERT INTO telegram_file_ids (media_key, file_id, stored_at) VALUES (%s, %s, %s)
+                            ON CONFLICT (media_key) DO UPDATE SET file_id=EXCLUDED.file_id, stored_at=EXCLUDED.stored_at""",
+                         (media_key, file_id, stored_at))
+        else:
+            self.execute("INSERT OR REPLACE INTO telegram_file_ids (media_key, file_id, stored_at) VALUES (?, ?, ?)",
+                         (media_key, file_id, stored_at))
+
+    def delete_file_ids(self, media_keys: List[str]):
+        if media_keys:
+            marks = ", ".join("?" for _ in media_keys)
+            self.execute(f"DELETE FROM telegram_file_ids WHERE media_key IN ({marks})", tuple(media_keys))
+
+    def prune_file_ids(self, before: float):
+        self.execute("DELETE FROM telegram_file_ids WHERE stored_at < ?", (before,))
+
+    # --- Latency Traces ---
+    def save_traces(self, rows: List[tuple]):
+        """Rows are (task_id, item_id, destination, source_ts, detected, transformed, queued, sending, published)."""
+        with self.transaction() as cursor:
+            cursor.executemany(self._prepare_query(
+                """INSERT INTO item_traces (task_id, item_id, destination, source_ts, detected_at,
+                   transformed_at, queued_at, sending_at, published_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""), rows)
+
+    def get_recent_traces(self, limit: int) -> List[Dict]:
+        return self.fetch_all("SELECT * FROM item_traces ORDER BY published_at DESC LIMIT ?", (limit,))
+
+    def prune_traces(self, before: float):
+        self.execute("DELETE FROM item_traces WHERE published_at < ?", (before,))
 
     def set_setting(self, key: str, value: str):
         if self.is_postgres:
@@ -239,5 +871,33 @@ class DatabaseManager:
     def delete_task(self, task_id: int):
         self.execute("DELETE FROM tasks WHERE id=?", (task_id,))
 
+class LazyDatabase:
+    """Module-level handle that connects on first use instead of at import time.
+
+    `from database.manager import db` stays cheap; the pool/connection and schema
+    check happen in init_db() (called explicitly by main) or on first attribute access.
+    """
+
+    def __init__(self):
+        self._instance: Optional[DatabaseManager] = None
+        self._lock = threading.Lock()
+
+    def init(self, db_url: Optional[str] = None) -> DatabaseManager:
+        with self._lock:
+            if self._instance is None:
+                self._instance = DatabaseManager(db_url)
+            return self._instance
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name: str):
+        return getattr(self._instance or self.init(), name)
+
+def init_db(db_url: Optional[str] = None) -> DatabaseManager:
+    """Connects and verifies the schema; safe to call more than once."""
+    return db.init(db_url)
+
 # Global Instance
-db = DatabaseManager()
+db = LazyDatabase()
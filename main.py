@@ -1,7 +1,10 @@
 # main.py
 
+import argparse
 import asyncio
 import os
+import signal
+from typing import Optional
 from telegram import Update
 from telegram.ext import (
     Application,
@@ -14,18 +17,30 @@ from telegram.ext import (
 )
 
 from bot.states import BotState
+from bot.webhook import default_secret, start_webhook, stop_webhook
 from bot.menu import Menu
 from bot.handlers import (
     view_tasks, manage_task, add_task_start, receive_task_name,
     receive_source_platform, receive_source_id, receive_dest_platform, 
     receive_dest_id, commit_task, show_settings, ask_setting, 
     set_groq_key, set_tw_user, set_tw_pass,
-    toggle_task_status, delete_task, show_help, cancel_creation
+    toggle_task_status, delete_task, show_help, cancel_creation,
+    import_document, export_command, latency_command, profile_command,
+    capture_message
 )
-from database.manager import db
+from database.manager import db, init_db
 from core.engine import ProcessingEngine
+from services.capture import capture_buffer
+from services.command_bus import command_bus
+from services.ai_service import ai_service
 from services.config_service import config
 from services.logger import logger
+from services.loop_monitor import loop_monitor
+from services.media_cache import media_cache
+from services.metrics import metrics_endpoint
+from services.profiler import profiler
+from services.tracing import tracer
+from services.web import WebServer, web_server
 
 # --- Command Handlers ---
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -62,30 +77,162 @@ async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
 
 # --- Engine Supervisor ---
-async def engine_supervisor():
-    """Monitors the processing engine and restarts it if it crashes."""
-    engine = ProcessingEngine()
-    while True:
+async def engine_supervisor(engine: ProcessingEngine):
+    """Restarts the processing engine if it crashes, until it is stopped."""
+    while not engine.stopping:
         try:
             logger.info("[Main] Starting Engine Supervisor...")
             await engine.start()
         except Exception as e:
+            if engine.stopping:
+                break
             logger.error(f"[Main] Engine crashed: {e}. Restarting in 10s...")
-            await asyncio.sleep(10)
+            await engine.wait_stopped(10)
+
+async def start_web_server():
+    """Serves internal endpoints (Prometheus /metrics) next to the engine."""
+    if not web_server.port:
+        return
+    web_server.route("GET", "/metrics", metrics_endpoint)
+    try:
+        await web_server.start()
+    except OSError as e:
+        logger.error(f"[Main] Metrics endpoint unavailable on port {web_server.port}: {e}")
+
+async def profile_after_start(seconds: int):
+    """`--profile N`: captures N seconds of the running process into profiles/."""
+    try:
+        result = await profiler.capture(seconds)
+        paths = await asyncio.to_thread(profiler.write, result, os.getenv("PROFILE_DIR", "profiles"))
+        logger.info(f"[Main] Profile written to {', '.join(paths)}")
+    except Exception as e:
+        logger.error(f"[Main] Startup profile failed: {e}")
+
+def start_background_tasks(loop, args, engine: bool = True, web: bool = True) -> Optional[ProcessingEngine]:
+    """Engine supervisor and its command receiver, internal endpoints, alert digests and
+    the loop monitor. Returns the engine, for shutdown()."""
+    processing = None
+    if engine:
+        processing = ProcessingEngine(config.telegram_token, worker_id=os.getenv("WORKER_ID"))
+        loop.create_task(engine_supervisor(processing))
+        loop.create_task(command_bus.run())
+    if web:
+        loop.create_task(start_web_server())
+    loop.create_task(logger.alerts.run())
+    loop.create_task(loop_monitor.run())
+    if args.profile:
+        loop.create_task(profile_after_start(args.profile))
+    return processing
+
+async def shutdown(engine: Optional[ProcessingEngine]):
+    """Drains the engine, writes buffered data and closes shared HTTP clients, so a
+    restart neither repeats finished work nor loses what was in memory."""
+    logger.info("[Main] Shutting down...")
+    await capture_buffer.close()
+    if engine is not None:
+        await engine.stop(float(os.getenv("SHUTDOWN_TIMEOUT", "25")))
+    for result in await asyncio.gather(media_cache.close(), ai_service.close(), return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.warning(f"[Main] Error closing a client: {result}")
+    await logger.alerts.send_digest()
+
+async def wait_for_stop_signal():
+    """Returns on SIGTERM (platform restarts and scale-downs) or SIGINT."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+async def run_engine(args):
+    """Engine role: no Telegram updates, only the tasks this worker leases. Admin
+    changes and captured posts arrive from bot processes through the command bus."""
+    logger.info("[Main] Starting headless engine worker...")
+    engine = start_background_tasks(asyncio.get_running_loop(), args)
+    await wait_for_stop_signal()
+    await shutdown(engine)
+
+async def run_webhook(application: Application, args, engine: bool = True):
+    """Webhook mode: Telegram pushes updates to WEBHOOK_PATH on the web server.
+
+    When the platform assigns a public PORT (e.g. Heroku web dynos), updates get a
+    listener of their own on 0.0.0.0:$PORT that serves nothing but the webhook path;
+    /metrics stays on the internal server. Otherwise both share the internal server.
+    """
+    path = config.get("WEBHOOK_PATH", "/telegram/webhook")
+    url = config.get("WEBHOOK_URL").rstrip("/") + path
+    secret = config.get("WEBHOOK_SECRET") or default_secret(config.telegram_token)
+    public = os.getenv("PORT")
+    server = WebServer("0.0.0.0", int(public)) if public else web_server
+    if not public:
+        web_server.route("GET", "/metrics", metrics_endpoint)
+
+    processing = start_background_tasks(asyncio.get_running_loop(), args, engine=engine, web=bool(public))
+    await start_webhook(application, server, url, path, secret,
+                        max_connections=int(config.get("WEBHOOK_MAX_CONNECTIONS", "40")))
+    try:
+        await wait_for_stop_signal()
+    finally:
+        await stop_webhook(application)
+        await shutdown(processing)
+        await server.stop()
+        await web_server.stop()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Telegram forwarding bot and processing engine.")
+    parser.add_argument("--role", choices=("all", "bot", "engine"), default=os.getenv("PROCESS_ROLE", "all"),
+                        help="bot: Telegram front-end only; engine: processing only (start several to split "
+                             "tasks between them); all: both in one process (default)")
+    parser.add_argument("--worker", dest="role", action="store_const", const="engine",
+                        help="same as --role engine")
+    parser.add_argument("--webhook", action="store_true",
+                        help="receive updates through a webhook at WEBHOOK_URL instead of long polling")
+    parser.add_argument("--profile", type=int, metavar="SECONDS",
+                        help="profile the process for SECONDS after startup and write the result to profiles/")
+    return parser.parse_args(argv)
 
 # --- Start System ---
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Application-level initialization: importing modules does no I/O, so the
+    # log files and database connection are opened here, once, in a known order
+    logger.start()
+    init_db()
+
     token = config.telegram_token
     if not token:
         logger.error("[Main] TELEGRAM_BOT_TOKEN not found! Exiting.")
         return
 
-    # 1. Setup Application
-    application = Application.builder().token(token).build()
+    if args.role == "engine":
+        # The bot front-end reads latency from item_traces, so engines always write it
+        tracer.persist = True
+        asyncio.run(run_engine(args))
+        return
+    engine = args.role == "all"
+    if not engine:
+        # Spans are recorded by the engine processes; /latency reads them from the database
+        tracer.remote = True
+
+    webhook = args.webhook or (config.get("BOT_MODE") or "").lower() == "webhook"
+    if webhook and not config.get("WEBHOOK_URL"):
+        logger.error("[Main] Webhook mode needs WEBHOOK_URL (the public https base URL). Exiting.")
+        return
+
+    # 1. Setup Application; updates are processed in order, which the admin conversation relies on
+    builder = (Application.builder().token(token)
+               .base_url(config.get("TELEGRAM_API_URL", "https://api.telegram.org/bot")))
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
+    application.bot_data["role"] = args.role
 
     # 2. Register Global Message Capture (Must be before ConversationHandler if intended as global)
-    from bot.handlers import capture_message
-    application.add_handler(MessageHandler(filters.ChatType.CHANNEL, capture_message))
+    # Channel posts only touch the capture buffer, so they don't wait behind admin updates
+    application.add_handler(MessageHandler(filters.ChatType.CHANNEL, capture_message, block=False))
+    # Engines, in this process or separate ones, run a source's tasks as soon as posts are stored
+    capture_buffer.subscribe(command_bus.source_updated)
 
     # 3. Setup Conversation Handler
     conv_handler = ConversationHandler(
@@ -102,6 +249,7 @@ def main():
                 CallbackQueryHandler(add_task_start, pattern="^tasks_add$"),
                 CallbackQueryHandler(show_settings, pattern="^settings_view$"),
                 CallbackQueryHandler(show_help, pattern="^help_view$"),
+                CallbackQueryHandler(view_tasks, pattern="^tasks_(next|prev)_"),
                 CallbackQueryHandler(manage_task, pattern="^tasks_manage_"),
                 CallbackQueryHandler(lambda u, c: toggle_task_status(u, c, False), pattern="^tasks_pause_"),
                 CallbackQueryHandler(lambda u, c: toggle_task_status(u, c, True), pattern="^tasks_resume_"),
@@ -135,10 +283,27 @@ def main():
     # 4. Global handlers for navigation safety
     application.add_handler(CallbackQueryHandler(main_menu_callback, pattern="^menu_main$"))
 
+    # Bulk task import/export
+    application.add_handler(CommandHandler("export", export_command))
+    application.add_handler(CommandHandler("latency", latency_command))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(MessageHandler(
+        filters.ChatType.PRIVATE & (filters.Document.FileExtension("yaml") | filters.Document.FileExtension("yml")
+                                    | filters.Document.FileExtension("json")),
+        import_document
+    ))
+
     # 5. Launch Bot & Engine
-    logger.info("[Main] Launching bot and supervisor...")
-    loop = asyncio.get_event_loop()
-    loop.create_task(engine_supervisor())
+    if webhook:
+        logger.info(f"[Main] Launching bot (webhook, role {args.role})...")
+        asyncio.run(run_webhook(application, args, engine=engine))
+        return
+
+    logger.info(f"[Main] Launching bot (role {args.role})...")
+    processing = start_background_tasks(asyncio.get_event_loop(), args, engine=engine)
+    # run_polling stops the Application on SIGTERM/SIGINT, then runs this before closing the loop
+    application.post_stop = lambda app: shutdown(processing)
+    # Polling removes a webhook left registered by an earlier webhook-mode run
     application.run_polling()
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+# providers/__init__.py
+
+import importlib
+from typing import Dict, Type
+
+# Platform -> "module:Class". Modules are imported on first use, so a deployment
+# that never touches Twitter never pays for twikit (or feedparser, or groq).
+SOURCES = {
+    "twitter_rss": "providers.sources.rss:RSSSource",
+    "twitter": "providers.sources.twitter:TwikitSource",
+    "telegram": "providers.sources.telegram:TelegramSource",
+}
+
+PUBLISHERS = {
+    "telegram": "providers.publishers.telegram:TelegramPublisher",
+    "twitter": "providers.publishers.twitter:TwitterPublisher",
+}
+
+_loaded: Dict[str, Type] = {}
+
+def _load(spec: str) -> Type:
+    cls = _loaded.get(spec)
+    if cls is None:
+        module, _, name = spec.partition(":")
+        cls = _loaded[spec] = getattr(importlib.import_module(module), name)
+    return cls
+
+def source_class(platform: str) -> Type:
+    if platform not in SOURCES:
+        raise ValueError(f"Unknown source platform: {platform}")
+    return _load(SOURCES[platform])
+
+def publisher_class(platform: str) -> Type:
+    if platform not in PUBLISHERS:
+        raise ValueError(f"Unknown destination platform: {platform}")
+    return _load(PUBLISHERS[platform])
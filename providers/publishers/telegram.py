@@ -1,18 +1,106 @@
 # providers/publishers/telegram.py
 
+import asyncio
+import time
 from telegram import Bot
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter, TimedOut
 from services.logger import logger
-from services.utils import retry_async
-from typing import List, Optional
+from services.rate_limiter import get_telegram_limiter
+from services.file_id_cache import file_id_cache
+from services.media_cache import media_cache
+from services.media_urls import media_kind, media_prober, parse_telegram_file_ref
+from services.metrics import metrics, timed
+from typing import Any, Awaitable, Callable, List, Optional
+
+PUBLISH_SECONDS = metrics.histogram("publish_seconds", "Latency of one publish attempt per destination platform",
+                                    ["platform", "method", "outcome"])
 
 class TelegramPublisher:
+    MAX_FLOOD_WAITS = 5
+    MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
     def __init__(self, bot: Bot):
         self.bot = bot
+        self.limiter = get_telegram_limiter(bot.token)
+
+    async def _send(self, chat_id: str, call: Callable[[], Awaitable[Any]], messages: int = 1) -> Any:
+        """Sends through the token buckets, honouring Telegram's RetryAfter exactly."""
+        for _ in range(self.MAX_FLOOD_WAITS):
+            await self.limiter.acquire(chat_id, messages)
+            try:
+                return await call()
+            except RetryAfter as e:
+                wait = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+                logger.warning(f"[Telegram] Flood control for {chat_id}. Retrying in {wait}s...")
+                self.limiter.retry_after(chat_id, wait)
+        await self.limiter.acquire(chat_id, messages)
+        return await call()
+
+    @staticmethod
+    def _file_id(message: Any) -> Optional[str]:
+        """Extracts the file_id Telegram assigned to a sent media message."""
+        if getattr(message, 'photo', None):
+            return message.photo[-1].file_id
+        for attr in ('video', 'animation', 'document'):
+            media = getattr(message, attr, None)
+            if media:
+                return media.file_id
+        return None
+
+    async def _send_media(self, chat_id: str, urls: List[str], build: Callable[[List[str]], Awaitable[Any]], messages: int = 1) -> Any:
+        """Sends media by cached file_id. The first sender of an uncached URL uploads it while
+        concurrent destinations wait, then reuse the file_id Telegram returned."""
+        captured = [parse_telegram_file_ref(u) for u in urls]
+        if all(captured):
+            # Media captured from a channel: the bot can resend its file_ids as they are
+            return await self._send(chat_id, lambda: build([file_id for _, file_id in captured]), messages)
+        keys = [file_id_cache.key(self.bot.token, u) for u in urls]
+        refs = [file_id_cache.get(k) for k in keys]
+        if all(refs):
+            try:
+                return await self._send(chat_id, lambda: build(refs), messages)
+            except BadRequest as e:
+                logger.warning(f"[Telegram] Cached file_id rejected ({e}). Re-sending from URL...")
+                file_id_cache.invalidate(keys)
+
+        async with file_id_cache.lock(keys):
+            cached = [file_id_cache.get(k) for k in keys]
+            refs = [c or u for c, u in zip(cached, urls)]
+            try:
+                result = await self._send(chat_id, lambda: build(refs), messages)
+            except (BadRequest, TimedOut) as e:
+                # Telegram couldn't fetch the URL itself: upload the bytes from the shared media cache
+                uploads = await self._cached_bytes(urls, cached)
+                if uploads is None:
+                    raise
+                logger.warning(f"[Telegram] URL send to {chat_id} failed ({e}). Uploading from media cache...")
+                result = await self._send(chat_id, lambda: build(uploads), messages)
 
-    @retry_async(retries=3, delay=2.0)
+            sent = result if isinstance(result, (list, tuple)) else [result]
+            for key, file_id, message in zip(keys, cached, sent):
+                new_file_id = self._file_id(message) if file_id is None else None
+                if new_file_id:
+                    file_id_cache.put(key, new_file_id)
+            return result
+
+    async def _cached_bytes(self, urls: List[str], cached: List[Optional[str]]) -> Optional[List[Any]]:
+        """Replaces uncached URLs with their bytes from the media cache, or None if unavailable."""
+        refs = []
+        for url, file_id in zip(urls, cached):
+            if file_id:
+                refs.append(file_id)
+                continue
+            entry = await media_cache.fetch(url, max_bytes=self.MAX_UPLOAD_BYTES)
+            if entry is None:
+                return None
+            refs.append(await media_cache.read(entry.content_hash))
+        return refs
+
+    @timed(PUBLISH_SECONDS, lambda *a, **k: {"platform": "telegram", "method": "send"})
     async def publish(self, chat_id: str, text: str, media_urls: List[str] = []) -> bool:
         """Publishes content with auto-splitting for long texts. Returns True on success."""
+        started = time.monotonic()
         try:
             # 1. Handle Text Splitting (> 4096 chars)
             max_len = 4000
@@ -20,43 +108,75 @@ class TelegramPublisher:
             
             if not media_urls:
                 for chunk in chunks:
-                    await self.bot.send_message(
+                    await self._send(chat_id, lambda chunk=chunk: self.bot.send_message(
                         chat_id=chat_id,
                         text=chunk,
                         parse_mode=ParseMode.MARKDOWN
-                    )
-            elif len(media_urls) == 1:
-                # Single media item
-                url = media_urls[0]
-                caption = chunks[0] if chunks else ""
-                
-                if ".mp4" in url.lower():
-                    await self.bot.send_video(chat_id=chat_id, video=url, caption=caption, parse_mode=ParseMode.MARKDOWN)
-                else:
-                    await self.bot.send_photo(chat_id=chat_id, photo=url, caption=caption, parse_mode=ParseMode.MARKDOWN)
-                
-                # Send remaining chunks if any
-                for extra_chunk in chunks[1:]:
-                    await self.bot.send_message(chat_id=chat_id, text=extra_chunk, parse_mode=ParseMode.MARKDOWN)
+                    ))
             else:
-                # Multiple media
-                from telegram import InputMediaPhoto, InputMediaVideo
-                media_group = []
-                for i, url in enumerate(media_urls[:10]):
-                    caption = chunks[0] if i == 0 else None
-                    if ".mp4" in url.lower():
-                        media_group.append(InputMediaVideo(url, caption=caption, parse_mode=ParseMode.MARKDOWN))
-                    else:
-                        media_group.append(InputMediaPhoto(url, caption=caption, parse_mode=ParseMode.MARKDOWN))
+                # Resolve each URL once (cached HEAD) to pick photo/video/animation/document
+                infos = await asyncio.gather(*[media_prober.resolve(u) for u in media_urls[:10]])
+                urls = [info.url for info in infos]
+                kinds = [media_kind(info) for info in infos]
+
+                if len(urls) == 1:
+                    # Single media item
+                    caption = chunks[0] if chunks else ""
+                    send = getattr(self.bot, f"send_{kinds[0]}")
+                    await self._send_media(chat_id, urls, lambda refs: send(
+                        chat_id=chat_id, caption=caption, parse_mode=ParseMode.MARKDOWN, **{kinds[0]: refs[0]}))
                 
-                await self.bot.send_media_group(chat_id=chat_id, media=media_group)
+                    # Send remaining chunks if any
+                    for extra_chunk in chunks[1:]:
+                        await self._send(chat_id, lambda extra_chunk=extra_chunk: self.bot.send_message(chat_id=chat_id, text=extra_chunk, parse_mode=ParseMode.MARKDOWN))
+                else:
+                    # Multiple media
+                    from telegram import InputMediaDocument, InputMediaPhoto, InputMediaVideo
+                    # Documents can only be grouped with documents
+                    as_documents = "document" in kinds
+
+                    def build_group(refs: List[str]):
+                        media_group = []
+                        for i, (kind, ref) in enumerate(zip(kinds, refs)):
+                            caption = chunks[0] if i == 0 and chunks else None
+                            if as_documents:
+                                media_group.append(InputMediaDocument(ref, caption=caption, parse_mode=ParseMode.MARKDOWN))
+                            elif kind in ("video", "animation"):
+                                media_group.append(InputMediaVideo(ref, caption=caption, parse_mode=ParseMode.MARKDOWN))
+                            else:
+                                media_group.append(InputMediaPhoto(ref, caption=caption, parse_mode=ParseMode.MARKDOWN))
+                        return self.bot.send_media_group(chat_id=chat_id, media=media_group)
+
+                    # Each album entry counts as a separate message against the limits
+                    await self._send_media(chat_id, urls, build_group, messages=len(urls))
                 
-                # Send remaining chunks
-                for extra_chunk in chunks[1:]:
-                    await self.bot.send_message(chat_id=chat_id, text=extra_chunk, parse_mode=ParseMode.MARKDOWN)
+                    # Send remaining chunks
+                    for extra_chunk in chunks[1:]:
+                        await self._send(chat_id, lambda extra_chunk=extra_chunk: self.bot.send_message(chat_id=chat_id, text=extra_chunk, parse_mode=ParseMode.MARKDOWN))
             
-            logger.info(f"[Telegram] Successfully published to {chat_id}")
+            logger.info(f"[Telegram] Successfully published to {chat_id}", stage="publish.success",
+                        duration_ms=round((time.monotonic() - started) * 1000))
             return True
         except Exception as e:
             logger.error(f"[Telegram] Publish failed to {chat_id}: {e}")
             return False
+
+    @timed(PUBLISH_SECONDS, lambda *a, **k: {"platform": "telegram", "method": "copy"})
+    async def copy(self, chat_id: str, from_chat_id: str, message_ids: List[int]) -> bool:
+        """Copies posts server-side without re-uploading. Albums go out whole in one call."""
+        started = time.monotonic()
+        try:
+            if len(message_ids) == 1:
+                await self._send(chat_id, lambda: self.bot.copy_message(
+                    chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_ids[0]))
+            else:
+                ids = sorted(message_ids)[:100]
+                await self._send(chat_id, lambda: self.bot.copy_messages(
+                    chat_id=chat_id, from_chat_id=from_chat_id, message_ids=ids), messages=len(ids))
+
+            logger.info(f"[Telegram] Successfully copied {len(message_ids)} message(s) from {from_chat_id} to {chat_id}",
+                        stage="publish.success", duration_ms=round((time.monotonic() - started) * 1000))
+            return True
+        except Exception as e:
+            logger.error(f"[Telegram] Copy failed from {from_chat_id} to {chat_id}: {e}")
+            return False
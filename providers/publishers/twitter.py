@@ -1,12 +1,22 @@
 # providers/publishers/twitter.py
 
 import os
+import time
+import asyncio
 from twikit import Client
 from services.logger import logger
-from services.utils import retry_async
-from typing import List, Optional, Any
+from services.media_cache import MediaEntry, media_cache
+from services.metrics import metrics, timed
+from typing import List, Optional
+
+PUBLISH_SECONDS = metrics.histogram("publish_seconds", "Latency of one publish attempt per destination platform",
+                                    ["platform", "method", "outcome"])
+MEDIA_DROPPED = metrics.counter("media_dropped_total", "Attachments left out of a published post", ["platform"])
 
 class TwitterPublisher:
+    MAX_MEDIA = 4
+    MAX_MEDIA_BYTES = 15 * 1024 * 1024
+
     def __init__(self, username: str, password: str, cookies_path: str = "cookies_tw.json"):
         self.client = Client('en-US')
         self.username = username
@@ -14,6 +24,10 @@ class TwitterPublisher:
         self.cookies_path = cookies_path
         self._is_logged_in = False
 
+    async def close(self):
+        """Closes the twikit HTTP session."""
+        await self.client.http.aclose()
+
     async def _ensure_login(self):
         if self._is_logged_in:
             return
@@ -31,53 +45,40 @@ class TwitterPublisher:
             logger.error(f"[Twitter] Login failed: {e}")
             raise
 
-    async def _download_media(self, url: str, client: Any) -> Optional[str]:
-        """Downloads media to a temporary file using provided client."""
-        import tempfile
+    async def _download_media(self, url: str) -> Optional[MediaEntry]:
+        """Fetches media through the shared on-disk cache (streamed, size-capped)."""
+        return await media_cache.fetch(url, max_bytes=self.MAX_MEDIA_BYTES)
+
+    async def _upload_media(self, url: str, entry: Optional[MediaEntry]) -> Optional[str]:
+        """Uploads a cached attachment and returns its media id."""
+        if not entry:
+            return None
         try:
-            resp = await client.get(url)
-            if resp.status_code == 200:
-                ext = url.split(".")[-1].split("?")[0] or "jpg"
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f".{ext}")
-                temp_file.write(resp.content)
-                temp_file.close()
-                return temp_file.name
+            return await self.client.upload_media(await media_cache.read(entry.content_hash), media_type=entry.content_type)
         except Exception as e:
-            logger.error(f"[Twitter] Download failed for {url}: {e}")
-        return None
+            logger.error(f"[Twitter] Upload failed for {url}: {e}")
+            return None
 
-    @retry_async(retries=3, delay=5.0)
+    @timed(PUBLISH_SECONDS, lambda *a, **k: {"platform": "twitter", "method": "send"})
     async def publish(self, text: str, media_urls: List[str] = []):
         """Publishes content to Twitter with media support."""
-        media_ids = []
-        temp_files = []
+        started = time.monotonic()
         try:
             await self._ensure_login()
             
-            # Twitter allows up to 4 images
-            import httpx
-            from typing import Any
-            async with httpx.AsyncClient(timeout=15) as client:
-                for url in media_urls[:4]:
-                    local_path = await self._download_media(url, client)
-                    if local_path:
-                        temp_files.append(local_path)
-                        try:
-                            mid = await self.client.upload_media(local_path)
-                            media_ids.append(mid)
-                        except Exception as e:
-                            logger.error(f"[Twitter] Upload failed for {url}: {e}")
+            # Twitter allows up to 4 images: fetch them all at once (cached), upload from memory
+            urls = media_urls[:self.MAX_MEDIA]
+            downloads = await asyncio.gather(*[self._download_media(url) for url in urls])
+            uploads = await asyncio.gather(*[self._upload_media(url, media) for url, media in zip(urls, downloads)])
+            media_ids = [mid for mid in uploads if mid]
+            if len(media_ids) < len(urls):
+                MEDIA_DROPPED.labels(platform="twitter").inc(len(urls) - len(media_ids))
+                logger.warning(f"[Twitter] Posting without {len(urls) - len(media_ids)} of {len(urls)} media items.")
 
             await self.client.create_tweet(text=text, media_ids=media_ids if media_ids else None)
-            logger.info(f"[Twitter] Published tweet with {len(media_ids)} media items.")
+            logger.info(f"[Twitter] Published tweet with {len(media_ids)} media items.", stage="publish.success",
+                        duration_ms=round((time.monotonic() - started) * 1000))
             return True
         except Exception as e:
             logger.error(f"[Twitter] Publish failed: {e}")
             return False
-        finally:
-            # Always cleanup temporary files
-            for f in temp_files:
-                try:
-                    if os.path.exists(f): os.remove(f)
-                except:
-                    pass
@@ -1,14 +1,21 @@
 # providers/sources/rss.py
 
-import feedparser
+import asyncio
+import calendar
+import os
 import re
 import time
 import httpx
 from typing import List, Optional, Dict, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
 from services.logger import logger
+from services.media_urls import normalize_media_url
+from services.metrics import metrics
 from database.manager import db
 
+MIRROR_SECONDS = metrics.histogram("rss_mirror_fetch_seconds", "Nitter mirror fetch latency", ["mirror", "outcome"])
+
 @dataclass
 class SourceItem:
     id: str
@@ -17,6 +24,11 @@ class SourceItem:
     author: str
     url: str
     timestamp: float
+    # Origin of Telegram posts, used to copy them server-side
+    chat_id: Optional[str] = None
+    message_ids: List[int] = field(default_factory=list)
+    # Lifecycle timestamps (services.tracing.TraceContext), set once the engine picks it up
+    trace: Optional[Any] = None
 
 class RSSSource:
     """Robust RSS feed monitor with mirror rotation and health tracking."""
@@ -35,17 +47,28 @@ class RSSSource:
     ]
 
     def __init__(self, mirrors: Optional[List[str]] = None):
-        self.mirrors = mirrors or self.DEFAULT_MIRRORS
-        # Register mirrors in DB if not present
+        # NITTER_MIRRORS (comma-separated) overrides the built-in list
+        configured = [m.strip().rstrip("/") for m in (os.getenv("NITTER_MIRRORS") or "").split(",") if m.strip()]
+        self.mirrors = mirrors or configured or self.DEFAULT_MIRRORS
+        self._registered = False
+
+    def _register_mirrors(self):
+        # Register mirrors in DB if not present; once per instance, on first fetch
+        self._registered = True
         try:
-            for m in self.mirrors:
-                db.register_mirror(m)
+            db.register_mirrors(self.mirrors)
         except Exception:
             pass
 
-    def fetch_latest(self, identifier: str) -> List[SourceItem]:
-        """Fetches from mirrors with intelligent rotation and health tracking."""
+    async def fetch_latest(self, identifier: str) -> List[SourceItem]:
+        """Fetches from mirrors with intelligent rotation and health tracking.
+
+        Mirror health is read and written on the calling loop, since the database
+        connection is shared; only the HTTP fetch and parse run in a worker thread.
+        """
         username = identifier.strip('@')
+        if not self._registered:
+            self._register_mirrors()
         
         # 1. Try health-ranked mirrors
         try:
@@ -58,10 +81,13 @@ class RSSSource:
         errors = []
         for mirror in active_mirrors:
             rss_url = f"{mirror}/{username}/rss"
+            started = time.monotonic()
             try:
-                logger.info(f"[RSS] Fetching from mirror: {mirror}")
-                items = self._fetch_from_url(rss_url, username)
+                items = await asyncio.to_thread(self._fetch_from_url, rss_url, username)
                 if items:
+                    MIRROR_SECONDS.labels(mirror=mirror, outcome="ok").observe(time.monotonic() - started)
+                    logger.info(f"[RSS] Mirror {mirror} returned {len(items)} items", stage="rss.mirror",
+                                source=username, duration_ms=round((time.monotonic() - started) * 1000))
                     try: db.update_mirror_status(mirror, True)
                     except Exception: pass
                     return items
@@ -69,11 +95,14 @@ class RSSSource:
                     raise Exception("Empty or invalid feed")
             except Exception as e:
                 err_msg = str(e)
-                logger.error(f"[RSS] Mirror {mirror} failed: {err_msg}")
+                MIRROR_SECONDS.labels(mirror=mirror, outcome="error").observe(time.monotonic() - started)
+                # One mirror failing is routine rotation; only "all mirrors failed" reaches the admin digest
+                logger.warning(f"[RSS] Mirror {mirror} failed: {err_msg}", stage="rss.mirror", source=username,
+                               duration_ms=round((time.monotonic() - started) * 1000))
                 errors.append(err_msg)
                 try: db.update_mirror_status(mirror, False)
                 except Exception: pass
-                time.sleep(1) # Grace period
+                await asyncio.sleep(1) # Grace period
                 
         logger.error(f"[RSS] All mirrors failed for {username}. Errors: {errors}")
         return []
@@ -85,6 +114,7 @@ class RSSSource:
             resp.raise_for_status()
             xml_content = resp.text
         
+        import feedparser  # Deferred: only RSS deployments need it
         feed = feedparser.parse(xml_content)
         if feed.bozo:
             raise Exception(f"Feed parsing error: {feed.bozo_exception}")
@@ -92,11 +122,14 @@ class RSSSource:
         if not feed.entries:
             return []
 
+        parsed = urlparse(rss_url)
+        base_url = f"{parsed.scheme}://{parsed.netloc}"
         items = []
         for entry in feed.entries:
             # Extract ID and handle timestamp
             entry_id = entry.get('id', entry.get('link', ''))
-            ts = time.mktime(entry.published_parsed) if 'published_parsed' in entry else time.time()
+            # feedparser normalizes dates to UTC struct_time; mktime would apply the local offset
+            ts = calendar.timegm(entry.published_parsed) if entry.get('published_parsed') else time.time()
             
             # Basic text extraction
             text = entry.get('title', '')
@@ -106,8 +139,11 @@ class RSSSource:
             # Media extraction (Nitter usually puts it in description or media:content)
             media_urls = []
             if 'summary' in entry:
-                media_matches = re.findall(r'src="([^"]+)"', entry.summary)
-                media_urls.extend(media_matches)
+                for src in re.findall(r'src="([^"]+)"', entry.summary):
+                    # Bypass the mirror's /pic/ proxy in favour of the origin CDN
+                    url = normalize_media_url(src, base_url)
+                    if url not in media_urls:
+                        media_urls.append(url)
             
             items.append(SourceItem(
                 id=entry_id,
@@ -2,8 +2,10 @@
 
 from telegram import Bot
 from typing import List, Optional
+from database.manager import db
 from services.logger import logger
 from providers.sources.rss import SourceItem
+import json
 import time
 
 class TelegramSource:
@@ -12,28 +14,36 @@ class TelegramSource:
     def __init__(self, bot: Bot):
         self.bot = bot
 
-    async def fetch_latest(self, identifier: str) -> List[SourceItem]:
+    async def fetch_latest(self, identifier: str, source_id: Optional[int] = None) -> List[SourceItem]:
         """
-        Fetches latest messages from the local source_items table.
-        Items are captured in real-time by the main bot loop.
+        Fetches posts the task source `source_id` has not handled yet from the local source_items table.
+        Items are captured in real-time by the main bot loop (services.capture).
         """
         try:
             # Pull from Captured Items table
-            raw_items = db.get_unread_source_items(str(identifier), "telegram")
+            raw_items = db.get_unread_source_items(str(identifier), "telegram", source_id=source_id)
             
             items = []
             for raw in raw_items:
                 media_urls = json.loads(raw['media_json']) if raw['media_json'] else []
+                message_ids = json.loads(raw['message_ids']) if raw.get('message_ids') else []
+                chat_id = raw['item_id'].rsplit(":", 1)[0]
                 items.append(SourceItem(
                     id=raw['item_id'],
                     text=raw['content'] or "",
                     media_urls=media_urls,
                     author=identifier,
-                    url=f"https://t.me/c/{str(identifier).replace('-100', '')}/{raw['item_id']}",
-                    timestamp=raw['created_at'].timestamp() if hasattr(raw['created_at'], 'timestamp') else time.time()
+                    url=f"https://t.me/c/{chat_id.replace('-100', '')}/{message_ids[0] if message_ids else ''}",
+                    timestamp=raw['posted_at'] or time.time(),
+                    chat_id=chat_id,
+                    message_ids=message_ids
                 ))
             return items
             
         except Exception as e:
             logger.error(f"[TelegramSource] Fetch failed for {identifier}: {e}")
             return []
+
+    def ack(self, source_id: int, identifier: str, item_ids: List[str]):
+        """Marks posts handled by one task source so its next fetch skips them."""
+        db.mark_source_items_consumed(source_id, "telegram", str(identifier), item_ids)
@@ -18,6 +18,10 @@ class TwikitSource:
         self.cookies_path = cookies_path
         self._is_logged_in = False
 
+    async def close(self):
+        """Closes the twikit HTTP session."""
+        await self.client.http.aclose()
+
     async def _ensure_login(self):
         if self._is_logged_in:
             return
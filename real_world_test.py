@@ -47,7 +47,7 @@ async def test_rss_fetch():
     logger.info("[Test] Testing Real-World RSS Fetch (Nitter Mirrors)...")
     rss = RSSSource()
     # Test with a known active nitter mirror if possible, or use the rotation
-    items = rss.fetch_latest("VitalikButerin")
+    items = await rss.fetch_latest("VitalikButerin")
     if items:
         logger.info(f"✅ RSS Fetch Verified: Retrieved {len(items)} items from mirrors.")
         return True
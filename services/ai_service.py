@@ -1,29 +1,61 @@
 # services/ai_service.py
 
-import os
-from groq import AsyncGroq
 from services.logger import logger
 from services.config_service import config
 from services.utils import retry_async
+from services.metrics import metrics, timed
+
+MODEL = "llama-3.1-70b-versatile"
+
+AI_SECONDS = metrics.histogram("ai_request_seconds", "AI transformation latency, including retries", ["model", "outcome"])
+AI_TOKENS = metrics.histogram("ai_tokens", "Tokens per AI request", ["model", "kind"],
+                              buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192))
 
 class AIService:
     def __init__(self):
-        self.client = None
-        self._init_client()
+        self._client = None
+        self._initialized = False
+
+    @property
+    def client(self):
+        """The Groq client, created (and the SDK imported) on first use."""
+        if not self._initialized:
+            self._initialized = True
+            self._init_client()
+        return self._client
 
     def _init_client(self):
         api_key = config.groq_key
         if api_key:
             try:
-                self.client = AsyncGroq(api_key=api_key)
+                from groq import AsyncGroq
+                self._client = AsyncGroq(api_key=api_key)
                 logger.info("[AI] Async Groq client initialized.")
             except Exception as e:
                 logger.error(f"[AI] Failed to initialize Async Groq: {e}")
 
+    def reset(self):
+        """Drops the client so the next use picks up a changed API key."""
+        self._client = None
+        self._initialized = False
+
+    async def close(self):
+        """Closes the Groq client's connection pool; the next use opens a new one."""
+        if self._client is not None:
+            await self._client.close()
+        self.reset()
+
+    def is_enabled(self, options: dict) -> bool:
+        """True when the options ask for any transformation and a client is available."""
+        if not self.client:
+            return False
+        return bool(options.get("redesign", True) or options.get("summarize") or options.get("reword"))
+
+    @timed(AI_SECONDS, lambda *a, **k: {"model": MODEL})
     @retry_async(retries=3, delay=2.0, backoff=2.0)
     async def process_content(self, text: str, options: dict) -> str:
         """Transforms content into a premium format using LLaMA3 (Async)."""
-        if not self.client:
+        if not self.is_enabled(options):
             return text
 
         # Professional Redesign Strategy
@@ -54,9 +86,13 @@ class AIService:
                     {"role": "system", "content": system_instructions},
                     {"role": "user", "content": f"Task: {refinement_prompt}\n\nContent:\n{text}"}
                 ],
-                model="llama-3.1-70b-versatile",
+                model=MODEL,
                 temperature=0.7,
             )
+            usage = getattr(chat_completion, "usage", None)
+            if usage:
+                AI_TOKENS.labels(model=MODEL, kind="prompt").observe(usage.prompt_tokens or 0)
+                AI_TOKENS.labels(model=MODEL, kind="completion").observe(usage.completion_tokens or 0)
             return chat_completion.choices[0].message.content.strip()
         except Exception as e:
             logger.error(f"[AI] Async processing failed: {e}")
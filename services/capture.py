@@ -0,0 +1,191 @@
+# services/capture.py
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Set, Tuple
+from database.manager import db
+from services.logger import logger
+from services.media_urls import telegram_file_ref
+from services.metrics import metrics
+
+CAPTURED = metrics.counter("captured_posts_total", "Channel posts stored for subscribed sources")
+ALBUMS = metrics.counter("captured_albums_total", "Media groups merged into a single captured item")
+
+# Telegram albums hold at most 10 media
+MAX_ALBUM_SIZE = 10
+
+# (platform, identifier) of a source that has new captured items
+CaptureListener = Callable[[str, str], Any]
+
+def message_media(message: Any) -> List[str]:
+    """Captured file references for a post's photo, video, animation or document."""
+    if message.photo:
+        return [telegram_file_ref("photo", message.photo[-1].file_id)]
+    for kind in ("animation", "video", "document"):
+        media = getattr(message, kind, None)
+        if media:
+            return [telegram_file_ref(kind, media.file_id)]
+    return []
+
+@dataclass
+class _Album:
+    identifiers: Set[str]
+    messages: List[Any] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+class CaptureBuffer:
+    """Buffers channel posts from subscribed channels and writes them in batches.
+
+    A batch is flushed when it reaches `max_batch` posts or `max_delay` seconds
+    after its first post, whichever comes first. After each flush, listeners (the
+    engine) are told which sources have new items, so subscribed tasks run at
+    once instead of on the next cycle.
+
+    Album parts (updates sharing a media_group_id) are held until no new part has
+    arrived for `album_window` seconds, then stored as one item carrying all the
+    media and message ids. At most `max_albums` albums are held open; the oldest
+    is closed early when a new one would exceed that.
+    """
+
+    def __init__(self, max_batch: int = 100, max_delay: float = 0.25,
+                 subscription_ttl: float = 60.0, retention: float = 7 * 86400,
+                 album_window: float = 1.0, max_albums: int = 100):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.subscription_ttl = subscription_ttl
+        self.retention = retention
+        self.album_window = album_window
+        self.max_albums = max_albums
+        self._pending: List[tuple] = []
+        self._albums: "OrderedDict[Tuple[int, str], _Album]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._listeners: List[CaptureListener] = []
+        self._subscribed: Set[str] = set()
+        self._subscribed_at = 0.0
+        self._last_prune = 0.0
+
+    def subscribe(self, listener: CaptureListener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: CaptureListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _subscriptions(self, force: bool = False) -> Set[str]:
+        if force or time.time() - self._subscribed_at > self.subscription_ttl:
+            self._subscribed = set(db.get_source_identifiers("telegram"))
+            self._subscribed_at = time.time()
+        return self._subscribed
+
+    def _identifiers(self, chat: Any) -> Set[str]:
+        candidates = {str(chat.id)}
+        if getattr(chat, "username", None):
+            candidates |= {chat.username, f"@{chat.username}"}
+        matched = candidates & self._subscriptions()
+        # A task created moments ago is not in the cached set yet; re-check at most every few seconds
+        if not matched and time.time() - self._subscribed_at > 5:
+            matched = candidates & self._subscriptions(force=True)
+        return matched
+
+    async def add(self, message: Any) -> bool:
+        """Queues a channel post; returns False when no active task watches its channel."""
+        identifiers = self._identifiers(message.chat)
+        if not identifiers:
+            return False
+        CAPTURED.inc()
+
+        if getattr(message, "media_group_id", None):
+            self._add_album_part(message, identifiers)
+            return True
+        if self._queue(self._rows([message], identifiers)):
+            await self.flush()
+        return True
+
+    @staticmethod
+    def _rows(messages: List[Any], identifiers: Set[str]) -> List[tuple]:
+        """One source_items row per identifier for a post or a whole album."""
+        messages = sorted(messages, key=lambda m: m.message_id)
+        first = messages[0]
+        posted_at = first.date.timestamp() if first.date else time.time()
+        # An album's caption sits on one of its parts, usually the first
+        text = next((m.text or m.caption for m in messages if m.text or m.caption), "")
+        media = json.dumps([ref for m in messages for ref in message_media(m)])
+        message_ids = json.dumps([m.message_id for m in messages])
+        item_id = f"{first.chat.id}:{first.message_id}"
+        return [("telegram", identifier, item_id, text, media, message_ids, posted_at)
+                for identifier in sorted(identifiers)]
+
+    def _queue(self, rows: List[tuple]) -> bool:
+        """Adds rows to the next batch; True when the batch is full and should be flushed now."""
+        self._pending.extend(rows)
+        if len(self._pending) >= self.max_batch:
+            return True
+        if self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_delay, lambda: loop.create_task(self.flush()))
+        return False
+
+    def _add_album_part(self, message: Any, identifiers: Set[str]):
+        key = (message.chat.id, message.media_group_id)
+        album = self._albums.get(key)
+        if album is None:
+            if len(self._albums) >= self.max_albums:
+                self._settle_album(next(iter(self._albums)))
+            album = self._albums[key] = _Album(identifiers)
+        elif album.timer is not None:
+            album.timer.cancel()
+        album.messages.append(message)
+
+        if len(album.messages) >= MAX_ALBUM_SIZE:
+            self._settle_album(key)
+        else:
+            album.timer = asyncio.get_running_loop().call_later(self.album_window, self._settle_album, key)
+
+    def _settle_album(self, key: Tuple[int, str]):
+        album = self._albums.pop(key, None)
+        if album is None:
+            return
+        if album.timer is not None:
+            album.timer.cancel()
+        ALBUMS.inc()
+        if self._queue(self._rows(album.messages, album.identifiers)):
+            asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        """Writes buffered posts in one transaction and notifies listeners."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            db.save_source_items(rows)
+        except Exception as e:
+            logger.error(f"[Capture] Could not store {len(rows)} captured posts: {e}")
+            return
+        logger.debug(f"[Capture] Stored {len(rows)} captured posts", stage="capture.flush")
+
+        for platform, identifier in sorted({(r[0], r[1]) for r in rows}):
+            for listener in list(self._listeners):
+                try:
+                    listener(platform, identifier)
+                except Exception as e:
+                    logger.warning(f"[Capture] Listener failed for {platform}:{identifier}: {e}")
+
+        if time.time() - self._last_prune > 3600:
+            self._last_prune = time.time()
+            db.prune_source_items(time.time() - self.retention)
+
+    async def close(self):
+        """Shutdown: closes every open album and writes everything still buffered."""
+        for key in list(self._albums):
+            self._settle_album(key)
+        await self.flush()
+
+# Global Instance
+capture_buffer = CaptureBuffer()
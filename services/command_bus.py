@@ -0,0 +1,160 @@
+# services/command_bus.py
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from database.manager import COMMAND_CHANNEL, db
+from services.logger import logger
+from services.metrics import metrics
+
+COMMANDS = metrics.counter("engine_commands_total", "Commands published to or received from other processes",
+                           ["command", "direction"])
+
+@dataclass
+class Command:
+    id: int
+    name: str
+    task_id: Optional[int]
+    payload: Dict[str, Any]
+    origin: str
+
+CommandHandler = Callable[[Command], Any]
+
+class CommandBus:
+    """Carries admin changes from the bot front-end to engine processes.
+
+    publish() appends a row to `engine_commands` and hands the command to this
+    process's own subscribers right away. run() delivers commands published by
+    other processes: on Postgres it LISTENs and wakes on the NOTIFY sent at
+    commit, on SQLite it polls for ids above the last one seen every
+    `poll_interval` seconds. Commands are hints that let engines act at once; the
+    engine's periodic cycle still picks up anything a process missed while it
+    was down, so rows older than `retention` seconds are simply pruned.
+
+    Subscribers always run on the event loop they subscribed (or run() was
+    started) on: a command published from a worker thread is handed over with
+    call_soon_threadsafe.
+    """
+
+    def __init__(self, poll_interval: float = 1.0, listen_interval: float = 30.0, retention: float = 3600.0):
+        self.poll_interval = poll_interval
+        # With LISTEN, polling is only a safety net for a dropped connection
+        self.listen_interval = listen_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex[:12]
+        self._handlers: List[CommandHandler] = []
+        self._last_id: Optional[int] = None
+        self._last_prune = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self):
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+    def subscribe(self, handler: CommandHandler):
+        self._bind_loop()
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+
+    def unsubscribe(self, handler: CommandHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def publish(self, name: str, task_id: Optional[int] = None, **payload: Any):
+        """Records a command for every engine process; never raises into the caller."""
+        try:
+            command_id = db.publish_command(name, task_id, json.dumps(payload), self.origin, time.time())
+        except Exception as e:
+            logger.error(f"[Commands] Could not publish {name}: {e}")
+            command_id = 0
+        COMMANDS.labels(command=name, direction="published").inc()
+        self._dispatch(Command(command_id, name, task_id, payload, self.origin))
+
+    def source_updated(self, platform: str, identifier: str):
+        """Capture listener: tells engines that a source has new captured items."""
+        self.publish("source_items", platform=platform, identifier=identifier)
+
+    def _dispatch(self, command: Command):
+        loop = self._loop
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if loop is not None and current is not loop and loop.is_running():
+            loop.call_soon_threadsafe(self._dispatch_now, command)
+        else:
+            self._dispatch_now(command)
+
+    def _dispatch_now(self, command: Command):
+        for handler in list(self._handlers):
+            try:
+                result = handler(command)
+                if asyncio.iscoroutine(result):
+                    asyncio.get_running_loop().create_task(result)
+            except Exception as e:
+                logger.warning(f"[Commands] Handler failed for {command.name}: {e}")
+
+    def poll(self) -> int:
+        """Dispatches commands other processes published since the last poll; returns how many."""
+        if self._last_id is None:
+            # Earlier commands are covered by the engine's first full cycle
+            self._last_id = db.get_last_command_id()
+            return 0
+        received = 0
+        for row in db.get_commands_after(self._last_id):
+            self._last_id = row['id']
+            if row['origin'] == self.origin:
+                continue
+            received += 1
+            COMMANDS.labels(command=row['command'], direction="received").inc()
+            self._dispatch(Command(row['id'], row['command'], row['task_id'],
+                                   json.loads(row['payload'] or "{}"), row['origin']))
+        return received
+
+    async def run(self):
+        """Delivers remote commands until cancelled."""
+        self._bind_loop()
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        conn = None
+        try:
+            conn = db.listen(COMMAND_CHANNEL)
+        except Exception as e:
+            logger.warning(f"[Commands] LISTEN unavailable, polling instead: {e}")
+        if conn is not None:
+            def on_notify():
+                conn.poll()
+                conn.notifies.clear()
+                wake.set()
+            loop.add_reader(conn.fileno(), on_notify)
+        interval = self.listen_interval if conn is not None else self.poll_interval
+        logger.info(f"[Commands] Receiving engine commands ({'LISTEN' if conn is not None else 'polling'})")
+
+        try:
+            self.poll()
+            while True:
+                try:
+                    await asyncio.wait_for(wake.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+                try:
+                    self.poll()
+                    if time.time() - self._last_prune > 3600:
+                        self._last_prune = time.time()
+                        db.prune_commands(time.time() - self.retention)
+                except Exception as e:
+                    logger.warning(f"[Commands] Poll failed: {e}")
+        finally:
+            if conn is not None:
+                loop.remove_reader(conn.fileno())
+                conn.close()
+
+# Global Instance
+command_bus = CommandBus(poll_interval=float(os.getenv("COMMAND_POLL_INTERVAL", "1.0")))
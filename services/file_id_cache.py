@@ -0,0 +1,104 @@
+# services/file_id_cache.py
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from database.manager import db
+from services.logger import logger
+
+@dataclass
+class _KeyLock:
+    lock: asyncio.Lock
+    # Senders holding or waiting for the lock; it is dropped only when none are left
+    users: int = 0
+
+class FileIdCache:
+    """Maps media URLs (or content hashes) to Telegram file_ids with LRU/TTL eviction.
+
+    Entries are persisted so reposts after a restart also skip the upload.
+    file_ids are only valid for the bot that received them, so keys are bot-scoped.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl: float = 14 * 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._locks: Dict[str, _KeyLock] = {}
+        self._loaded = False
+
+    @staticmethod
+    def key(bot_token: str, ref: str) -> str:
+        return f"{bot_token.split(':')[0]}:{ref}"
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            db.prune_file_ids(time.time() - self.ttl)
+            for row in db.get_file_ids(self.max_entries):
+                self._entries[row['media_key']] = (row['file_id'], row['stored_at'])
+            # Rows arrive most recent first; the LRU end must be the most recent
+            self._entries = OrderedDict(reversed(list(self._entries.items())))
+            logger.info(f"[FileIdCache] Loaded {len(self._entries)} cached file_ids.")
+        except Exception as e:
+            logger.error(f"[FileIdCache] Failed to load cache: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        self._load()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        file_id, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            self.invalidate([key])
+            return None
+        self._entries.move_to_end(key)
+        return file_id
+
+    def put(self, key: str, file_id: str):
+        self._load()
+        ts = time.time()
+        self._entries[key] = (file_id, ts)
+        self._entries.move_to_end(key)
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted.append(self._entries.popitem(last=False)[0])
+        try:
+            db.save_file_id(key, file_id, ts)
+            if evicted:
+                db.delete_file_ids(evicted)
+        except Exception as e:
+            logger.error(f"[FileIdCache] Failed to persist file_id: {e}")
+
+    def invalidate(self, keys: List[str]):
+        for key in keys:
+            self._entries.pop(key, None)
+        try:
+            db.delete_file_ids(keys)
+        except Exception as e:
+            logger.error(f"[FileIdCache] Failed to invalidate file_ids: {e}")
+
+    @asynccontextmanager
+    async def lock(self, keys: List[str]):
+        """Single-flight guard: concurrent senders of the same media wait for the first upload."""
+        keys = sorted(set(keys))
+        for key in keys:
+            self._locks.setdefault(key, _KeyLock(asyncio.Lock())).users += 1
+        try:
+            async with AsyncExitStack() as stack:
+                for key in keys:
+                    await stack.enter_async_context(self._locks[key].lock)
+                yield
+        finally:
+            for key in keys:
+                entry = self._locks[key]
+                entry.users -= 1
+                if entry.users == 0:
+                    del self._locks[key]
+
+# Global Instance
+file_id_cache = FileIdCache()
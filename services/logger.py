@@ -1,67 +1,247 @@
 # services/logger.py
 
+import asyncio
+import atexit
+import gzip
+import json
 import logging
 import os
-from datetime import datetime
+import queue
+import random
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict
 
-class Logger:
-    def __init__(self, name="bot", log_dir="logs"):
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
-        self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.INFO)
-        
-        # Formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
-        # Console Handler
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
-        
-        # File Handler (Rotating logs would be better, but file handler is a start)
-        log_file = os.path.join(log_dir, f"{name}_{datetime.now().strftime('%Y%m%d')}.log")
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
-
-    def info(self, msg):
-        self.logger.info(msg)
-
-    def error(self, msg, exc_info=False):
-        """Logs error and sends a detailed Telegram alert."""
-        self.logger.error(msg, exc_info=exc_info)
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        alert_msg = (
-            f"🚨 <b>SYSTEM ERROR DETECTED</b>\n\n"
-            f"⏰ <b>Timestamp:</b> <code>{timestamp}</code>\n"
-            f"📑 <b>Summary:</b>\n<code>{msg}</code>\n\n"
+# Structured fields carried on records via `extra`
+LOG_FIELDS = ("task_id", "source", "stage", "duration_ms")
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with stable field names."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """Rotates on size or at midnight, gzipping rotated files."""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+        self._day = date.today()
+
+    @staticmethod
+    def _compress(source: str, dest: str):
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if date.today() != self._day:
+            self._day = date.today()
+            return True
+        return bool(super().shouldRollover(record))
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parses 'stage=rate,stage=rate' (e.g. 'rss.mirror=0.1,publish.success=0.2')."""
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        stage, _, rate = part.partition("=")
+        try:
+            rates[stage.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            pass
+    return rates
+
+class AlertDispatcher(logging.Handler):
+    """Collects ERROR records and sends them to the admin as coalesced Telegram digests.
+
+    emit() only runs on the QueueListener thread and never does I/O. The async run()
+    loop sends at most one digest per window, grouping identical messages with counts.
+    """
+
+    def __init__(self, token: str, chat_id: str, window: float = 30.0, max_groups: int = 50):
+        super().__init__(level=logging.ERROR)
+        self.token = token
+        self.chat_id = chat_id
+        self.window = window
+        self.max_groups = max_groups
+        self._pending: "OrderedDict[str, list]" = OrderedDict()
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord):
+        summary = record.getMessage().split("\n", 1)[0][:500]
+        now = time.time()
+        with self._lock:
+            group = self._pending.get(summary)
+            if group:
+                group[0] += 1
+                group[2] = now
+            elif len(self._pending) < self.max_groups:
+                self._pending[summary] = [1, now, now]
+            else:
+                self._dropped += 1
+
+    async def run(self):
+        if not self.token:
+            logger.warning("[Logger] TELEGRAM_BOT_TOKEN is not set; admin error digests are disabled.")
+            return
+        while True:
+            await asyncio.sleep(self.window)
+            await self.send_digest()
+
+    def _digest(self) -> str:
+        with self._lock:
+            pending, self._pending = self._pending, OrderedDict()
+            dropped, self._dropped = self._dropped, 0
+        if not pending:
+            return ""
+
+        total = sum(g[0] for g in pending.values()) + dropped
+        lines = []
+        for summary, (count, first, last) in pending.items():
+            when = datetime.fromtimestamp(first).strftime("%H:%M:%S")
+            if count > 1:
+                when += f"–{datetime.fromtimestamp(last).strftime('%H:%M:%S')}"
+            lines.append(f"• <b>×{count}</b> <code>{when}</code>\n<code>{_escape(summary)}</code>")
+        if dropped:
+            lines.append(f"• <i>…and {dropped} more distinct errors</i>")
+
+        body = "\n\n".join(lines)
+        if len(body) > 3500:
+            body = body[:3500] + "\n…"
+        return (
+            f"🚨 <b>SYSTEM ERROR DIGEST</b> ({total} errors)\n\n"
+            f"{body}\n\n"
             "🔍 <i>Please check the Heroku logs for full stack trace.</i>"
         )
-        self._send_telegram_alert(alert_msg)
-
-    def _send_telegram_alert(self, message: str):
-        """Synchronously sends an alert to the admin."""
-        import requests
-        token = "7798265687:AAG61EtPE_SQfIwIKv8qjD1fZaes15VEBW4"
-        admin_id = "1654334233"
-        
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        payload = {"chat_id": admin_id, "text": message, "parse_mode": "HTML"}
+
+    async def send_digest(self):
+        """Sends everything collected since the last digest."""
+        message = self._digest()
+        if not message or not self.token:
+            return
+        import httpx
+        # Same base URL as the bot and engine, so a local Bot API server receives digests too
         try:
-            requests.post(url, json=payload, timeout=5)
+            from services.config_service import config
+            base_url = config.get("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+        except Exception:
+            base_url = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+        url = f"{base_url}{self.token}/sendMessage"
+        payload = {"chat_id": self.chat_id, "text": message, "parse_mode": "HTML"}
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                await client.post(url, json=payload)
         except Exception:
             pass # Avoid infinite error loops
 
-    def warning(self, msg):
-        self.logger.warning(msg)
+class _StartingQueueHandler(QueueHandler):
+    """Starts the listener (opening the log files) when the first record arrives."""
+
+    def __init__(self, log_queue, start):
+        super().__init__(log_queue)
+        self._start = start
+
+    def enqueue(self, record: logging.LogRecord):
+        if self._start is not None:
+            self._start()
+        super().enqueue(record)
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+class Logger:
+    DEFAULT_SAMPLE_RATES = "rss.mirror=0.1,publish.success=0.2"
+
+    def __init__(self, name="bot", log_dir="logs"):
+        self.name = name
+        self.log_dir = log_dir
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging.INFO)
+
+        # Per-stage sampling of hot INFO paths; warnings and errors are always kept
+        self.sample_rates = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", self.DEFAULT_SAMPLE_RATES))
+
+        # Admin alerts, coalesced and sent asynchronously
+        self.alerts = AlertDispatcher(
+            token=os.getenv("TELEGRAM_BOT_TOKEN", ""),
+            chat_id=os.getenv("ADMIN_USER_ID", "1654334233")
+        )
+
+        # Callers only enqueue records; formatting and I/O happen on the listener thread,
+        # which (with the log directory and files) is only set up by start() or the first record
+        self._queue = queue.SimpleQueue()
+        self._listener = None
+        self._start_lock = threading.Lock()
+        self._queue_handler = _StartingQueueHandler(self._queue, self.start)
+        self.logger.addHandler(self._queue_handler)
+
+    def start(self):
+        """Opens the console/file/alert handlers; called by main or on the first record."""
+        with self._start_lock:
+            if self._listener is not None:
+                return
+            os.makedirs(self.log_dir, exist_ok=True)
+
+            # Console Handler (human-readable for the Heroku log stream)
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            ))
+
+            # File Handler: JSON lines, rotated by size and day, compressed
+            file_handler = CompressingRotatingFileHandler(
+                os.path.join(self.log_dir, f"{self.name}.log"),
+                max_bytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+                backup_count=int(os.getenv("LOG_BACKUP_COUNT", "7"))
+            )
+            file_handler.setFormatter(JsonFormatter())
+
+            self._listener = QueueListener(
+                self._queue, console_handler, file_handler, self.alerts, respect_handler_level=True
+            )
+            self._listener.start()
+            self._queue_handler._start = None
+            atexit.register(self._listener.stop)
+
+    def _sampled_out(self, stage) -> bool:
+        rate = self.sample_rates.get(stage, 1.0) if stage else 1.0
+        return rate < 1.0 and random.random() >= rate
+
+    def info(self, msg, **fields):
+        """Logs at INFO. Records for a sampled `stage` are dropped before any formatting."""
+        if self._sampled_out(fields.get("stage")):
+            return
+        self.logger.info(msg, extra=fields)
+
+    def error(self, msg, exc_info=False, **fields):
+        """Logs error; the admin is alerted through the next coalesced digest."""
+        self.logger.error(msg, exc_info=exc_info, extra=fields)
+
+    def warning(self, msg, **fields):
+        self.logger.warning(msg, extra=fields)
 
-    def debug(self, msg):
-        self.logger.debug(msg)
+    def debug(self, msg, **fields):
+        if self.logger.isEnabledFor(logging.DEBUG) and not self._sampled_out(fields.get("stage")):
+            self.logger.debug(msg, extra=fields)
 
 # Global Instance
 logger = Logger()
@@ -0,0 +1,134 @@
+# services/loop_monitor.py
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional
+from services.logger import logger
+from services.metrics import metrics
+
+# Innermost frames under this directory are reported as the culprit of a stall
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOOP_LAG = metrics.gauge("event_loop_lag_seconds", "Scheduling delay of the main event loop")
+LOOP_BLOCKED = metrics.histogram("event_loop_blocked_seconds", "Duration of callbacks that blocked the event loop",
+                                 buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0))
+
+@dataclass
+class SlowCallback:
+    """One stall of the event loop, with the stack it was stuck in."""
+    started: float
+    duration: float
+    culprit: str
+    stack: List[str]
+
+def _culprit(frames: traceback.StackSummary) -> str:
+    for frame in reversed(frames):
+        if frame.filename.startswith(PROJECT_ROOT) and "site-packages" not in frame.filename:
+            return f"{os.path.relpath(frame.filename, PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    if frames:
+        return f"{frames[-1].filename}:{frames[-1].lineno} in {frames[-1].name}"
+    return "unknown"
+
+class LoopMonitor:
+    """Watches the event loop for blocking code.
+
+    A heartbeat coroutine sleeps `interval` seconds and measures how late it wakes
+    up (the loop lag). A watchdog thread notices when the heartbeat is overdue by
+    more than `slow_threshold`, samples the loop thread's stack while it is still
+    stuck, and logs the stall once it ends. Lag above `alert_threshold` for
+    `alert_after` seconds raises one admin alert until lag recovers.
+    """
+
+    def __init__(self, interval: float = 0.5, slow_threshold: float = 0.25,
+                 alert_threshold: float = 1.0, alert_after: float = 30.0, history: int = 50):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.alert_threshold = alert_threshold
+        self.alert_after = alert_after
+        self.lag = 0.0
+        self._history: deque = deque(maxlen=history)
+        self._expected = 0.0
+        self._loop_thread: Optional[int] = None
+        self._stall: Optional[SlowCallback] = None
+        self._high_since: Optional[float] = None
+        self._alerted = False
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def slow_callbacks(self) -> List[SlowCallback]:
+        with self._lock:
+            return list(self._history)
+
+    async def run(self):
+        """Heartbeat loop; runs until cancelled."""
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._expected = time.monotonic() + self.interval
+        self._stop.clear()
+        watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        watchdog.start()
+        logger.info(f"[LoopMonitor] Watching event loop (slow callback threshold {self.slow_threshold}s)")
+        try:
+            while True:
+                scheduled = loop.time()
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, loop.time() - scheduled - self.interval)
+                self.lag = lag
+                LOOP_LAG.set(lag)
+                self._expected = time.monotonic() + self.interval
+        finally:
+            self._stop.set()
+
+    def _watch(self):
+        tick = min(self.slow_threshold, self.interval) / 2
+        while not self._stop.wait(tick):
+            now = time.monotonic()
+            overdue = now - self._expected
+            if overdue > self.slow_threshold and self._stall is None:
+                self._stall = self._sample(self._expected, overdue)
+            elif overdue <= 0 and self._stall is not None:
+                self._finish_stall()
+            # While the loop is frozen the heartbeat cannot report, so use the overdue time
+            self._check_sustained(max(self.lag, overdue), now)
+
+    def _sample(self, started: float, overdue: float) -> SlowCallback:
+        frame = sys._current_frames().get(self._loop_thread)
+        frames = traceback.extract_stack(frame) if frame is not None else traceback.StackSummary()
+        return SlowCallback(started, overdue, _culprit(frames), traceback.format_list(frames[-15:]))
+
+    def _finish_stall(self):
+        stall, self._stall = self._stall, None
+        # The heartbeat re-armed itself `interval` after the moment the loop came back
+        stall.duration = max(stall.duration, self._expected - self.interval - stall.started)
+        with self._lock:
+            self._history.append(stall)
+        LOOP_BLOCKED.observe(stall.duration)
+        logger.warning(f"[LoopMonitor] Event loop blocked for {stall.duration:.2f}s at {stall.culprit}\n"
+                       + "".join(stall.stack), stage="loop.slow_callback",
+                       duration_ms=round(stall.duration * 1000))
+
+    def _check_sustained(self, lag: float, now: float):
+        if lag < self.alert_threshold:
+            self._high_since = None
+            self._alerted = False
+            return
+        if self._high_since is None:
+            self._high_since = now
+        if not self._alerted and now - self._high_since >= self.alert_after:
+            self._alerted = True
+            where = self._stall.culprit if self._stall else "no single blocking call"
+            logger.error(f"[LoopMonitor] Event loop lag above {self.alert_threshold:.1f}s for "
+                         f"{now - self._high_since:.0f}s (last sample: {where})")
+
+# Global Instance
+loop_monitor = LoopMonitor(
+    slow_threshold=float(os.getenv("LOOP_SLOW_THRESHOLD", "0.25")),
+    alert_threshold=float(os.getenv("LOOP_LAG_ALERT", "1.0")),
+    alert_after=float(os.getenv("LOOP_LAG_ALERT_AFTER", "30"))
+)
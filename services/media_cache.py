@@ -0,0 +1,200 @@
+# services/media_cache.py
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+import httpx
+from services.logger import logger
+
+class MediaEntry(NamedTuple):
+    content_hash: str
+    content_type: Optional[str]
+    size: int
+
+class MediaCache:
+    """Content-addressed on-disk media cache keyed by URL and content hash.
+
+    Blobs live under blobs/<sha256> and are shared by every URL with the same content.
+    A byte budget is enforced with LRU eviction and writes are atomic (temp file +
+    rename). Hashing, blob writes, reads and the startup scan run in a worker
+    thread; the index itself is only touched on the event loop.
+    """
+
+    def __init__(self, root: str = "cache/media", max_bytes: int = 512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "blobs")
+        self.url_dir = os.path.join(root, "urls")
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._scanned = False
+        self._scan_lock = asyncio.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    def http(self) -> httpx.AsyncClient:
+        """Shared download client for every publisher that needs media bytes."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=15, follow_redirects=True,
+                limits=httpx.Limits(max_connections=16)
+            )
+        return self._http_client
+
+    # --- Index ---
+    def _list_blobs(self) -> List[Tuple[float, str, int]]:
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.url_dir, exist_ok=True)
+        blobs = []
+        for name in os.listdir(self.blob_dir):
+            path = os.path.join(self.blob_dir, name)
+            if name.startswith(".tmp"):
+                os.remove(path)  # Leftover from an interrupted write
+                continue
+            st = os.stat(path)
+            blobs.append((st.st_mtime, name, st.st_size))
+        return sorted(blobs)
+
+    async def _scan(self):
+        async with self._scan_lock:
+            if self._scanned:
+                return
+            for _, name, size in await asyncio.to_thread(self._list_blobs):
+                self._lru[name] = size
+                self._total += size
+            self._scanned = True
+        self._evict()
+
+    def _touch(self, content_hash: str):
+        self._lru.move_to_end(content_hash)
+        try:
+            os.utime(self.blob_path(content_hash))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._lru) > 1:
+            content_hash, size = self._lru.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self.blob_path(content_hash))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_dir, content_hash)
+
+    def _atomic_write(self, path: str, data: Union[bytes, str]):
+        directory = os.path.dirname(path)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data.encode() if isinstance(data, str) else data)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    # --- Public API ---
+    async def lookup(self, url: str) -> Optional[MediaEntry]:
+        """Returns the cached entry for a URL, if its content is still on disk."""
+        await self._scan()
+        index_path = os.path.join(self.url_dir, self._url_key(url))
+        try:
+            with open(index_path) as f:
+                content_hash, content_type = (f.read().split("\n") + [""])[:2]
+        except OSError:
+            return None
+        size = self._lru.get(content_hash)
+        if size is None:
+            try:
+                os.remove(index_path)  # Content was evicted
+            except OSError:
+                pass
+            return None
+        self._touch(content_hash)
+        return MediaEntry(content_hash, content_type or None, size)
+
+    async def store(self, url: str, data: bytes, content_type: Optional[str] = None) -> MediaEntry:
+        """Stores content under its hash (deduplicating identical media) and indexes the URL."""
+        await self._scan()
+        content_hash = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+        if content_hash not in self._lru:
+            await asyncio.to_thread(self._atomic_write, self.blob_path(content_hash), data)
+            # A concurrent store of the same content may have accounted for it meanwhile
+            if content_hash not in self._lru:
+                self._lru[content_hash] = len(data)
+                self._total += len(data)
+        self._touch(content_hash)
+        await asyncio.to_thread(self._atomic_write, os.path.join(self.url_dir, self._url_key(url)),
+                                f"{content_hash}\n{content_type or ''}")
+        self._evict()
+        return MediaEntry(content_hash, content_type, len(data))
+
+    async def read(self, content_hash: str) -> bytes:
+        """Reads a cached blob in a worker thread. Uploads (PTB's InputFile, twikit's
+        upload_media) need one bytes object, so this is a single read into it."""
+        def read_blob() -> bytes:
+            with open(self.blob_path(content_hash), "rb") as f:
+                return f.read()
+        return await asyncio.to_thread(read_blob)
+
+    async def fetch(self, url: str, max_bytes: Optional[int] = None) -> Optional[MediaEntry]:
+        """Returns the cached entry for a URL, downloading it once if needed.
+        Concurrent callers for the same URL share a single transfer."""
+        entry = await self.lookup(url)
+        if entry is not None:
+            return entry if not max_bytes or entry.size <= max_bytes else None
+        if url in self._inflight:
+            return await asyncio.shield(self._inflight[url])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[url] = future
+        try:
+            entry = await self._download(url, max_bytes)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_result(None)
+            logger.error(f"[MediaCache] Download failed for {url}: {e}")
+            return None
+        finally:
+            self._inflight.pop(url, None)
+
+    async def _download(self, url: str, max_bytes: Optional[int]) -> Optional[MediaEntry]:
+        """Streams a URL into memory, aborting once it exceeds max_bytes."""
+        async with self.http().stream("GET", url) as resp:
+            if resp.status_code != 200:
+                logger.error(f"[MediaCache] Download failed for {url}: HTTP {resp.status_code}")
+                return None
+            if max_bytes and int(resp.headers.get("content-length") or 0) > max_bytes:
+                logger.warning(f"[MediaCache] Skipping {url}: larger than {max_bytes} bytes")
+                return None
+
+            buffer = bytearray()
+            async for chunk in resp.aiter_bytes():
+                buffer.extend(chunk)
+                if max_bytes and len(buffer) > max_bytes:
+                    logger.warning(f"[MediaCache] Skipping {url}: stream exceeded {max_bytes} bytes")
+                    return None
+            content_type = resp.headers.get("content-type", "").split(";")[0] or None
+        return await self.store(url, bytes(buffer), content_type)
+
+    async def close(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+# Global Instance
+media_cache = MediaCache(
+    root=os.getenv("MEDIA_CACHE_DIR", "cache/media"),
+    max_bytes=int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+)
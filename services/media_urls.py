@@ -0,0 +1,166 @@
+# services/media_urls.py
+
+import base64
+import html
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urljoin, urlparse
+from services.logger import logger
+from services.media_cache import media_cache
+
+PBS_ORIGIN = "https://pbs.twimg.com"
+VIDEO_ORIGIN = "https://video.twimg.com"
+
+# Telegram fetches URL media up to 5 MB for photos and 20 MB for everything else
+PHOTO_URL_LIMIT = 5 * 1024 * 1024
+FILE_URL_LIMIT = 20 * 1024 * 1024
+
+# Media captured from Telegram channels travels as "tg-file:<kind>:<file_id>"
+TELEGRAM_FILE_PREFIX = "tg-file:"
+
+
+def _b64decode(data: str) -> str:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode()
+
+
+def best_variant(url: str, name: str = "orig") -> str:
+    """Selects the best-quality variant of a twimg URL."""
+    parsed = urlparse(url)
+    path = parsed.path
+    if parsed.netloc != "pbs.twimg.com":
+        return url
+    if path.startswith("/tweet_video_thumb/"):
+        # GIFs are served as MP4 loops; the thumb is just the first frame
+        stem = path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        return f"{VIDEO_ORIGIN}/tweet_video/{stem}.mp4"
+    if path.startswith("/media/"):
+        stem, _, ext = path.rsplit("/", 1)[-1].partition(".")
+        fmt = ext or parse_qs(parsed.query).get("format", ["jpg"])[0]
+        return f"{PBS_ORIGIN}/media/{stem}?format={fmt}&name={name}"
+    if "_video_thumb/" in path:
+        return f"{PBS_ORIGIN}{path}?name={name}"
+    return url
+
+
+def normalize_media_url(src: str, base_url: str = "") -> str:
+    """Turns a Nitter proxy path (/pic/..., /video/...) back into the direct twimg URL."""
+    url = urljoin(base_url, html.unescape(src))
+    parsed = urlparse(url)
+    if parsed.netloc.endswith("twimg.com"):
+        return best_variant(url)
+
+    path = parsed.path
+    try:
+        if path.startswith("/pic/enc/"):
+            origin = _b64decode(path[len("/pic/enc/"):])
+        elif path.startswith("/pic/"):
+            origin = unquote(path[len("/pic/"):] + (f"?{parsed.query}" if parsed.query else ""))
+            if origin.startswith("orig/"):
+                origin = origin[len("orig/"):]
+        elif path.startswith("/video/"):
+            # /video/<signature>/<quoted url> or /video/enc/<signature>/<base64 url>
+            parts = path.split("/", 4)
+            origin = _b64decode(parts[4]) if parts[2] == "enc" else unquote(path.split("/", 3)[3])
+        else:
+            return url
+    except Exception:
+        return url
+
+    if origin.startswith("http"):
+        return best_variant(origin)
+    for host in ("pbs.twimg.com/", "video.twimg.com/"):
+        if origin.startswith(host):
+            return best_variant(f"https://{origin}")
+    return best_variant(f"{PBS_ORIGIN}/{origin.lstrip('/')}")
+
+
+class MediaInfo(NamedTuple):
+    url: str
+    content_type: Optional[str]
+    size: Optional[int]
+
+
+def telegram_file_ref(kind: str, file_id: str) -> str:
+    return f"{TELEGRAM_FILE_PREFIX}{kind}:{file_id}"
+
+
+def parse_telegram_file_ref(ref: str) -> Optional[Tuple[str, str]]:
+    """(kind, file_id) for a captured Telegram file reference, else None."""
+    if not ref.startswith(TELEGRAM_FILE_PREFIX):
+        return None
+    kind, _, file_id = ref[len(TELEGRAM_FILE_PREFIX):].partition(":")
+    return (kind, file_id) if file_id else None
+
+
+def guess_kind(url: str) -> str:
+    """Extension-based fallback when no probe result is available."""
+    path = urlparse(url).path.lower()
+    if "/tweet_video/" in path:
+        return "animation"
+    if path.endswith((".mp4", ".m3u8", ".mov")):
+        return "video"
+    return "photo"
+
+
+def media_kind(info: MediaInfo) -> str:
+    """Chooses the Telegram send method: photo, video, animation or document."""
+    captured = parse_telegram_file_ref(info.url)
+    if captured:
+        return captured[0]
+    content_type = (info.content_type or "").lower()
+    if not content_type:
+        return guess_kind(info.url)
+    if content_type == "image/gif" or "/tweet_video/" in info.url:
+        return "animation"
+    if content_type.startswith("image/"):
+        return "photo" if (info.size or 0) <= PHOTO_URL_LIMIT else "document"
+    if content_type.startswith("video/"):
+        return "video"
+    return "document"
+
+
+class MediaProber:
+    """HEAD-probes resolved media URLs and caches content type and size."""
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 2000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def probe(self, url: str) -> MediaInfo:
+        if not url.startswith("http"):
+            return MediaInfo(url, None, None)  # Telegram file_id or local reference
+
+        cached = self._cache.get(url)
+        if cached and time.time() - cached[1] < self.ttl:
+            self._cache.move_to_end(url)
+            return cached[0]
+
+        info = MediaInfo(url, None, None)
+        try:
+            resp = await media_cache.http().head(url)
+            if resp.status_code == 200:
+                length = resp.headers.get("content-length")
+                info = MediaInfo(url, resp.headers.get("content-type", "").split(";")[0] or None,
+                                 int(length) if length else None)
+        except Exception as e:
+            logger.warning(f"[Media] HEAD probe failed for {url}: {e}")
+
+        self._cache[url] = (info, time.time())
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return info
+
+    async def resolve(self, url: str) -> MediaInfo:
+        """Probes a URL, stepping down from the original to the large variant when
+        an image is too big for Telegram to fetch as a photo."""
+        info = await self.probe(url)
+        if "name=orig" in url and (info.size or 0) > PHOTO_URL_LIMIT:
+            smaller = await self.probe(url.replace("name=orig", "name=large"))
+            if smaller.content_type:
+                return smaller
+        return info
+
+# Global Instance
+media_prober = MediaProber()
@@ -0,0 +1,135 @@
+# services/profiler.py
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+from services.logger import logger
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_CAPTURE_SECONDS = 300
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a capture is requested while another one is running."""
+
+@dataclass
+class ProfileResult:
+    seconds: float
+    samples: int
+    collapsed: str
+    allocations: str
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(PROJECT_ROOT):
+        path = os.path.relpath(path, PROJECT_ROOT)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+class Profiler:
+    """Samples every thread's stack for a fixed window, on demand.
+
+    Nothing runs between captures. During one, a worker thread reads
+    sys._current_frames() every `interval` seconds and tracemalloc records
+    allocations; the result is a collapsed-stack profile (one `a;b;c count` line
+    per stack, readable by flamegraph.pl and speedscope) plus the top allocation
+    sites of the window.
+    """
+
+    def __init__(self, interval: float = 0.01, top_allocations: int = 25):
+        self.interval = interval
+        self.top_allocations = top_allocations
+        self._busy = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._busy.locked()
+
+    async def capture(self, seconds: float) -> ProfileResult:
+        """Runs a capture without blocking the event loop."""
+        return await asyncio.to_thread(self.capture_sync, seconds)
+
+    def capture_sync(self, seconds: float) -> ProfileResult:
+        if not self._busy.acquire(blocking=False):
+            raise ProfilerBusyError("a profile capture is already running")
+        try:
+            seconds = max(0.1, min(float(seconds), MAX_CAPTURE_SECONDS))
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            try:
+                stacks, samples, elapsed = self._sample(seconds)
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                if started_tracing:
+                    tracemalloc.stop()
+        finally:
+            self._busy.release()
+
+        logger.info(f"[Profiler] Captured {samples} samples over {elapsed:.1f}s")
+        return ProfileResult(elapsed, samples, self._collapse(stacks), self._allocations(snapshot))
+
+    def _sample(self, seconds: float) -> Tuple[Counter, int, float]:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stacks[tuple(reversed(labels))] += 1
+            samples += 1
+            time.sleep(self.interval)
+        return stacks, samples, time.perf_counter() - started
+
+    @staticmethod
+    def _collapse(stacks: Counter) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+    def _allocations(self, snapshot: tracemalloc.Snapshot) -> str:
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        stats = snapshot.statistics("lineno")
+        total = sum(s.size for s in stats)
+        lines = [f"Allocated during capture and still live: {total / 1024:.1f} KiB in "
+                 f"{sum(s.count for s in stats)} blocks\n",
+                 f"Top {self.top_allocations} allocation sites:\n"]
+        for i, stat in enumerate(stats[:self.top_allocations], 1):
+            frame = stat.traceback[0]
+            path = frame.filename
+            if path.startswith(PROJECT_ROOT):
+                path = os.path.relpath(path, PROJECT_ROOT)
+            lines.append(f"{i:>3}. {stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  {path}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def write(result: ProfileResult, directory: str = "profiles") -> List[str]:
+        """Saves a capture as <stamp>.collapsed and <stamp>.alloc.txt; returns the paths."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        files: Dict[str, str] = {
+            os.path.join(directory, f"profile-{stamp}.collapsed"): result.collapsed,
+            os.path.join(directory, f"profile-{stamp}.alloc.txt"): result.allocations,
+        }
+        for path, content in files.items():
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(content)
+        return list(files)
+
+# Global Instance
+profiler = Profiler()
@@ -0,0 +1,83 @@
+# services/rate_limiter.py
+
+import asyncio
+import time
+from typing import Dict, Optional, Union
+
+
+class TokenBucket:
+    """Async token bucket refilling `rate` tokens per `period` seconds, bursting up to `capacity`."""
+
+    def __init__(self, rate: float, period: float = 1.0, capacity: Optional[float] = None):
+        self.rate = rate / period
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Waits until `tokens` are available. Callers are served in FIFO order."""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def block_for(self, seconds: float):
+        """Holds every caller for `seconds` (e.g. a flood-wait), then resumes at the normal rate."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class TelegramRateLimiter:
+    """Per-bot and per-chat token buckets matching Telegram's broadcast limits."""
+
+    GLOBAL_RATE = 30         # messages per second per bot token
+    GROUP_RATE = 20          # messages per minute per group/channel
+    PRIVATE_RATE = 1         # message per second per private chat
+
+    def __init__(self):
+        self._global = TokenBucket(self.GLOBAL_RATE, 1.0)
+        self._chats: Dict[str, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            # Positive numeric ids are private chats; channels/groups are negative or @usernames
+            if key.lstrip("-").isdigit() and not key.startswith("-"):
+                bucket = TokenBucket(self.PRIVATE_RATE, 1.0)
+            else:
+                bucket = TokenBucket(self.GROUP_RATE, 60.0)
+            self._chats[key] = bucket
+        return bucket
+
+    async def acquire(self, chat_id: Union[int, str], messages: int = 1):
+        """Waits for room in the chat's bucket, then in the bot-wide bucket."""
+        await self._chat_bucket(chat_id).acquire(messages)
+        await self._global.acquire(messages)
+
+    def retry_after(self, chat_id: Union[int, str], seconds: float):
+        """Holds all sends to a chat until Telegram's flood-wait has elapsed."""
+        self._chat_bucket(chat_id).block_for(seconds)
+
+
+_limiters: Dict[str, TelegramRateLimiter] = {}
+
+def get_telegram_limiter(token: str) -> TelegramRateLimiter:
+    """Returns the shared limiter for a bot token."""
+    limiter = _limiters.get(token)
+    if limiter is None:
+        limiter = _limiters[token] = TelegramRateLimiter()
+    return limiter
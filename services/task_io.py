@@ -0,0 +1,157 @@
+# services/task_io.py
+
+import asyncio
+import json
+import os
+import sys
+import yaml
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+from database.manager import db
+from services.command_bus import command_bus
+from services.logger import logger
+
+PLATFORMS = ("twitter_rss", "twitter", "telegram")
+
+class TaskImportError(ValueError):
+    """Raised when an import file is malformed; the message names the offending task."""
+
+def parse_tasks(data: str) -> List[Dict[str, Any]]:
+    """Reads the task list from a YAML or JSON document.
+
+    Accepts the legacy config.yaml layout ({'tasks': [...]}, with `targets` and
+    `paused`) as well as a bare list of tasks.
+    """
+    text = data.strip()
+    try:
+        # JSON is valid YAML, but the JSON parser is far faster on large files
+        doc = json.loads(text) if text[:1] in ("{", "[") else yaml.safe_load(text)
+    except (ValueError, yaml.YAMLError) as e:
+        raise TaskImportError(f"Could not parse file: {e}")
+
+    tasks = (doc.get("tasks") or []) if isinstance(doc, dict) else doc
+    if not isinstance(tasks, list):
+        raise TaskImportError("Expected a list of tasks under 'tasks'.")
+    return [_normalize(i, t) for i, t in enumerate(tasks, 1)]
+
+def _endpoints(index: int, task: Dict[str, Any], key: str) -> List[tuple]:
+    entries = task.get(key) or []
+    if not isinstance(entries, list):
+        raise TaskImportError(f"Task #{index}: '{key}' must be a list.")
+    result = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("platform") or entry.get("identifier") in (None, ""):
+            raise TaskImportError(f"Task #{index}: each {key} entry needs a platform and identifier.")
+        if entry["platform"] not in PLATFORMS:
+            raise TaskImportError(f"Task #{index}: unknown platform '{entry['platform']}'.")
+        result.append((entry["platform"], str(entry["identifier"])))
+    return result
+
+def _normalize(index: int, task: Any) -> Dict[str, Any]:
+    if not isinstance(task, dict) or not task.get("name"):
+        raise TaskImportError(f"Task #{index}: a name is required.")
+    destinations = _endpoints(index, task, "destinations" if "destinations" in task else "targets")
+    paused = task.get("paused", task.get("status") == "paused")
+    return {
+        "name": str(task["name"]),
+        "status": "paused" if paused else "active",
+        "options": {"ai_options": task.get("ai_options") or {}},
+        "sources": _endpoints(index, task, "sources"),
+        "destinations": destinations,
+    }
+
+def save_tasks(tasks: List[Dict[str, Any]], user_id: int) -> int:
+    """Inserts parsed tasks in one transaction and tells the engines about them."""
+    ids = db.bulk_create_tasks(user_id, tasks)
+    command_bus.publish("tasks_imported", count=len(ids))
+    logger.info(f"[TaskIO] Imported {len(ids)} tasks for user {user_id}.")
+    return len(ids)
+
+def import_tasks(data: str, user_id: int) -> int:
+    """Validates the whole file first, then inserts everything in one transaction."""
+    return save_tasks(parse_tasks(data), user_id)
+
+def _export_entries(user_id: int) -> Iterator[Dict[str, Any]]:
+    for task in db.iter_task_export(user_id):
+        yield {
+            "name": task["name"],
+            "paused": task["status"] != "active",
+            "sources": [{"platform": s["platform"], "identifier": s["identifier"]} for s in task["sources"]],
+            "destinations": [{"platform": d["platform"], "identifier": d["identifier"]} for d in task["destinations"]],
+            "ai_options": task["options"].get("ai_options", {}),
+        }
+
+class _TaskWriter:
+    """Serializes export entries to `out` as they arrive."""
+
+    def __init__(self, out: TextIO, fmt: str):
+        self.out = out
+        self.fmt = fmt
+        self.count = 0
+        out.write('{"tasks": [' if fmt == "json" else "tasks:\n")
+
+    def write(self, entries: Iterable[Dict[str, Any]]):
+        for entry in entries:
+            if self.fmt == "json":
+                self.out.write(("," if self.count else "") + "\n  " + json.dumps(entry, ensure_ascii=False))
+            else:
+                # A one-item list per task keeps the document valid without holding it in memory
+                self.out.write(yaml.safe_dump([entry], sort_keys=False, allow_unicode=True))
+            self.count += 1
+
+    def close(self) -> int:
+        if self.fmt == "json":
+            self.out.write("\n]}\n")
+        return self.count
+
+def export_tasks(user_id: int, out: TextIO, fmt: str = "yaml") -> int:
+    """Streams a user's tasks to `out` one at a time; returns the number written."""
+    writer = _TaskWriter(out, fmt)
+    writer.write(_export_entries(user_id))
+    return writer.close()
+
+async def export_tasks_async(user_id: int, out: TextIO, fmt: str = "yaml", batch_size: int = 500) -> int:
+    """Like export_tasks, for the bot: the database is read on the loop, where the
+    shared connection lives, and only serialization and writing go to a thread."""
+    writer = _TaskWriter(out, fmt)
+    batch = []
+    for entry in _export_entries(user_id):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            await asyncio.to_thread(writer.write, batch)
+            batch = []
+    await asyncio.to_thread(writer.write, batch)
+    return writer.close()
+
+def main(argv: List[str]) -> int:
+    """CLI: python -m services.task_io import|export <file> [--user ID]"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m services.task_io")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", help="YAML/JSON file ('-' for stdin/stdout)")
+    parser.add_argument("--user", type=int, default=int(os.getenv("ADMIN_USER_ID", "1654334233")))
+    args = parser.parse_args(argv)
+
+    if args.action == "import":
+        if args.path == "-":
+            data = sys.stdin.read()
+        else:
+            with open(args.path, encoding="utf-8") as fh:
+                data = fh.read()
+        try:
+            print(f"Imported {import_tasks(data, args.user)} tasks.")
+        except TaskImportError as e:
+            print(f"Import failed: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    fmt = "json" if args.path.endswith(".json") else "yaml"
+    if args.path == "-":
+        count = export_tasks(args.user, sys.stdout, fmt)
+    else:
+        with open(args.path, "w", encoding="utf-8") as fh:
+            count = export_tasks(args.user, fh, fmt)
+    print(f"Exported {count} tasks.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
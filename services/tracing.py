@@ -0,0 +1,192 @@
+# services/tracing.py
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+from services.logger import logger
+
+# Lifecycle stages, in pipeline order
+STAGES = ("detected", "transformed", "queued", "sending")
+
+@dataclass
+class TraceContext:
+    """Timestamps for one item on its way from the source to every destination."""
+    task_id: int
+    item_id: str
+    source_ts: float
+    marks: Dict[str, float] = field(default_factory=dict)
+
+    def mark(self, stage: str, ts: Optional[float] = None):
+        self.marks[stage] = ts or time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact form carried in the outbox payload, so spans survive restarts."""
+        return {"task_id": self.task_id, "item_id": self.item_id, "source_ts": self.source_ts, **self.marks}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TraceContext":
+        marks = {s: data[s] for s in STAGES if data.get(s)}
+        return cls(data["task_id"], data["item_id"], data.get("source_ts") or 0.0, marks)
+
+@dataclass
+class Span:
+    """One completed delivery: source post time to publish, with the stage breakdown."""
+    task_id: int
+    item_id: str
+    destination: str
+    source_ts: float
+    detected: float
+    transformed: float
+    queued: float
+    sending: float
+    published: float
+
+    @property
+    def end_to_end(self) -> Optional[float]:
+        return self.published - self.source_ts if self.source_ts > 0 else None
+
+    def stages(self) -> Dict[str, Optional[float]]:
+        """Seconds spent in each hop."""
+        return {
+            "detect": max(0.0, self.detected - self.source_ts) if self.source_ts > 0 else None,
+            "transform": self.transformed - self.detected,
+            "persist": self.queued - self.transformed,
+            "queue": self.sending - self.queued,
+            "deliver": self.published - self.sending,
+        }
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class Tracer:
+    """Keeps recent delivery spans in a fixed-size ring buffer.
+
+    With persistence enabled, spans are also batched into the item_traces table on
+    flush() so latency history survives restarts. A `remote` tracer (a bot process
+    whose engines run elsewhere) records nothing itself and reads item_traces on
+    every call instead.
+    """
+
+    def __init__(self, capacity: int = 10000, persist: bool = False, retention: float = 7 * 86400,
+                 remote: bool = False):
+        self.persist = persist
+        self.remote = remote
+        self.retention = retention
+        self._last_prune = 0.0
+        self._spans: deque = deque(maxlen=capacity)
+        self._unsaved: List[Span] = []
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def start(self, task_id: int, item: Any) -> TraceContext:
+        trace = TraceContext(task_id, str(item.id), float(getattr(item, "timestamp", 0) or 0))
+        trace.mark("detected")
+        return trace
+
+    def record(self, trace: Dict[str, Any], destination: str, published: Optional[float] = None):
+        """Closes the trace for one destination; `trace` is the dict from the payload."""
+        ctx = TraceContext.from_dict(trace)
+        published = published or time.time()
+        detected = ctx.marks.get("detected", published)
+        transformed = ctx.marks.get("transformed", detected)
+        # Deliveries resumed from the outbox after a restart carry no queued mark
+        queued = ctx.marks.get("queued", transformed)
+        span = Span(ctx.task_id, ctx.item_id, destination, ctx.source_ts, detected, transformed,
+                    queued, ctx.marks.get("sending", queued), published)
+        with self._lock:
+            self._spans.append(span)
+            if self.persist:
+                self._unsaved.append(span)
+        if span.end_to_end is not None:
+            logger.debug(f"[Trace] Item {span.item_id} reached {destination} in {span.end_to_end:.1f}s",
+                         stage="trace.publish", task_id=span.task_id,
+                         duration_ms=round(span.end_to_end * 1000))
+
+    def flush(self):
+        """Writes spans recorded since the last flush (no-op unless persisting)."""
+        with self._lock:
+            batch, self._unsaved = self._unsaved, []
+        if not batch:
+            return
+        from database.manager import db
+        try:
+            db.save_traces([(s.task_id, s.item_id, s.destination, s.source_ts, s.detected,
+                             s.transformed, s.queued, s.sending, s.published) for s in batch])
+            if time.time() - self._last_prune > 3600:
+                self._last_prune = time.time()
+                db.prune_traces(time.time() - self.retention)
+        except Exception as e:
+            logger.warning(f"[Trace] Could not persist {len(batch)} spans: {e}")
+
+    def _load(self):
+        # Seed the ring buffer from the table once, after a restart
+        if self._loaded or not self.persist:
+            return
+        self._loaded = True
+        from database.manager import db
+        try:
+            rows = db.get_recent_traces(self._spans.maxlen - len(self._spans))
+        except Exception as e:
+            logger.warning(f"[Trace] Could not load recent spans: {e}")
+            return
+        with self._lock:
+            # Rows come newest first; extendleft reverses them back into time order
+            self._spans.extendleft(self._span_from_row(r) for r in rows)
+
+    @staticmethod
+    def _span_from_row(r: Dict[str, Any]) -> Span:
+        return Span(r['task_id'], r['item_id'], r['destination'], r['source_ts'], r['detected_at'],
+                    r['transformed_at'], r['queued_at'], r['sending_at'] or r['queued_at'], r['published_at'])
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._unsaved.clear()
+
+    def spans(self, task_id: Optional[int] = None) -> List[Span]:
+        if self.remote:
+            from database.manager import db
+            rows = db.get_recent_traces(self._spans.maxlen)
+            return [self._span_from_row(r) for r in reversed(rows) if task_id is None or r['task_id'] == task_id]
+        self._load()
+        with self._lock:
+            return [s for s in self._spans if task_id is None or s.task_id == task_id]
+
+    def summary(self, task_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+        """Per-task end-to-end p50/p95/p99 and median time per stage."""
+        wanted = set(task_ids) if task_ids is not None else None
+        by_task: Dict[int, List[Span]] = {}
+        for span in self.spans():
+            if wanted is None or span.task_id in wanted:
+                by_task.setdefault(span.task_id, []).append(span)
+
+        result = {}
+        for task_id, spans in by_task.items():
+            e2e = [s.end_to_end for s in spans if s.end_to_end is not None]
+            stages = {}
+            for name in ("detect", "transform", "persist", "queue", "deliver"):
+                values = [v for v in (s.stages()[name] for s in spans) if v is not None]
+                stages[name] = percentile(values, 50)
+            result[task_id] = {
+                "count": len(spans),
+                "p50": percentile(e2e, 50),
+                "p95": percentile(e2e, 95),
+                "p99": percentile(e2e, 99),
+                "stages": stages,
+            }
+        return result
+
+# Global Instance
+tracer = Tracer(
+    capacity=int(os.getenv("TRACE_BUFFER_SIZE", "10000")),
+    persist=os.getenv("TRACE_PERSIST", "").lower() in ("1", "true", "yes")
+)
@@ -0,0 +1,160 @@
+# services/web.py
+
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+from services.logger import logger
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: Dict[str, list]
+    headers: Dict[str, str]
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+class Response(NamedTuple):
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: Optional[Dict[str, str]] = None
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+           404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+class WebServer:
+    """A small asyncio HTTP/1.1 server for internal endpoints (metrics, health).
+
+    Only what the bot needs: exact-path routing (a trailing `*` matches a prefix),
+    Content-Length bodies and keep-alive. Handlers are coroutines taking a Request
+    and returning a Response. A connection is closed when the next request's
+    headers take longer than `idle_timeout` seconds, or its body longer than
+    `read_timeout`, so slow or idle clients can't hold connections open.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100, idle_timeout: float = 60.0,
+                 read_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    def route(self, method: str, path: str, handler: Handler):
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self):
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+            logger.info(f"[Web] Listening on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # Idle keep-alive connections would otherwise outlive the server
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise ValueError("headers too large")
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise OverflowError("body too large")
+        body = await asyncio.wait_for(reader.readexactly(length), self.read_timeout) if length else b""
+        url = urlsplit(target)
+        return Request(method.upper(), url.path, parse_qs(url.query), headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            for (method, path), candidate in self._routes.items():
+                if method == request.method and path.endswith("*") and request.path.startswith(path[:-1]):
+                    handler = candidate
+                    break
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return Response(405, b"method not allowed")
+            return Response(404, b"not found")
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error(f"[Web] {request.method} {request.path} failed: {e}", exc_info=True)
+            return Response(500, b"internal error")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except OverflowError:
+                    await self._write(writer, Response(413, b"payload too large"), close=True)
+                    return
+                except asyncio.TimeoutError:
+                    await self._write(writer, Response(408, b"request timeout"), close=True)
+                    return
+                except (ValueError, UnicodeDecodeError):
+                    await self._write(writer, Response(400, b"bad request"), close=True)
+                    return
+                if request is None:
+                    return
+
+                response = await self._dispatch(request)
+                close = request.headers.get("connection", "").lower() == "close"
+                await self._write(writer, response, close=close)
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, response: Response, close: bool = False):
+        headers = {
+            "Content-Type": response.content_type,
+            "Content-Length": str(len(response.body)),
+            "Connection": "close" if close else "keep-alive",
+        }
+        headers.update(response.headers or {})
+        head = f"HTTP/1.1 {response.status} {REASONS.get(response.status, 'Unknown')}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + response.body)
+        await writer.drain()
+
+# Global Instance (internal endpoints; METRICS_PORT=0 disables it)
+web_server = WebServer(os.getenv("METRICS_HOST", "127.0.0.1"), int(os.getenv("METRICS_PORT", "9100")))
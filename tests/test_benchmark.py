@@ -0,0 +1,30 @@
+# tests/test_benchmark.py
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestBenchmarkHarness(unittest.TestCase):
+    """Runs a tiny offline benchmark end to end against the local stand-ins."""
+
+    def test_small_run(self):
+        # A subprocess so the benchmark's DATABASE_URL/endpoint env never touches this process
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--tasks", "2", "--cycles", "2", "--feed-size", "3",
+             "--ai-latency", "0", "--rss-latency", "0", "--telegram-latency", "0", "--json"],
+            cwd=ROOT, capture_output=True, text=True, timeout=240
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+        cold, warm = json.loads(proc.stdout)
+        self.assertEqual(cold["published"], 6)
+        self.assertEqual(warm["published"], 2)
+        self.assertGreater(cold["db_statements"], 0)
+        self.assertIsNotNone(cold["peak_mem_mb"])
+        self.assertIsNotNone(cold["stages"]["pipeline"]["p50"])
+
+if __name__ == '__main__':
+    unittest.main()
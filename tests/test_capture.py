@@ -0,0 +1,169 @@
+# tests/test_capture.py
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from database import manager
+from database.manager import DatabaseManager
+from services.capture import CaptureBuffer
+
+def _post(chat_id, message_id, text="", username=None, photo=None, album=None, caption=None):
+    return SimpleNamespace(
+        chat=SimpleNamespace(id=chat_id, username=username), message_id=message_id,
+        date=datetime.now(timezone.utc), text=text, caption=caption, media_group_id=album,
+        photo=[SimpleNamespace(file_id="small"), SimpleNamespace(file_id=photo)] if photo else (),
+        animation=None, video=None, document=None)
+
+class TestCapture(unittest.TestCase):
+    """Channel posts are batched into source_items and wake the subscribed tasks."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(f"sqlite:///{os.path.join(self.tmp.name, 'capture.db')}")
+        self.db_patch = patch.object(manager.db, "_instance", self.db)
+        self.db_patch.start()
+        self.task_ids = self.db.bulk_create_tasks(1, [
+            {"name": "by id", "sources": [("telegram", "-1001")], "destinations": [("telegram", "-2001")]},
+            {"name": "by name", "sources": [("telegram", "@news")], "destinations": [("telegram", "-2002")]},
+        ])
+
+    def tearDown(self):
+        self.db_patch.stop()
+        self.db._sqlite_conn.close()
+        self.tmp.cleanup()
+
+    def test_posts_are_batched_and_listeners_notified(self):
+        buffer = CaptureBuffer(max_batch=10, max_delay=0.05)
+        notified = []
+        buffer.subscribe(lambda platform, identifier: notified.append((platform, identifier)))
+
+        async def scenario():
+            self.assertTrue(await buffer.add(_post(-1001, 1, "first")))
+            self.assertTrue(await buffer.add(_post(-1001, 2, "second", photo="big")))
+            self.assertFalse(await buffer.add(_post(-1009, 1, "not subscribed")))
+            self.assertEqual(self.db.get_unread_source_items("-1001", "telegram"), [])
+            await asyncio.sleep(0.1)
+
+        asyncio.run(scenario())
+        rows = self.db.get_unread_source_items("-1001", "telegram")
+        self.assertEqual([r['item_id'] for r in rows], ["-1001:1", "-1001:2"])
+        self.assertEqual(rows[1]['media_json'], '["tg-file:photo:big"]')
+        self.assertEqual(notified, [("telegram", "-1001")])
+
+    def test_album_parts_become_one_item(self):
+        buffer = CaptureBuffer(max_batch=10, max_delay=0.01, album_window=0.05)
+
+        async def scenario():
+            # Parts can arrive out of order and interleaved with another album
+            await buffer.add(_post(-1001, 11, photo="b", album="g1"))
+            await buffer.add(_post(-1001, 10, photo="a", album="g1", caption="Album caption"))
+            await buffer.add(_post(-1001, 20, photo="x", album="g2"))
+            await buffer.add(_post(-1001, 12, photo="c", album="g1"))
+            await asyncio.sleep(0.03)
+            self.assertEqual(self.db.get_unread_source_items("-1001", "telegram"), [])
+            await asyncio.sleep(0.1)
+
+        asyncio.run(scenario())
+        rows = sorted(self.db.get_unread_source_items("-1001", "telegram"), key=lambda r: r['item_id'])
+        self.assertEqual([r['item_id'] for r in rows], ["-1001:10", "-1001:20"])
+        self.assertEqual(rows[0]['content'], "Album caption")
+        self.assertEqual(rows[0]['message_ids'], "[10, 11, 12]")
+        self.assertEqual(rows[0]['media_json'], '["tg-file:photo:a", "tg-file:photo:b", "tg-file:photo:c"]')
+
+    def test_open_albums_are_bounded(self):
+        buffer = CaptureBuffer(max_batch=1, album_window=60, max_albums=2)
+
+        async def scenario():
+            for group in ("g1", "g2", "g3"):
+                await buffer.add(_post(-1001, int(group[1]), photo=group, album=group))
+            await asyncio.sleep(0.01)
+            return list(buffer._albums)
+
+        self.assertEqual(asyncio.run(scenario()), [(-1001, "g2"), (-1001, "g3")])
+        # The oldest album was closed early rather than dropped
+        self.assertEqual([r['item_id'] for r in self.db.get_unread_source_items("-1001", "telegram")], ["-1001:1"])
+
+    def test_close_writes_open_albums(self):
+        buffer = CaptureBuffer(max_batch=10, max_delay=60, album_window=60)
+
+        async def scenario():
+            await buffer.add(_post(-1001, 5, photo="a", album="g1"))
+            await buffer.add(_post(-1001, 6, "plain"))
+            await buffer.close()
+
+        asyncio.run(scenario())
+        rows = self.db.get_unread_source_items("-1001", "telegram")
+        self.assertEqual(sorted(r['item_id'] for r in rows), ["-1001:5", "-1001:6"])
+
+    def test_username_subscriptions_match(self):
+        buffer = CaptureBuffer(max_batch=1)
+        asyncio.run(buffer.add(_post(-1005, 7, "hi", username="news")))
+        self.assertEqual([r['item_id'] for r in self.db.get_unread_source_items("@news", "telegram")], ["-1005:7"])
+
+    def test_capture_runs_subscribed_task_immediately(self):
+        from core.engine import ProcessingEngine
+        engine = ProcessingEngine("123:TEST", worker_id="w1")
+        buffer = CaptureBuffer(max_batch=10, max_delay=0.01)
+        published = []
+
+        async def publish(dest, payload):
+            published.append((dest['identifier'], payload.get('copy_from'), time.monotonic()))
+
+        async def scenario():
+            engine.leases.refresh()
+            buffer.subscribe(engine.notify_source)
+            captured_at = time.monotonic()
+            await buffer.add(_post(-1001, 42, "breaking"))
+            for _ in range(100):
+                if published:
+                    break
+                await asyncio.sleep(0.01)
+            await engine.delivery.join()
+            await engine.delivery.stop()
+            return captured_at
+
+        with patch.object(engine, "_publish_to_destination", AsyncMock(side_effect=publish)):
+            captured_at = asyncio.run(scenario())
+
+        self.assertEqual(len(published), 1)
+        dest, copy_from, sent_at = published[0]
+        self.assertEqual(dest, "-2001")
+        self.assertEqual(copy_from, {"chat_id": "-1001", "message_ids": [42]})
+        self.assertLess(sent_at - captured_at, 1.0)
+        # Consumed in bulk once handled, so the next cycle does not see it again
+        self.assertEqual(self.db.get_unread_source_items("-1001", "telegram"), [])
+
+    def test_every_task_watching_a_channel_gets_its_posts(self):
+        from core.engine import ProcessingEngine
+        other = self.db.bulk_create_tasks(1, [
+            {"name": "same channel", "sources": [("telegram", "-1001")], "destinations": [("telegram", "-2003")]}])[0]
+        engine = ProcessingEngine("123:TEST", worker_id="w1")
+        buffer = CaptureBuffer(max_batch=1)
+        published = []
+
+        async def publish(dest, payload):
+            published.append(dest['identifier'])
+
+        async def scenario():
+            engine.leases.refresh()
+            await buffer.add(_post(-1001, 42, "breaking"))
+            # One task acknowledges the post before the other has run at all
+            await engine._safe_process_task(self.task_ids[0])
+            self.assertEqual(len(self.db.get_unread_source_items("-1001", "telegram")), 1)
+            await engine._safe_process_task(other)
+            await engine.delivery.join()
+            await engine.delivery.stop()
+
+        with patch.object(engine, "_publish_to_destination", AsyncMock(side_effect=publish)):
+            asyncio.run(scenario())
+
+        self.assertEqual(sorted(published), ["-2001", "-2003"])
+        self.assertEqual(self.db.get_unread_source_items("-1001", "telegram"), [])
+
+if __name__ == '__main__':
+    unittest.main()
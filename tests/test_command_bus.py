@@ -0,0 +1,108 @@
+# tests/test_command_bus.py
+
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import AsyncMock, patch
+from database import manager
+from database.manager import DatabaseManager
+from services.command_bus import CommandBus
+
+class TestCommandBus(unittest.TestCase):
+    """Commands from a bot process reach engines in other processes through the database."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(f"sqlite:///{os.path.join(self.tmp.name, 'commands.db')}")
+        self.db_patch = patch.object(manager.db, "_instance", self.db)
+        self.db_patch.start()
+
+    def tearDown(self):
+        self.db_patch.stop()
+        self.db._sqlite_conn.close()
+        self.tmp.cleanup()
+
+    def test_local_subscribers_immediately_remote_ones_by_polling(self):
+        bot, engine = CommandBus(), CommandBus()
+        local, remote = [], []
+        bot.subscribe(local.append)
+        engine.subscribe(remote.append)
+        bot.poll()
+        engine.poll()
+
+        bot.publish("task_paused", 7)
+        bot.publish("source_items", platform="telegram", identifier="-1001")
+        self.assertEqual([c.name for c in local], ["task_paused", "source_items"])
+        self.assertEqual(remote, [])
+
+        self.assertEqual(engine.poll(), 2)
+        self.assertEqual(remote[0].task_id, 7)
+        self.assertEqual(remote[1].payload, {"platform": "telegram", "identifier": "-1001"})
+        self.assertEqual(engine.poll(), 0)
+        # A process never receives its own commands twice
+        self.assertEqual(bot.poll(), 0)
+        self.assertEqual(len(local), 2)
+
+    def test_commands_published_from_a_thread_run_on_the_loop(self):
+        bus = CommandBus()
+        seen = []
+
+        async def handler(command):
+            seen.append((command.name, threading.get_ident()))
+
+        async def scenario():
+            bus.subscribe(handler)
+            await asyncio.to_thread(bus.publish, "tasks_imported", count=3)
+            for _ in range(100):
+                if seen:
+                    break
+                await asyncio.sleep(0.01)
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(scenario())
+        self.assertEqual(seen, [("tasks_imported", loop_thread)])
+
+    def test_engine_applies_pause_and_create_without_waiting_for_a_cycle(self):
+        from core.engine import ProcessingEngine
+        task_id = self.db.bulk_create_tasks(1, [
+            {"name": "a", "sources": [("telegram", "-1001")], "destinations": [("telegram", "-2001")]}])[0]
+        bot, engine_bus = CommandBus(), CommandBus(poll_interval=0.01)
+        engine = ProcessingEngine("123:TEST", worker_id="w1")
+        engine.leases.refresh()
+        engine_bus.subscribe(engine.handle_command)
+        runs = []
+
+        async def wait_for(condition):
+            for _ in range(200):
+                if condition():
+                    return True
+                await asyncio.sleep(0.01)
+            return False
+
+        async def scenario():
+            receiver = asyncio.create_task(engine_bus.run())
+            await asyncio.sleep(0.05)
+
+            self.db.set_task_status(task_id, "paused")
+            bot.publish("task_paused", task_id)
+            paused = await wait_for(lambda: task_id not in engine.leases.owned)
+
+            new_id = self.db.bulk_create_tasks(1, [
+                {"name": "b", "sources": [("telegram", "-1002")], "destinations": [("telegram", "-2002")]}])[0]
+            bot.publish("task_created", new_id)
+            started = await wait_for(lambda: runs)
+            receiver.cancel()
+            return paused, started, new_id
+
+        with patch.object(engine, "_safe_process_task", AsyncMock(side_effect=lambda t, wakeup=False: runs.append(t))):
+            paused, started, new_id = asyncio.run(scenario())
+
+        self.assertTrue(paused)
+        self.assertTrue(started)
+        self.assertEqual(runs, [new_id])
+        self.assertEqual(set(engine.leases.owned), {new_id})
+
+if __name__ == '__main__':
+    unittest.main()
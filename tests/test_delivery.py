@@ -0,0 +1,54 @@
+# tests/test_delivery.py
+
+import asyncio
+import unittest
+from core.delivery import DeliveryDispatcher
+
+class TestDeliveryDispatcher(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for the per-destination delivery queues."""
+
+    async def test_slow_destination_does_not_stall_others(self):
+        """A blocked destination must not hold back deliveries to a fast one."""
+        delivered = {"fast": [], "slow": []}
+        release = asyncio.Event()
+
+        async def handler(dest, payload):
+            if dest['identifier'] == "slow":
+                await release.wait()
+            delivered[dest['identifier']].append(payload['n'])
+
+        dispatcher = DeliveryDispatcher(handler, limit=10)
+        dests = [{"platform": "telegram", "identifier": "fast"}, {"platform": "twitter", "identifier": "slow"}]
+        for n in range(3):
+            await dispatcher.dispatch([(d, {"n": n}) for d in dests])
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(delivered["fast"], [0, 1, 2])
+        self.assertEqual(delivered["slow"], [])
+
+        release.set()
+        await asyncio.wait_for(dispatcher.join(), timeout=1)
+        self.assertEqual(delivered["slow"], [0, 1, 2])
+        await dispatcher.stop()
+
+    async def test_backpressure_when_queue_is_full(self):
+        """Dispatch blocks once a destination queue exceeds its limit."""
+        release = asyncio.Event()
+
+        async def handler(dest, payload):
+            await release.wait()
+
+        dispatcher = DeliveryDispatcher(handler, limit=1)
+        dests = [{"platform": "telegram", "identifier": "-100"}]
+        await dispatcher.dispatch([(dests[0], {"n": 0})])  # picked up by the worker
+        await asyncio.sleep(0)
+        await dispatcher.dispatch([(dests[0], {"n": 1})])  # fills the queue
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(dispatcher.dispatch([(dests[0], {"n": 2})]), timeout=0.05)
+
+        release.set()
+        await dispatcher.stop()
+
+if __name__ == '__main__':
+    unittest.main()
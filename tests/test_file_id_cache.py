@@ -0,0 +1,103 @@
+# tests/test_file_id_cache.py
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from services.file_id_cache import FileIdCache
+from services.media_urls import MediaInfo
+from providers.publishers.telegram import TelegramPublisher
+
+def _photo_message(file_id):
+    size = MagicMock()
+    size.file_id = file_id
+    message = MagicMock()
+    message.photo = [size]
+    return message
+
+class TestFileIdCache(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for the Telegram file_id cache."""
+
+    def setUp(self):
+        self.db_patch = patch('services.file_id_cache.db', MagicMock())
+        self.db_patch.start()
+        self.cache = FileIdCache(max_entries=2, ttl=60)
+        self.cache._loaded = True
+
+    def tearDown(self):
+        self.db_patch.stop()
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted once the cache is full."""
+        self.cache.put("a", "fa")
+        self.cache.put("b", "fb")
+        self.cache.get("a")
+        self.cache.put("c", "fc")
+        self.assertEqual(self.cache.get("a"), "fa")
+        self.assertIsNone(self.cache.get("b"))
+
+    async def test_fan_out_uploads_once(self):
+        """Concurrent destinations reuse the file_id from the first upload."""
+        bot = MagicMock()
+        bot.token = "123:abc"
+        sent_refs = []
+
+        async def send_photo(chat_id, photo, **kwargs):
+            sent_refs.append(photo)
+            await asyncio.sleep(0.01)
+            return _photo_message("FILE_ID_1")
+
+        bot.send_photo = AsyncMock(side_effect=send_photo)
+        probe = AsyncMock(side_effect=lambda url: MediaInfo(url, "image/jpeg", 1024))
+        with patch('providers.publishers.telegram.file_id_cache', self.cache), \
+                patch('providers.publishers.telegram.media_prober.resolve', probe):
+            publisher = TelegramPublisher(bot)
+            url = "https://pbs.twimg.com/media/abc.jpg"
+            results = await asyncio.gather(*[publisher.publish(f"-100{i}", "caption", [url]) for i in range(3)])
+
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(sent_refs.count(url), 1)
+        self.assertEqual(sent_refs.count("FILE_ID_1"), 2)
+
+    async def test_lock_survives_handoff_to_a_waiter(self):
+        """A sender arriving while the lock passes to a waiter must still queue behind it."""
+        cache = FileIdCache()
+        inside, overlap = [], []
+        release = asyncio.Event()
+
+        async def sender(name, hold=None):
+            async with cache.lock(["k"]):
+                if inside:
+                    overlap.append((inside[-1], name))
+                inside.append(name)
+                if hold:
+                    await hold.wait()
+                else:
+                    await asyncio.sleep(0)
+                inside.remove(name)
+
+        first = asyncio.create_task(sender("a", release))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(sender("b"))
+        await asyncio.sleep(0)
+        release.set()
+        third = asyncio.create_task(sender("c"))
+        await asyncio.gather(first, second, third)
+        self.assertEqual(overlap, [])
+        self.assertEqual(cache._locks, {})
+
+    async def test_captured_album_is_one_media_group(self):
+        """A captured album is re-sent by file_id in a single send_media_group call."""
+        bot = MagicMock()
+        bot.token = "123:abc"
+        bot.send_media_group = AsyncMock(return_value=[])
+        refs = [f"tg-file:photo:FILE_{i}" for i in range(3)]
+        with patch('providers.publishers.telegram.file_id_cache', self.cache):
+            self.assertTrue(await TelegramPublisher(bot).publish("-1001", "rewritten", refs))
+
+        bot.send_media_group.assert_awaited_once()
+        media = bot.send_media_group.call_args.kwargs["media"]
+        self.assertEqual([m.media for m in media], ["FILE_0", "FILE_1", "FILE_2"])
+        self.assertEqual(media[0].caption, "rewritten")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# tests/test_import_time.py
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous enough for a slow CI box; a regression to eager imports costs well over a second
+IMPORT_BUDGET_SECONDS = 1.5
+HEAVY_MODULES = ("twikit", "groq", "feedparser", "psycopg2")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+from database.manager import db
+print(json.dumps({"elapsed": elapsed, "db": db.initialized,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+class TestImportTime(unittest.TestCase):
+    """Importing the application must stay cheap and free of side effects."""
+
+    def test_import_main_is_lazy(self):
+        with tempfile.TemporaryDirectory() as cwd:
+            env = dict(os.environ, PYTHONPATH=ROOT)
+            env.pop("DATABASE_URL", None)
+            proc = subprocess.run([sys.executable, "-c", PROBE], cwd=cwd, env=env,
+                                  capture_output=True, text=True, timeout=60)
+            self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+            self.assertEqual(result["loaded"], [])
+            self.assertFalse(result["db"])
+            # No database file or log directory is created just by importing
+            self.assertEqual(os.listdir(cwd), [])
+            self.assertLess(result["elapsed"], IMPORT_BUDGET_SECONDS)
+
+if __name__ == '__main__':
+    unittest.main()
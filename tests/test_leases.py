@@ -0,0 +1,89 @@
+# tests/test_leases.py
+
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from database.manager import DatabaseManager, LeaseLostError
+from core.leases import LeaseManager
+
+class TestTaskLeases(unittest.TestCase):
+    """Lease-based task ownership across several workers sharing one database."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(f"sqlite:///{os.path.join(self.tmp.name, 'leases.db')}")
+        self.task_ids = self.db.bulk_create_tasks(1, [{
+            "name": f"task {i}", "sources": [("twitter_rss", f"user{i}")], "destinations": [("telegram", "-100")],
+        } for i in range(10)])
+        self.db_patch = patch('core.leases.db', self.db)
+        self.db_patch.start()
+
+    def tearDown(self):
+        self.db_patch.stop()
+        self.db._sqlite_conn.close()
+        self.tmp.cleanup()
+
+    def _enqueue(self, task_id, item_id, lease):
+        dest = self.db.get_task_details(task_id)['destinations']
+        return self.db.enqueue_outbox(task_id, 1, item_id, dest, {"text": item_id}, lease=lease)
+
+    def test_workers_split_and_rebalance(self):
+        a, b = LeaseManager("a", ttl=60), LeaseManager("b", ttl=60)
+        self.assertEqual(len(a.refresh()), 10)
+
+        # b joins: it sees two live workers but a still holds everything
+        self.assertEqual(len(b.refresh()), 0)
+        self.assertEqual(len(a.refresh()), 5)   # a releases its excess...
+        self.assertEqual(len(b.refresh()), 5)   # ...and b claims it
+        self.assertFalse(set(a.owned) & set(b.owned))
+        self.assertEqual(set(a.owned) | set(b.owned), set(self.task_ids))
+
+        # b shuts down cleanly; a takes everything back on its next refresh
+        b.release_all()
+        self.assertEqual(len(a.refresh()), 10)
+
+    def test_dead_worker_is_taken_over_and_fenced(self):
+        a, b = LeaseManager("a", ttl=60), LeaseManager("b", ttl=60)
+        a.refresh()
+        task_id = self.task_ids[0]
+        stale_lease = a.lease(task_id)
+        self._enqueue(task_id, "queued-by-a", stale_lease)
+
+        # a stops heartbeating; once it is past the TTL, b retires it
+        self.db.execute("UPDATE workers SET heartbeat_at=? WHERE worker_id='a'", (time.time() - 120,))
+        self.assertEqual(len(b.refresh()), 10)
+        self.assertEqual(b.owned[task_id], stale_lease[1] + 1)
+
+        # Undelivered work goes back to the pool, and b can claim it
+        rows = self.db.claim_due_deliveries(worker_id="b")
+        self.assertEqual([(r['item_id'], r['claimed_by']) for r in rows], [("queued-by-a", "b")])
+
+        # A write from a's stale epoch is rejected and leaves nothing behind
+        with self.assertRaises(LeaseLostError):
+            self._enqueue(task_id, "late-write", stale_lease)
+        self.assertFalse(self.db.is_item_processed(task_id, "late-write"))
+        self.assertEqual(len(self._enqueue(task_id, "fresh", b.lease(task_id))), 1)
+
+    def test_paused_tasks_are_released(self):
+        a = LeaseManager("a", ttl=60)
+        a.refresh()
+        self.db.set_task_status(self.task_ids[0], "paused")
+        owned = a.refresh()
+        self.assertEqual(len(owned), 9)
+        self.assertNotIn(self.task_ids[0], owned)
+
+    def test_restart_requeues_own_deliveries(self):
+        a = LeaseManager("a", ttl=60)
+        a.refresh()
+        self._enqueue(self.task_ids[0], "in-flight", a.lease(self.task_ids[0]))
+
+        restarted = LeaseManager("a", ttl=60)
+        owned = restarted.refresh()
+        self.assertEqual(owned[self.task_ids[0]], 2)
+        rows = self.db.claim_due_deliveries(worker_id="a")
+        self.assertEqual([r['item_id'] for r in rows], ["in-flight"])
+
+if __name__ == '__main__':
+    unittest.main()
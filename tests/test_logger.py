@@ -0,0 +1,93 @@
+# tests/test_logger.py
+
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from services.logger import AlertDispatcher, CompressingRotatingFileHandler, JsonFormatter, Logger, _parse_sample_rates
+
+def _record(msg):
+    return logging.LogRecord("bot", logging.ERROR, __file__, 1, msg, None, None)
+
+class TestAlertDispatcher(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for coalesced admin alerts."""
+
+    def test_identical_errors_are_grouped(self):
+        """A burst of identical errors becomes one digest line with a count."""
+        alerts = AlertDispatcher("token", "1", max_groups=2)
+        for _ in range(100):
+            alerts.emit(_record("[RSS] Mirror https://nitter.cz failed: timeout"))
+        alerts.emit(_record("[DB] Execute error"))
+        alerts.emit(_record("[AI] Async processing failed"))
+
+        digest = alerts._digest()
+        self.assertIn("×100", digest)
+        self.assertIn("(102 errors)", digest)
+        self.assertIn("1 more distinct errors", digest)
+        self.assertEqual(alerts._digest(), "")
+
+    async def test_digest_sends_single_message(self):
+        """Sending posts one digest, and nothing when idle."""
+        alerts = AlertDispatcher("token", "1")
+        alerts.emit(_record("boom"))
+        alerts.emit(_record("boom"))
+        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as post:
+            await alerts.send_digest()
+            await alerts.send_digest()
+        self.assertEqual(post.await_count, 1)
+        self.assertIn("×2", post.await_args.kwargs["json"]["text"])
+
+    async def test_digest_uses_configured_api_url(self):
+        """Digests go to TELEGRAM_API_URL, and are skipped without a token."""
+        from services.config_service import config
+        alerts = AlertDispatcher("token", "1")
+        alerts.emit(_record("boom"))
+        with patch.object(config, "get", return_value="http://localhost:8081/bot"), \
+                patch("httpx.AsyncClient.post", new_callable=AsyncMock) as post:
+            await alerts.send_digest()
+        self.assertEqual(post.await_args.args[0], "http://localhost:8081/bottoken/sendMessage")
+
+        alerts = AlertDispatcher("", "1")
+        alerts.emit(_record("boom"))
+        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as post:
+            await alerts.send_digest()
+            await alerts.run()
+        post.assert_not_awaited()
+
+class TestStructuredLogging(unittest.TestCase):
+    """Unit tests for JSON records, rotation and sampling."""
+
+    def test_json_record_fields(self):
+        record = _record("published")
+        record.task_id, record.stage, record.duration_ms = 7, "publish.success", 42
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data["msg"], "published")
+        self.assertEqual((data["task_id"], data["stage"], data["duration_ms"]), (7, "publish.success", 42))
+        self.assertNotIn("source", data)
+
+    def test_rotation_compresses_backups(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = CompressingRotatingFileHandler(os.path.join(tmp, "bot.log"), max_bytes=200, backup_count=2)
+            handler.setFormatter(JsonFormatter())
+            for _ in range(10):
+                handler.emit(_record("x" * 50))
+            handler.close()
+            self.assertIn("bot.log.1.gz", os.listdir(tmp))
+            self.assertLessEqual(len(os.listdir(tmp)), 3)
+
+    def test_sampling_keeps_errors(self):
+        """A zero sample rate drops INFO for that stage but never errors."""
+        log = Logger.__new__(Logger)
+        log.logger = MagicMock()
+        log.sample_rates = _parse_sample_rates("rss.mirror=0, publish.success=bogus")
+        log.info("mirror ok", stage="rss.mirror")
+        log.info("other stage", stage="engine.item")
+        log.error("mirror failed", stage="rss.mirror")
+        self.assertEqual(log.logger.info.call_count, 1)
+        self.assertEqual(log.logger.error.call_count, 1)
+        self.assertNotIn("publish.success", log.sample_rates)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# tests/test_loop_monitor.py
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+from services.loop_monitor import LoopMonitor
+
+def _blocking_helper(seconds):
+    time.sleep(seconds)
+
+class TestLoopMonitor(unittest.TestCase):
+    def _run(self, monitor, block, settle=0.3):
+        async def scenario():
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0.15)
+            _blocking_helper(block)
+            await asyncio.sleep(settle)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        asyncio.run(scenario())
+
+    def test_slow_callback_is_sampled_with_its_stack(self):
+        monitor = LoopMonitor(interval=0.05, slow_threshold=0.1, alert_threshold=10, alert_after=10)
+        with patch("services.loop_monitor.logger") as log:
+            self._run(monitor, 0.4)
+
+        slow = monitor.slow_callbacks()
+        self.assertEqual(len(slow), 1)
+        self.assertGreaterEqual(slow[0].duration, 0.3)
+        self.assertIn("_blocking_helper", slow[0].culprit)
+        self.assertIn("test_loop_monitor.py", slow[0].culprit)
+        self.assertTrue(log.warning.called)
+        self.assertGreaterEqual(monitor.lag, 0.0)
+        log.error.assert_not_called()
+
+    def test_sustained_lag_alerts_once(self):
+        monitor = LoopMonitor(interval=0.05, slow_threshold=0.1, alert_threshold=0.1, alert_after=0.2)
+        with patch("services.loop_monitor.logger") as log:
+            self._run(monitor, 0.6)
+        self.assertEqual(log.error.call_count, 1)
+        self.assertIn("_blocking_helper", log.error.call_args[0][0])
+
+    def test_idle_loop_records_nothing(self):
+        monitor = LoopMonitor(interval=0.05, slow_threshold=0.1)
+        with patch("services.loop_monitor.logger"):
+            self._run(monitor, 0.0)
+        self.assertEqual(monitor.slow_callbacks(), [])
+        self.assertLess(monitor.lag, 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
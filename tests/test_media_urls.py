@@ -0,0 +1,49 @@
+# tests/test_media_urls.py
+
+import unittest
+from services.media_urls import MediaInfo, media_kind, normalize_media_url
+
+class TestMediaUrlNormalizer(unittest.TestCase):
+    """Unit tests for rewriting Nitter proxy URLs to the twimg origin."""
+
+    def test_relative_pic_path(self):
+        """Relative /pic/ paths resolve to the original-size pbs.twimg.com image."""
+        url = normalize_media_url("/pic/media%2FGabc123XYZ.jpg", "https://nitter.net")
+        self.assertEqual(url, "https://pbs.twimg.com/media/Gabc123XYZ?format=jpg&name=orig")
+
+    def test_orig_and_small_variants(self):
+        """Size hints on the proxied path are replaced by the best variant."""
+        url = normalize_media_url("https://nitter.cz/pic/orig/media%2FGabc.png")
+        self.assertEqual(url, "https://pbs.twimg.com/media/Gabc?format=png&name=orig")
+        url = normalize_media_url("https://nitter.cz/pic/media%2FGabc%3Fformat%3Djpg%26name%3Dsmall")
+        self.assertEqual(url, "https://pbs.twimg.com/media/Gabc?format=jpg&name=orig")
+
+    def test_base64_encoded_pic(self):
+        """Mirrors with base64 media enabled are decoded too."""
+        url = normalize_media_url("/pic/enc/bWVkaWEvR2FiYy5qcGc", "https://nitter.poast.org")
+        self.assertEqual(url, "https://pbs.twimg.com/media/Gabc?format=jpg&name=orig")
+
+    def test_gif_thumbnail_becomes_mp4(self):
+        """GIF thumbnails point at the looping MP4 on video.twimg.com."""
+        url = normalize_media_url("/pic/tweet_video_thumb%2FGxyz.jpg", "https://nitter.net")
+        self.assertEqual(url, "https://video.twimg.com/tweet_video/Gxyz.mp4")
+
+    def test_proxied_video(self):
+        """/video/ proxy paths carry the quoted origin URL."""
+        src = "/video/ABCDEF/https%3A%2F%2Fvideo.twimg.com%2Fext_tw_video%2F1%2Fpu%2Fvid%2F720x1280%2Fa.mp4"
+        url = normalize_media_url(src, "https://nitter.net")
+        self.assertEqual(url, "https://video.twimg.com/ext_tw_video/1/pu/vid/720x1280/a.mp4")
+
+    def test_unrelated_urls_untouched(self):
+        self.assertEqual(normalize_media_url("https://example.com/a.jpg"), "https://example.com/a.jpg")
+
+    def test_media_kind_from_probe(self):
+        """The send method follows the probed content type and size."""
+        self.assertEqual(media_kind(MediaInfo("u", "image/jpeg", 1024)), "photo")
+        self.assertEqual(media_kind(MediaInfo("u", "image/jpeg", 9 * 1024 * 1024)), "document")
+        self.assertEqual(media_kind(MediaInfo("u", "video/mp4", 1024)), "video")
+        self.assertEqual(media_kind(MediaInfo("https://video.twimg.com/tweet_video/a.mp4", "video/mp4", 1)), "animation")
+        self.assertEqual(media_kind(MediaInfo("https://x/y.mp4", None, None)), "video")
+
+if __name__ == '__main__':
+    unittest.main()
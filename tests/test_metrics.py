@@ -0,0 +1,73 @@
+# tests/test_metrics.py
+
+import asyncio
+import unittest
+import httpx
+from services.metrics import MetricsRegistry, metrics_endpoint, timed
+from services.web import WebServer
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for the Prometheus metrics registry and endpoint."""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_histogram_exposition(self):
+        hist = self.registry.histogram("fetch_seconds", "Fetch latency", ["platform"], buckets=(0.1, 1))
+        hist.labels(platform="rss").observe(0.05)
+        hist.labels(platform="rss").observe(0.5)
+        self.registry.counter("items_total", "Items").inc(3)
+        text = self.registry.render()
+        self.assertIn('fetch_seconds_bucket{platform="rss",le="0.1"} 1', text)
+        self.assertIn('fetch_seconds_bucket{platform="rss",le="+Inf"} 2', text)
+        self.assertIn('fetch_seconds_count{platform="rss"} 2', text)
+        self.assertIn("items_total 3", text)
+        self.assertIs(self.registry.counter("items_total", "Items"), self.registry.counter("items_total", "Items"))
+
+    async def test_timed_records_outcome(self):
+        hist = self.registry.histogram("publish_seconds", "Publish", ["platform", "outcome"])
+
+        @timed(hist, lambda platform: {"platform": platform})
+        async def publish(platform):
+            await asyncio.sleep(0.01)
+            return platform != "twitter"
+
+        await publish("telegram")
+        await publish("twitter")
+        self.assertEqual(hist.labels(platform="telegram", outcome="ok").count, 1)
+        self.assertEqual(hist.labels(platform="twitter", outcome="error").count, 1)
+        self.assertGreater(hist.labels(platform="telegram", outcome="ok").sum, 0.005)
+
+    async def test_endpoint_serves_text_format(self):
+        server = WebServer("127.0.0.1", 0)
+        server.route("GET", "/metrics", metrics_endpoint)
+        await server.start()
+        try:
+            async with httpx.AsyncClient() as client:
+                resp = await client.get(f"http://127.0.0.1:{server.port}/metrics")
+                missing = await client.get(f"http://127.0.0.1:{server.port}/nope")
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.headers["content-type"].startswith("text/plain; version=0.0.4"))
+            self.assertEqual(missing.status_code, 404)
+        finally:
+            await server.stop()
+
+    async def test_slow_and_idle_connections_are_closed(self):
+        server = WebServer("127.0.0.1", 0, idle_timeout=0.2, read_timeout=0.2)
+        server.route("POST", "/hook", metrics_endpoint)
+        await server.start()
+        try:
+            idle_reader, idle_writer = await asyncio.open_connection("127.0.0.1", server.port)
+            self.assertEqual(await asyncio.wait_for(idle_reader.read(), 2), b"")
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(b"POST /hook HTTP/1.1\r\nContent-Length: 100\r\n\r\npartial")
+            response = await asyncio.wait_for(reader.read(), 2)
+            self.assertTrue(response.startswith(b"HTTP/1.1 408"))
+            for w in (idle_writer, writer):
+                w.close()
+        finally:
+            await server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+# tests/test_outbox.py
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+from database import manager
+from database.manager import DatabaseManager
+from providers.sources.rss import SourceItem
+from services.ai_service import ai_service
+
+def _items(n):
+    return [SourceItem(f"item-{i}", f"post {i}", [], "someone", "", time.time() + i) for i in range(n)]
+
+class TestOutbox(unittest.TestCase):
+    """Processed-item bookkeeping and durable delivery state in the outbox."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'outbox.db')
+        self.db = DatabaseManager(f"sqlite:///{self.path}")
+        self.db_patch = patch.object(manager.db, "_instance", self.db)
+        self.db_patch.start()
+
+    def tearDown(self):
+        self.db_patch.stop()
+        self.db._sqlite_conn.close()
+        self.tmp.cleanup()
+
+    def _engine(self):
+        from core.engine import ProcessingEngine
+        engine = ProcessingEngine("123:TEST", worker_id="w1")
+        engine.leases.refresh()
+        return engine
+
+    def test_tasks_sharing_a_source_each_deliver_every_item(self):
+        self.db.bulk_create_tasks(1, [
+            {"name": n, "sources": [("twitter_rss", "someone")], "destinations": [("telegram", d)]}
+            for n, d in (("a", "-2001"), ("b", "-2002"))])
+        engine = self._engine()
+        published = []
+
+        async def publish(dest, payload):
+            published.append((dest['identifier'], payload['text']))
+
+        async def scenario():
+            await engine.process_all_tasks()
+            await engine.delivery.join()
+            await engine.delivery.stop()
+
+        with patch.object(engine, "_fetch_from_source", AsyncMock(return_value=_items(2))), \
+             patch.object(engine, "_publish_to_destination", AsyncMock(side_effect=publish)), \
+             patch.object(ai_service, "is_enabled", return_value=False):
+            asyncio.run(scenario())
+
+        self.assertEqual(sorted(published), [("-2001", "post 0"), ("-2001", "post 1"),
+                                             ("-2002", "post 0"), ("-2002", "post 1")])
+
+    def test_global_processed_items_are_migrated_per_task(self):
+        ids = self.db.bulk_create_tasks(1, [
+            {"name": n, "sources": [("twitter_rss", "someone")], "destinations": []} for n in ("a", "b")])
+        self.db._sqlite_conn.close()
+
+        # The layout before items were deduplicated per task
+        conn = sqlite3.connect(self.path)
+        conn.execute("DROP TABLE processed_items")
+        conn.execute("CREATE TABLE processed_items (item_id TEXT PRIMARY KEY, source_id INTEGER, "
+                     "processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+        source_id = conn.execute("SELECT id FROM sources WHERE task_id=?", (ids[0],)).fetchone()[0]
+        conn.execute("INSERT INTO processed_items (item_id, source_id) VALUES ('old', ?)", (source_id,))
+        conn.commit()
+        conn.close()
+
+        self.db = DatabaseManager(f"sqlite:///{self.path}")
+        # Already handled before the upgrade, so neither task replays it
+        self.assertTrue(self.db.is_item_processed(ids[0], "old"))
+        self.assertTrue(self.db.is_item_processed(ids[1], "old"))
+        self.assertFalse(self.db.is_item_processed(ids[0], "new"))
+
+    def _deliver_failing(self, engine, fail_for, rewritten=None):
+        """Runs one item through the engine (AI-rewritten to `rewritten` if given);
+        publishing to the destinations in `fail_for` raises."""
+        async def publish(dest, payload):
+            if dest['identifier'] in fail_for:
+                raise RuntimeError("boom")
+
+        async def scenario():
+            await engine.process_all_tasks()
+            await engine.delivery.join()
+            await engine.delivery.stop()
+
+        with patch.object(engine, "_fetch_from_source", AsyncMock(return_value=_items(1))), \
+             patch.object(engine, "_publish_to_destination", AsyncMock(side_effect=publish)), \
+             patch.object(ai_service, "is_enabled", return_value=rewritten is not None), \
+             patch.object(ai_service, "process_content", AsyncMock(return_value=rewritten)):
+            asyncio.run(scenario())
+        return {r['identifier']: r for r in self.db.fetch_all("SELECT * FROM outbox")}
+
+    def _two_destinations(self):
+        return self.db.bulk_create_tasks(1, [{"name": "a", "sources": [("twitter_rss", "someone")],
+                                              "destinations": [("telegram", "-2001"), ("telegram", "-2002")]}])[0]
+
+    def test_only_the_failed_destination_is_retried_with_backoff(self):
+        self._two_destinations()
+        engine = self._engine()
+        engine.retry_base = 30
+        started = time.time()
+        rows = self._deliver_failing(engine, {"-2002"})
+
+        self.assertEqual((rows["-2001"]['status'], rows["-2001"]['attempts']), ("sent", 1))
+        failed = rows["-2002"]
+        self.assertEqual((failed['status'], failed['attempts'], failed['last_error']), ("pending", 1, "boom"))
+        self.assertAlmostEqual(failed['next_attempt_at'] - started, 30, delta=5)
+
+    def test_backoff_doubles_and_is_capped(self):
+        self._two_destinations()
+        engine = self._engine()
+        engine.retry_base, engine.max_attempts = 30, 100
+        dest = {'id': 1, 'platform': 'telegram', 'identifier': '-2001'}
+
+        async def deliver(attempts):
+            self.db.execute("UPDATE outbox SET status='queued' WHERE id=1")
+            started = time.time()
+            await engine._deliver(dest, {'id': 1, 'attempts': attempts, 'payload': {"text": "x"}})
+            return self.db.fetch_one("SELECT next_attempt_at FROM outbox WHERE id=1")['next_attempt_at'] - started
+
+        self.db.execute("INSERT INTO outbox (id, task_id, item_id, destination_id, platform, identifier, payload, status) "
+                        "VALUES (1, 1, 'x', 1, 'telegram', '-2001', '{}', 'queued')")
+        self.db.execute("UPDATE outbox SET claimed_by='w1' WHERE id=1")
+        with patch.object(engine, "_publish_to_destination", AsyncMock(side_effect=RuntimeError("boom"))):
+            self.assertAlmostEqual(asyncio.run(deliver(2)), 30 * 4, delta=5)
+            self.assertAlmostEqual(asyncio.run(deliver(20)), 3600, delta=5)
+
+    def test_gives_up_after_max_attempts(self):
+        self._two_destinations()
+        engine = self._engine()
+        engine.max_attempts = 3
+        rows = self._deliver_failing(engine, {"-2001", "-2002"})
+        self.assertEqual({r['status'] for r in rows.values()}, {"pending"})
+
+        self.db.execute("UPDATE outbox SET attempts=2, next_attempt_at=0")
+        with patch.object(engine, "_publish_to_destination", AsyncMock(side_effect=RuntimeError("boom"))):
+            async def retry():
+                await engine.resume_deliveries()
+                await engine.delivery.join()
+                await engine.delivery.stop()
+            asyncio.run(retry())
+        rows = self.db.fetch_all("SELECT status, attempts FROM outbox")
+        self.assertEqual([(r['status'], r['attempts']) for r in rows], [("failed", 3), ("failed", 3)])
+
+    def test_restart_resumes_pending_delivery_without_rerunning_ai(self):
+        self._two_destinations()
+        engine = self._engine()
+        self._deliver_failing(engine, {"-2002"}, rewritten="rewritten")
+        self.db.execute("UPDATE outbox SET next_attempt_at=0 WHERE status='pending'")
+
+        # A fresh engine, as after a restart, with the item still in the feed
+        restarted = self._engine()
+        published = []
+
+        async def publish(dest, payload):
+            published.append((dest['identifier'], payload['text']))
+
+        async def cycle():
+            await restarted.resume_deliveries()
+            await restarted.process_all_tasks()
+            await restarted.delivery.join()
+            await restarted.delivery.stop()
+
+        ai = AsyncMock(return_value="rewritten again")
+        with patch.object(restarted, "_fetch_from_source", AsyncMock(return_value=_items(1))), \
+             patch.object(restarted, "_publish_to_destination", AsyncMock(side_effect=publish)), \
+             patch.object(ai_service, "is_enabled", return_value=True), \
+             patch.object(ai_service, "process_content", ai):
+            asyncio.run(cycle())
+
+        self.assertEqual(published, [("-2002", "rewritten")])
+        ai.assert_not_called()
+        self.assertEqual({r['status'] for r in self.db.fetch_all("SELECT status FROM outbox")}, {"sent"})
+
+    def test_retired_worker_does_not_send_handed_over_deliveries(self):
+        self._two_destinations()
+        stalled = self._engine()
+        published = []
+
+        async def publish(dest, payload):
+            published.append(dest['identifier'])
+
+        async def scenario():
+            await stalled.process_all_tasks()
+            # The worker stalls before its senders run; it is retired and w2 claims its rows
+            self.db.execute("UPDATE outbox SET status='queued', claimed_by='w2'")
+            await stalled.delivery.join()
+            await stalled.delivery.stop()
+
+        with patch.object(stalled, "_fetch_from_source", AsyncMock(return_value=_items(1))), \
+             patch.object(stalled, "_publish_to_destination", AsyncMock(side_effect=publish)), \
+             patch.object(ai_service, "is_enabled", return_value=False), \
+             patch.object(stalled.delivery, "dispatch", AsyncMock()) as dispatch:
+            asyncio.run(scenario())
+            for dest, entry in dispatch.call_args[0][0]:
+                asyncio.run(stalled._deliver(dest, entry))
+
+        self.assertEqual(published, [])
+        rows = self.db.fetch_all("SELECT status, claimed_by FROM outbox")
+        self.assertEqual([(r['status'], r['claimed_by']) for r in rows], [("queued", "w2"), ("queued", "w2")])
+
+    def test_outcome_is_not_recorded_for_a_delivery_taken_over_mid_send(self):
+        self._two_destinations()
+        self.db.execute("INSERT INTO outbox (id, task_id, item_id, destination_id, platform, identifier, payload, "
+                        "status, claimed_by) VALUES (1, 1, 'x', 1, 'telegram', '-2001', '{}', 'queued', 'w1')")
+        self.assertTrue(self.db.begin_delivery(1, "w1"))
+        self.assertFalse(self.db.begin_delivery(1, "w1"))
+        self.db.execute("UPDATE outbox SET status='pending', claimed_by=NULL")
+        self.assertFalse(self.db.mark_delivery_sent(1, "w1"))
+        self.assertFalse(self.db.mark_delivery_failed(1, "w1", "boom", None))
+        self.assertEqual(self.db.fetch_one("SELECT status FROM outbox WHERE id=1")['status'], "pending")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# tests/test_profiler.py
+
+import os
+import tempfile
+import threading
+import tracemalloc
+import unittest
+from collections import deque
+from services.profiler import Profiler, ProfilerBusyError
+
+def _spin(stop):
+    # The newest blocks are always live, so they show up in the allocation snapshot
+    junk = deque(maxlen=2000)
+    while not stop.is_set():
+        junk.append(bytearray(1024))
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.stop = threading.Event()
+        self.worker = threading.Thread(target=_spin, args=(self.stop,), name="spinner")
+        self.worker.start()
+
+    def tearDown(self):
+        self.stop.set()
+        self.worker.join()
+
+    def test_capture_produces_collapsed_stacks_and_allocations(self):
+        result = Profiler(interval=0.005).capture_sync(0.3)
+
+        self.assertGreater(result.samples, 10)
+        lines = result.collapsed.strip().splitlines()
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+        spinner = [line for line in lines if line.startswith("spinner;")]
+        self.assertTrue(spinner)
+        self.assertIn("_spin (tests/test_profiler.py:", spinner[0])
+        self.assertIn("tests/test_profiler.py", result.allocations)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_only_one_capture_at_a_time(self):
+        profiler = Profiler()
+        runner = threading.Thread(target=profiler.capture_sync, args=(0.3,))
+        runner.start()
+        try:
+            while not profiler.running:
+                pass
+            with self.assertRaises(ProfilerBusyError):
+                profiler.capture_sync(0.1)
+        finally:
+            runner.join()
+        self.assertFalse(profiler.running)
+
+    def test_write_saves_both_files(self):
+        result = Profiler().capture_sync(0.1)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = Profiler.write(result, directory)
+            self.assertEqual(sorted(os.path.basename(p).split(".", 1)[1] for p in paths),
+                             ["alloc.txt", "collapsed"])
+
+if __name__ == '__main__':
+    unittest.main()
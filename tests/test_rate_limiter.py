@@ -0,0 +1,51 @@
+# tests/test_rate_limiter.py
+
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from telegram.error import RetryAfter
+from services.rate_limiter import TokenBucket, TelegramRateLimiter
+from providers.publishers.telegram import TelegramPublisher
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for the token bucket scheduler."""
+
+    async def test_burst_then_throttle(self):
+        """Capacity is served immediately, further tokens wait for the refill."""
+        bucket = TokenBucket(rate=10, period=1.0)
+        start = time.monotonic()
+        for _ in range(10):
+            await bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+        await bucket.acquire(2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    async def test_block_for_holds_callers(self):
+        """A flood-wait block delays the next acquire by the requested time."""
+        bucket = TokenBucket(rate=100, period=1.0)
+        bucket.block_for(0.1)
+        start = time.monotonic()
+        await bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_chat_classification(self):
+        """Channels get the per-minute group limit, private chats the per-second one."""
+        limiter = TelegramRateLimiter()
+        self.assertAlmostEqual(limiter._chat_bucket("-1001234").rate, 20 / 60)
+        self.assertAlmostEqual(limiter._chat_bucket("@channel").rate, 20 / 60)
+        self.assertAlmostEqual(limiter._chat_bucket(1654334233).rate, 1.0)
+
+class TestTelegramPublisherFloodWait(unittest.IsolatedAsyncioTestCase):
+    """The publisher waits exactly retry_after and resends."""
+
+    async def test_retry_after_is_honoured(self):
+        bot = MagicMock()
+        bot.token = "test-token-flood"
+        bot.send_message = AsyncMock(side_effect=[RetryAfter(0), MagicMock()])
+        publisher = TelegramPublisher(bot)
+
+        self.assertTrue(await publisher.publish("-100", "hello"))
+        self.assertEqual(bot.send_message.await_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
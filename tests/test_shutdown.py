@@ -0,0 +1,94 @@
+# tests/test_shutdown.py
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+from database import manager
+from database.manager import DatabaseManager
+from providers.sources.rss import SourceItem
+from services.ai_service import ai_service
+
+def _items(n):
+    return [SourceItem(f"item-{i}", f"post {i}", [], "someone", "", time.time() + i) for i in range(n)]
+
+class TestGracefulShutdown(unittest.TestCase):
+    """stop() finishes what is in flight and checkpoints the rest for the next worker."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(f"sqlite:///{os.path.join(self.tmp.name, 'shutdown.db')}")
+        self.db_patch = patch.object(manager.db, "_instance", self.db)
+        self.db_patch.start()
+        self.task_id = self.db.bulk_create_tasks(1, [
+            {"name": "a", "sources": [("twitter_rss", "someone")], "destinations": [("telegram", "-2001")]}])[0]
+        from core.engine import ProcessingEngine
+        self.engine = ProcessingEngine("123:TEST", worker_id="w1")
+
+    def tearDown(self):
+        self.db_patch.stop()
+        self.db._sqlite_conn.close()
+        self.tmp.cleanup()
+
+    def test_item_in_flight_finishes_and_the_rest_is_left_unprocessed(self):
+        engine = self.engine
+        published = []
+        ai_started = asyncio.Event()
+
+        async def rewrite(text, options):
+            ai_started.set()
+            await asyncio.sleep(0.1)
+            return f"rewritten {text}"
+
+        async def publish(dest, payload):
+            published.append(payload['text'])
+
+        async def scenario():
+            engine.leases.refresh()
+            cycle = asyncio.create_task(engine.process_all_tasks())
+            await ai_started.wait()
+            await engine.stop(timeout=5)
+            await cycle
+
+        with patch.object(engine, "_fetch_from_source", AsyncMock(return_value=_items(3))), \
+             patch.object(engine, "_publish_to_destination", AsyncMock(side_effect=publish)), \
+             patch.object(ai_service, "is_enabled", return_value=True), \
+             patch.object(ai_service, "process_content", AsyncMock(side_effect=rewrite)):
+            asyncio.run(scenario())
+
+        self.assertEqual(published, ["rewritten post 0"])
+        self.assertTrue(self.db.is_item_processed(self.task_id, "item-0"))
+        self.assertFalse(self.db.is_item_processed(self.task_id, "item-1"))
+        # Leases are handed back at once rather than after LEASE_TTL
+        self.assertEqual(self.db.fetch_all("SELECT * FROM workers"), [])
+        self.assertEqual(self.db.fetch_one("SELECT MAX(expires_at) AS e FROM task_leases")['e'], 0)
+        self.assertTrue(engine.stopping)
+
+    def test_deliveries_unsent_at_the_deadline_stay_in_the_outbox(self):
+        engine = self.engine
+
+        async def hang(dest, payload):
+            await asyncio.Event().wait()
+
+        async def scenario():
+            engine.leases.refresh()
+            await engine.process_all_tasks()
+            started = time.monotonic()
+            await engine.stop(timeout=0.2)
+            return time.monotonic() - started
+
+        with patch.object(engine, "_fetch_from_source", AsyncMock(return_value=_items(1))), \
+             patch.object(engine, "_publish_to_destination", AsyncMock(side_effect=hang)), \
+             patch.object(ai_service, "is_enabled", return_value=False):
+            elapsed = asyncio.run(scenario())
+
+        self.assertLess(elapsed, 1.0)
+        # Transformed and recorded once: the next worker only has to deliver it
+        self.assertTrue(self.db.is_item_processed(self.task_id, "item-0"))
+        row = self.db.fetch_one("SELECT status, claimed_by FROM outbox WHERE item_id='item-0'")
+        self.assertEqual((row['status'], row['claimed_by']), ("pending", None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# tests/test_task_io.py
+
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from database.manager import DatabaseManager
+from services import task_io
+
+LEGACY_YAML = """
+tasks:
+  - name: "Twitter to Telegram News"
+    paused: false
+    sources:
+      - platform: "twitter"
+        identifier: "elonmusk"
+    targets:
+      - platform: "telegram"
+        identifier: -1001234567890
+    ai_options:
+      redesign: true
+  - name: "Paused"
+    paused: true
+    sources: []
+    targets: []
+"""
+
+class TestTaskImportExport(unittest.TestCase):
+    """Unit tests for bulk task import/export."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.db = DatabaseManager()
+        self.db_patch = patch('services.task_io.db', self.db)
+        self.db_patch.start()
+
+    def tearDown(self):
+        self.db_patch.stop()
+        self.db._sqlite_conn.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_legacy_yaml_round_trip(self):
+        self.assertEqual(task_io.import_tasks(LEGACY_YAML, 1), 2)
+        task = self.db.get_task_details(self.db.get_task_page(1)['tasks'][0]['id'])
+        self.assertEqual(task['sources'][0]['identifier'], "elonmusk")
+        self.assertEqual(task['destinations'][0]['identifier'], "-1001234567890")
+        self.assertEqual(task['options'], {"ai_options": {"redesign": True}})
+
+        for fmt in ("yaml", "json"):
+            out = io.StringIO()
+            self.assertEqual(task_io.export_tasks(1, out, fmt), 2)
+            parsed = task_io.parse_tasks(out.getvalue())
+            self.assertEqual([t['status'] for t in parsed], ["active", "paused"])
+            self.assertEqual(parsed[0]['destinations'], [("telegram", "-1001234567890")])
+
+    def test_invalid_file_saves_nothing(self):
+        bad = '{"tasks": [{"name": "ok", "sources": []}, {"sources": []}]}'
+        with self.assertRaisesRegex(task_io.TaskImportError, "Task #2"):
+            task_io.import_tasks(bad, 1)
+        self.assertEqual(self.db.get_task_page(1)['tasks'], [])
+
+    def test_bulk_import_is_fast(self):
+        tasks = [{"name": f"t{i}", "sources": [{"platform": "twitter_rss", "identifier": f"h{i}"}],
+                  "destinations": [{"platform": "telegram", "identifier": "-100"}]} for i in range(3000)]
+        start = time.monotonic()
+        self.assertEqual(task_io.import_tasks(json.dumps({"tasks": tasks}), 1), 3000)
+        self.assertLess(time.monotonic() - start, 5)
+        last = self.db.get_task_summary(self.db.get_task_page(1, after_id=2990)['tasks'][-1]['id'])
+        self.assertEqual((last['name'], last['source_count'], last['dest_count']), ("t2999", 1, 1))
+
+    def test_async_export_reads_the_database_on_the_loop(self):
+        task_io.import_tasks(LEGACY_YAML, 1)
+        reads = set()
+        fetch_all = self.db.fetch_all
+
+        def tracked(*args):
+            reads.add(threading.get_ident())
+            return fetch_all(*args)
+
+        async def export(fmt):
+            out = io.StringIO()
+            count = await task_io.export_tasks_async(1, out, fmt, batch_size=1)
+            return count, out.getvalue(), threading.get_ident()
+
+        for fmt in ("yaml", "json"):
+            expected = io.StringIO()
+            task_io.export_tasks(1, expected, fmt)
+            reads.clear()
+            with patch.object(self.db, "fetch_all", side_effect=tracked):
+                count, text, loop_thread = asyncio.run(export(fmt))
+            self.assertEqual((count, text), (2, expected.getvalue()))
+            self.assertEqual(reads, {loop_thread})
+
+    def test_bulk_ids_match_their_rows(self):
+        self.db.create_task("existing", 1, {})
+        ids = self.db.bulk_create_tasks(1, [{"name": f"n{i}", "sources": [], "destinations": []} for i in range(3)])
+        self.assertEqual([self.db.get_task_details(i)['name'] for i in ids], ["n0", "n1", "n2"])
+
+    def test_import_error_is_escaped_for_markdown(self):
+        from bot.handlers import transfer
+        data = b'{"tasks": [{"name": "x", "sources": [{"platform": "twitter_api", "identifier": "a"}]}]}'
+        update = MagicMock()
+        update.message.document.file_size = len(data)
+        update.message.document.get_file = AsyncMock(
+            return_value=MagicMock(download_as_bytearray=AsyncMock(return_value=bytearray(data))))
+        status = MagicMock(edit_text=AsyncMock())
+        update.message.reply_text = AsyncMock(return_value=status)
+
+        with patch.object(transfer, "is_admin", return_value=True):
+            asyncio.run(transfer.import_document(update, None))
+
+        self.assertIn("unknown platform 'twitter\\_api'", status.edit_text.await_args.args[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# tests/test_task_pages.py
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from database.manager import DatabaseManager
+from bot.cache import ViewCache
+
+class TestTaskPagination(unittest.TestCase):
+    """Unit tests for keyset-paginated task summaries."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.db = DatabaseManager()
+        for i in range(25):
+            task_id = self.db.create_task(f"task {i}", 1, {})
+            self.db.add_source(task_id, "twitter_rss", f"handle{i}")
+            if i % 2:
+                self.db.add_destination(task_id, "telegram", "-100")
+                self.db.add_destination(task_id, "telegram", "-200")
+        self.db.create_task("other user", 2, {})
+
+    def tearDown(self):
+        self.db._sqlite_conn.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_pages_forward_and_back(self):
+        first = self.db.get_task_page(1, limit=10)
+        self.assertEqual(len(first['tasks']), 10)
+        self.assertFalse(first['has_prev'])
+        self.assertTrue(first['has_next'])
+        self.assertEqual(first['tasks'][1]['source_count'], 1)
+        self.assertEqual(first['tasks'][1]['dest_count'], 2)
+
+        last = self.db.get_task_page(1, after_id=first['tasks'][-1]['id'] + 10, limit=10)
+        self.assertEqual([t['name'] for t in last['tasks']], [f"task {i}" for i in range(20, 25)])
+        self.assertFalse(last['has_next'])
+
+        back = self.db.get_task_page(1, before_id=last['tasks'][0]['id'], limit=10)
+        self.assertEqual([t['name'] for t in back['tasks']], [f"task {i}" for i in range(10, 20)])
+        self.assertTrue(back['has_prev'])
+
+    def test_status_drives_is_active(self):
+        task_id = self.db.get_task_page(1, limit=1)['tasks'][0]['id']
+        self.db.set_task_status(task_id, "paused")
+        self.assertFalse(self.db.get_task_summary(task_id)['is_active'])
+        self.assertEqual(len(self.db.get_active_tasks()), 25)
+
+class TestViewCache(unittest.TestCase):
+    def test_invalidate_drops_user_views(self):
+        cache = ViewCache(max_users=2)
+        cache.put(1, "a", "view-a")
+        cache.put(2, "b", "view-b")
+        cache.invalidate(1)
+        self.assertIsNone(cache.get(1, "a"))
+        self.assertEqual(cache.get(2, "b"), "view-b")
+        cache.put(3, "c", "view-c")
+        cache.put(4, "d", "view-d")
+        self.assertIsNone(cache.get(2, "b"))
+
+    def test_views_expire_after_ttl(self):
+        cache = ViewCache(ttl=60)
+        with patch("bot.cache.time.monotonic", return_value=1000.0):
+            cache.put(1, "a", "view-a")
+        with patch("bot.cache.time.monotonic", return_value=1059.0):
+            self.assertEqual(cache.get(1, "a"), "view-a")
+        with patch("bot.cache.time.monotonic", return_value=1060.0):
+            self.assertIsNone(cache.get(1, "a"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# tests/test_tracing.py
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from database import manager
+from database.manager import DatabaseManager
+from services.tracing import Tracer, percentile
+
+class TestTracer(unittest.TestCase):
+    """Unit tests for item lifecycle tracing."""
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_spans_survive_payload_round_trip(self):
+        tracer = Tracer(capacity=3)
+        now = time.time()
+        for i in range(5):
+            item = SimpleNamespace(id=f"item{i}", timestamp=now - 60)
+            trace = tracer.start(7, item)
+            trace.mark("transformed", trace.marks["detected"] + 2)
+            trace.mark("queued", trace.marks["detected"] + 2.5)
+            trace.mark("sending", trace.marks["detected"] + 2.75)
+            # The trace travels through the outbox as plain JSON-able data
+            tracer.record(dict(trace.to_dict()), "telegram:-100", published=trace.marks["detected"] + 3)
+
+        spans = tracer.spans()
+        self.assertEqual([s.item_id for s in spans], ["item2", "item3", "item4"])
+        stats = tracer.summary()[7]
+        self.assertEqual(stats["count"], 3)
+        self.assertAlmostEqual(stats["p50"], 63, delta=1)
+        self.assertAlmostEqual(stats["stages"]["transform"], 2)
+        self.assertAlmostEqual(stats["stages"]["persist"], 0.5)
+        self.assertAlmostEqual(stats["stages"]["queue"], 0.25)
+        self.assertAlmostEqual(stats["stages"]["deliver"], 0.25)
+
+    def test_bot_process_reads_spans_recorded_by_engines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(f"sqlite:///{os.path.join(tmp, 'traces.db')}")
+            with patch.object(manager.db, "_instance", db):
+                engine, bot = Tracer(persist=True), Tracer(remote=True)
+                for i in range(2):
+                    trace = engine.start(7, SimpleNamespace(id=f"item{i}", timestamp=time.time() - 5))
+                    engine.record(trace.to_dict(), "telegram:-100")
+                    engine.flush()
+                    # Every call sees what the engine has written so far
+                    self.assertEqual([s.item_id for s in bot.spans()], [f"item{j}" for j in range(i + 1)])
+                self.assertEqual(bot.summary()[7]["count"], 2)
+            db._sqlite_conn.close()
+
+    def test_latency_report_escapes_task_names(self):
+        from bot.handlers import admin
+        tracer = Tracer()
+        trace = tracer.start(7, SimpleNamespace(id="item", timestamp=time.time() - 5))
+        tracer.record(trace.to_dict(), "telegram:-100")
+        update = MagicMock()
+        update.message.reply_text = AsyncMock()
+
+        with patch.object(admin, "tracer", tracer), patch.object(admin, "is_admin", return_value=True), \
+             patch.object(admin, "db") as db:
+            db.get_task_summary.return_value = {"name": "btc_news *alerts*"}
+            asyncio.run(admin.latency_command(update, None))
+
+        text = update.message.reply_text.call_args[0][0]
+        self.assertIn("btc\\_news \\*alerts\\*", text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# tests/test_twitter_publisher.py
+
+import asyncio
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+import httpx
+from services.media_cache import MediaCache
+from providers.publishers.twitter import MEDIA_DROPPED, TwitterPublisher
+
+class TestTwitterMediaPipeline(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for the in-memory Twitter media pipeline."""
+
+    async def asyncSetUp(self):
+        async def handler(request):
+            await asyncio.sleep(0.1)
+            if "huge" in request.url.path:
+                return httpx.Response(200, content=b"x" * 64, headers={"content-type": "video/mp4"})
+            return httpx.Response(200, content=b"\xff\xd8img", headers={"content-type": "image/jpeg"})
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = MediaCache(root=self.tmp.name, max_bytes=1024)
+        self.cache._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.cache_patch = patch('providers.publishers.twitter.media_cache', self.cache)
+        self.cache_patch.start()
+        self.publisher = TwitterPublisher("user", "pass")
+        self.publisher._is_logged_in = True
+        self.publisher.client = MagicMock()
+        self.publisher.client.upload_media = AsyncMock(side_effect=lambda data, media_type=None: f"id-{len(data)}")
+        self.publisher.client.create_tweet = AsyncMock()
+
+    async def asyncTearDown(self):
+        self.cache_patch.stop()
+        await self.cache.close()
+        self.tmp.cleanup()
+
+    async def test_downloads_run_in_parallel_from_memory(self):
+        """Four attachments cost about one download's latency and upload as bytes."""
+        urls = [f"https://pbs.twimg.com/media/{i}.jpg" for i in range(5)]
+        start = time.monotonic()
+        self.assertTrue(await self.publisher.publish("hello", urls))
+        self.assertLess(time.monotonic() - start, 0.3)
+
+        uploads = self.publisher.client.upload_media.await_args_list
+        self.assertEqual(len(uploads), 4)
+        self.assertIsInstance(uploads[0].args[0], bytes)
+        self.assertEqual(uploads[0].kwargs["media_type"], "image/jpeg")
+
+    async def test_size_cap_skips_oversized_media(self):
+        """Streams larger than the cap are dropped instead of buffered."""
+        self.publisher.MAX_MEDIA_BYTES = 16
+        self.assertIsNone(await self.publisher._download_media("https://video.twimg.com/huge.mp4"))
+        self.assertIsNotNone(await self.publisher._download_media("https://pbs.twimg.com/media/ok.jpg"))
+
+    async def test_repeat_publish_hits_cache(self):
+        """The same media is fetched once across publishes and deduplicated by content."""
+        urls = ["https://pbs.twimg.com/media/a.jpg", "https://nitter.net/pic/media%2Fa.jpg"]
+        start = time.monotonic()
+        await self.publisher.publish("one", urls)
+        first = time.monotonic() - start
+        await self.publisher.publish("two", urls)
+        self.assertLess(time.monotonic() - start - first, 0.05)
+        self.assertEqual(len(self.cache._lru), 1)
+
+    async def test_cache_survives_restart(self):
+        """A new cache instance finds earlier downloads on disk without fetching again."""
+        url = "https://pbs.twimg.com/media/a.jpg"
+        entry = await self.cache.fetch(url)
+        restarted = MediaCache(root=self.tmp.name, max_bytes=1024)
+        self.assertEqual(await restarted.lookup(url), entry)
+        self.assertEqual(await restarted.read(entry.content_hash), b"\xff\xd8img")
+
+    async def test_captured_telegram_media_is_cross_posted(self):
+        """tg-file refs are downloaded through the bot; ones that can't be are counted as dropped."""
+        from core.engine import ProcessingEngine
+        tg_file = MagicMock(file_size=4, file_path="https://api.telegram.org/file/botTOKEN/photos/1.jpg")
+        tg_file.download_as_bytearray = AsyncMock(return_value=bytearray(b"\xff\xd8tg"))
+
+        async def get_file(file_id):
+            if file_id != "ok":
+                raise RuntimeError("file is gone")
+            return tg_file
+
+        bot = SimpleNamespace(get_file=get_file)
+        refs = ["tg-file:photo:ok", "tg-file:photo:expired"]
+        dropped = MEDIA_DROPPED.labels(platform="twitter").value
+
+        with patch('core.engine.media_cache', self.cache):
+            await ProcessingEngine._cache_telegram_media(SimpleNamespace(bot=bot), refs, 1024)
+        self.assertTrue(await self.publisher.publish("hello", refs))
+
+        upload = self.publisher.client.upload_media.await_args
+        self.assertEqual((upload.args[0], upload.kwargs["media_type"]), (b"\xff\xd8tg", "image/jpeg"))
+        self.assertEqual(self.publisher.client.create_tweet.await_args.kwargs["media_ids"], ["id-4"])
+        self.assertEqual(MEDIA_DROPPED.labels(platform="twitter").value, dropped + 1)
+
+if __name__ == '__main__':
+    unittest.main()
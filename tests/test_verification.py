@@ -0,0 +1,72 @@
+# tests/test_verification.py
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from database import manager
+from bot.verification import ProbeResult, SourceProber
+
+class TestSourceProber(unittest.IsolatedAsyncioTestCase):
+    """Unit tests for background source verification."""
+
+    async def test_budget_and_cache(self):
+        """A slow probe answers within the budget and fills the cache when it finishes."""
+        calls = []
+
+        async def slow_run(platform, identifier):
+            calls.append(identifier)
+            await asyncio.sleep(0.2)
+            return ProbeResult(True, "3 recent posts found")
+
+        prober = SourceProber(budget=0.05, ttl=60)
+        with patch.object(prober, "_run", side_effect=slow_run):
+            start = time.monotonic()
+            first = await prober.probe("twitter_rss", "Binance")
+            self.assertLess(time.monotonic() - start, 0.15)
+            self.assertFalse(first.ok)
+
+            await asyncio.sleep(0.25)
+            self.assertTrue(prober.cached("twitter_rss", "binance").ok)
+            self.assertTrue((await prober.probe("twitter_rss", "binance")).ok)
+        self.assertEqual(calls, ["Binance"])
+
+    async def test_concurrent_probes_share_one_run(self):
+        async def run(platform, identifier):
+            await asyncio.sleep(0.01)
+            return ProbeResult(True, "ok")
+
+        prober = SourceProber(budget=1)
+        with patch.object(prober, "_run", side_effect=run) as mocked:
+            results = await asyncio.gather(*[prober.probe("twitter", "elonmusk") for _ in range(5)])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(mocked.call_count, 1)
+
+    async def test_rss_probe_keeps_database_work_on_the_loop(self):
+        """Only the HTTP fetch runs in a thread; mirror health uses the shared connection on the loop."""
+        threads = {}
+
+        def fetch(rss_url, identifier):
+            threads['fetch'] = threading.get_ident()
+            return [object()]
+
+        def record(name):
+            return lambda *args: threads.setdefault(name, threading.get_ident())
+
+        prober = SourceProber(budget=1)
+        rss = prober._rss_source()
+        with patch.object(rss, "_fetch_from_url", side_effect=fetch), \
+             patch.object(manager.db, "_instance") as fake_db:
+            fake_db.register_mirrors.side_effect = record("register")
+            fake_db.get_active_mirrors.return_value = ["https://mirror.test"]
+            fake_db.update_mirror_status.side_effect = record("status")
+            result = await prober.probe("twitter_rss", "Binance")
+
+        self.assertTrue(result.ok)
+        loop_thread = threading.get_ident()
+        self.assertNotEqual(threads['fetch'], loop_thread)
+        self.assertEqual((threads['register'], threads['status']), (loop_thread, loop_thread))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# tests/test_webhook.py
+
+import asyncio
+import time
+import unittest
+from telegram.ext import Application, MessageHandler, filters
+from benchmarks.fakes import FakeTelegram
+from bot.webhook import start_webhook, stop_webhook
+from services.web import WebServer
+
+class TestWebhookMode(unittest.IsolatedAsyncioTestCase):
+    """The bot receives updates from a local fake Telegram through the webhook."""
+
+    async def asyncSetUp(self):
+        self.telegram = FakeTelegram(latency=0)
+        self.api = WebServer("127.0.0.1", 0)
+        self.api.route("POST", "/bot*", self.telegram.handle)
+        await self.api.start()
+
+        self.handled = []
+        self.application = (Application.builder().token("123:WEBHOOK")
+                            .base_url(f"http://127.0.0.1:{self.api.port}/bot")
+                            .updater(None).build())
+
+        async def slow_handler(update, context):
+            await asyncio.sleep(0.3)
+            self.handled.append((update.channel_post.text, time.monotonic()))
+
+        # As in main.py: updates are sequential, but channel posts don't block
+        self.application.add_handler(MessageHandler(filters.ChatType.CHANNEL, slow_handler, block=False))
+        self.server = WebServer("127.0.0.1", 0)
+        await self.server.start()
+        await start_webhook(self.application, self.server, f"http://127.0.0.1:{self.server.port}/telegram/hook",
+                            "/telegram/hook", "s3cret", max_connections=10)
+
+    async def asyncTearDown(self):
+        await stop_webhook(self.application)
+        await self.server.stop()
+        await self.api.stop()
+
+    async def test_registers_webhook_with_secret_and_limit(self):
+        self.assertEqual(self.telegram.webhook["url"], f"http://127.0.0.1:{self.server.port}/telegram/hook")
+        self.assertEqual(self.telegram.webhook["secret_token"], "s3cret")
+        self.assertEqual(self.telegram.webhook["max_connections"], "10")
+
+    async def test_channel_posts_are_processed_concurrently(self):
+        started = time.monotonic()
+        updates = [self.telegram.channel_post(-1001, f"post {i}") for i in range(4)]
+        self.assertEqual(await self.telegram.push_updates(updates), [200] * 4)
+        while len(self.handled) < 4 and time.monotonic() - started < 5:
+            await asyncio.sleep(0.02)
+
+        self.assertEqual(sorted(text for text, _ in self.handled), [f"post {i}" for i in range(4)])
+        # Four 0.3s handlers ran side by side rather than one after another
+        self.assertLess(max(t for _, t in self.handled) - started, 1.0)
+
+    async def test_wrong_secret_is_rejected(self):
+        update = self.telegram.channel_post(-1001, "forged")
+        self.assertEqual(await self.telegram.push_updates([update], secret="guess"), [403])
+        await asyncio.sleep(0.4)
+        self.assertEqual(self.handled, [])
+
+if __name__ == '__main__':
+    unittest.main()